@@ -0,0 +1,248 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.request import Request
+from . import views
+from .authentication import JWTAuthentication
+from .compression import abody_response, aget_body, aset_body, body_key
+from .conditional import aget_validators
+from .models import CustomUser, BlogPost, BlogComment, ImageAsset, Project, ProjectComment
+from .pagination import AsyncPageNumberPagination, KeysetPagination
+from .prefetch import plan_queryset
+from .realtime import STREAMS, channel_name, get_backend, hub, render_comments
+from .renderers import FastJSONRenderer
+from .routers import use_primary
+from .serializers import AdminBlogSerializer, BlogSummarySerializer, BlogCommentsSerializer, ProjectCommentsSerializer, ProfileSerializer
+from .slugs import blog_slugs, project_slugs
+from .snapshots import aget_home_snapshot
+from .versions import comments_version, profile_version
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+class AsyncReadView(View):
+    """Serves GET on the event loop with the async ORM.
+
+    Other methods on the same route are handed to the existing DRF view
+    (``write_view``) in a worker thread, so the write path is unchanged.
+    Django's async ORM still funnels queries through one shared thread, so
+    the gain is on routes answered from cache (home, profile) and on slow
+    clients; compare with ``manage.py compare_wsgi_asgi``.
+    """
+
+    write_view = None
+    authentication = JWTAuthentication()
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            if self.write_view is None:
+                return await self.http_method_not_allowed(request, *args, **kwargs)
+            return await sync_to_async(self.write_view)(request, *args, **kwargs)
+        try:
+            drf_request = Request(request)
+            drf_request.user, drf_request.auth = await self.authentication.aauthenticate(request)
+            return await self.get(drf_request, *args, **kwargs)
+        except AuthenticationFailed as exc:
+            response = json_response({"detail": exc.detail}, status=exc.status_code)
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+            return response
+        except APIException as exc:
+            return json_response({"detail": exc.detail}, status=exc.status_code)
+
+    async def get(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+
+class HomeScreenView(AsyncReadView):
+    async def get(self, request):
+        validators = await aget_validators('home', ['home'], private=False, vary=['Accept-Encoding'])
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        snapshot = await aget_home_snapshot(validators.versions[0])
+        if snapshot is None:
+            return json_response({"status": "error", "message": "Admin not found"}, status=status.HTTP_404_NOT_FOUND)
+        return validators.apply(await abody_response(request, body_key('home', validators.versions[0]), snapshot['body']))
+
+
+class AdminBlogView(AsyncReadView):
+    pagination_class = AsyncPageNumberPagination
+
+    async def get(self, request):
+        summary = request.query_params.get('view') == 'summary'
+        paginator = self.pagination_class()
+        url = paginator.canonical_url(request, view='summary' if summary else None)
+        validators = await aget_validators('blogs', ['blogs'], variant=url, vary=['Accept-Encoding'])
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        key = body_key('blogs', validators.versions[0], url)
+        body = await aget_body(key)
+        if body is None:
+            with use_primary():
+                try:
+                    admin = await CustomUser.objects.only('id').aget(is_superuser=True)
+                except CustomUser.DoesNotExist:
+                    return json_response({"status": "error", "message": "Admin not found"}, status=status.HTTP_404_NOT_FOUND)
+                serializer_class = BlogSummarySerializer if summary else AdminBlogSerializer
+                blogs = plan_queryset(BlogPost.objects.filter(author=admin), serializer_class)
+                page = await paginator.apaginate_queryset(blogs, request)
+            serializer = serializer_class(page, many=True)
+            body = FastJSONRenderer().render(paginator.get_paginated_response({"status": "success", "data": serializer.data}).data)
+            await aset_body(key, body)
+        return validators.apply(await abody_response(request, key, body))
+
+
+class CommentsView(AsyncReadView):
+    pagination_class = KeysetPagination
+    kind = None
+    parent_model = None
+    parent_field = None
+    slugs = None
+    comment_model = None
+    serializer_class = None
+    not_found_message = None
+
+    async def get(self, request, slug):
+        parent_id = await self.slugs.aresolve(slug)
+        if parent_id is None:
+            return json_response({"status": "error", "message": self.not_found_message}, status=status.HTTP_404_NOT_FOUND)
+        validators = await aget_validators(f'{self.kind}-comments', [comments_version(self.kind, parent_id)], variant=request.build_absolute_uri())
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        comments = plan_queryset(self.comment_model.objects.filter(**{f'{self.parent_field}_id': parent_id}), self.serializer_class)
+        paginator = self.pagination_class()
+
+        async def total():
+            return await self.parent_model.objects.filter(pk=parent_id).values_list('comment_count', flat=True).afirst()
+
+        page = await paginator.apaginate_queryset(comments, request, view=self, total=total)
+        serializer = self.serializer_class(page, many=True, context={'request': request})
+        return validators.apply(json_response(paginator.get_paginated_response({"status": "success", "data": serializer.data}).data))
+
+
+class BlogCommentsView(CommentsView):
+    write_view = staticmethod(views.BlogCommentsView.as_view())
+    kind = 'blog'
+    parent_model = BlogPost
+    parent_field = 'blog_post'
+    slugs = blog_slugs
+    comment_model = BlogComment
+    serializer_class = BlogCommentsSerializer
+    not_found_message = "Blog not found"
+
+
+class ProjectCommentsView(CommentsView):
+    write_view = staticmethod(views.ProjectCommentsView.as_view())
+    kind = 'project'
+    parent_model = Project
+    parent_field = 'project'
+    slugs = project_slugs
+    comment_model = ProjectComment
+    serializer_class = ProjectCommentsSerializer
+    not_found_message = "Project not found"
+
+
+class ProfileView(AsyncReadView):
+    write_view = staticmethod(views.ProfileView.as_view())
+
+    async def get(self, request):
+        user = request.user
+        validators = await aget_validators('profile', [profile_version(user.pk)], variant=user.pk)
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        if user.profile_image_id is not None:
+            # The serializer would otherwise lazy-load it, which the async ORM forbids.
+            user.profile_image = await ImageAsset.objects.filter(pk=user.profile_image_id).afirst()
+        serializer = ProfileSerializer(user)
+        return validators.apply(json_response({"status": "success", "data": serializer.data}))
+
+
+class CommentStreamView(AsyncReadView):
+    """Server-Sent Events for new comments on one post or project.
+
+    A reconnecting client sends Last-Event-ID (or ``?last_id=``) and first
+    gets the comments it missed from the database, up to
+    REALTIME_REPLAY_LIMIT; past that it is told to ``reset`` and should
+    reload the listing. Needs the ASGI server: under WSGI each stream
+    would hold a worker thread.
+    """
+
+    kind = None
+    slugs = None
+    not_found_message = None
+
+    async def get(self, request, slug):
+        if not isinstance(request._request, ASGIRequest):
+            return json_response({"status": "error", "message": "Comment streams need the ASGI server"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        parent_id = await self.slugs.aresolve(slug)
+        if parent_id is None:
+            return json_response({"status": "error", "message": self.not_found_message}, status=status.HTTP_404_NOT_FOUND)
+        last_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_id')
+        try:
+            last_id = int(last_id) if last_id else None
+        except ValueError:
+            return json_response({"status": "error", "message": "Invalid Last-Event-ID"}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(self.stream(parent_id, last_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Tell nginx not to buffer the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, parent_id, last_id):
+        get_backend().start()
+        ready = asyncio.Event()
+        # Subscribe before replaying, so nothing committed in between is lost;
+        # live events the replay already covered are skipped below.
+        subscription = hub.subscribe(channel_name(self.kind, parent_id), asyncio.get_running_loop(), ready)
+        try:
+            yield b'retry: %d\n\n' % settings.REALTIME_RETRY_MS
+            if last_id is not None:
+                comment_model, parent_field, _ = STREAMS[self.kind]
+                missed = comment_model.objects.filter(**{f'{parent_field}_id': parent_id, 'pk__gt': last_id}).order_by('pk')
+                frames = await sync_to_async(render_comments)(self.kind, missed[:settings.REALTIME_REPLAY_LIMIT + 1])
+                if len(frames) > settings.REALTIME_REPLAY_LIMIT:
+                    yield b'event: reset\ndata: {}\n\n'
+                    return
+                for event_id, frame in frames:
+                    last_id = event_id
+                    yield frame
+            while True:
+                try:
+                    await asyncio.wait_for(ready.wait(), settings.REALTIME_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection.
+                    yield b': ping\n\n'
+                    continue
+                ready.clear()
+                while subscription.pending:
+                    event_id, frame = subscription.pending.popleft()
+                    if last_id is None or event_id > last_id:
+                        last_id = event_id
+                        yield frame
+                if subscription.overflowed:
+                    return
+        finally:
+            hub.unsubscribe(subscription)
+
+
+class BlogCommentStreamView(CommentStreamView):
+    kind = 'blog'
+    slugs = blog_slugs
+    not_found_message = "Blog not found"
+
+
+class ProjectCommentStreamView(CommentStreamView):
+    kind = 'project'
+    slugs = project_slugs
+    not_found_message = "Project not found"
@@ -1,43 +1,115 @@
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 import jwt
+import time
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
-from .models import CustomUser, BlacklistedToken
+from .instrumentation import span
+from .models import CustomUser
+from .token_cache import UserPrincipal, revoked_tokens, token_key, verified_tokens
 from django.conf import settings
 import logging
 
 
 logger = logging.getLogger(__name__)
 
+
+def decode_token(token, token_type='access'):
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    except ExpiredSignatureError:
+        raise AuthenticationFailed("Your token has expired!")
+    except InvalidTokenError:
+        raise AuthenticationFailed("You have provided an invalid token!")
+    # Tokens issued before versioning carry no 'ver' and can't be revoked,
+    # so they are refused.
+    if payload.get('type') != token_type or 'ver' not in payload:
+        raise AuthenticationFailed("You have provided an invalid token!")
+    return payload
+
+
 class JWTAuthentication(BaseAuthentication):
     def authenticate(self, request):
+        with span('auth'):
+            # Overwritten on success; any exception leaves 'failure'.
+            self.mark(request, 'failure')
+            token, key, principal, payload = self.parse(request)
+            revoked, version, changed = revoked_tokens.check(key, principal.user_id if principal else payload['user_id'])
+            principal = self.check_state(key, principal, revoked, version, changed)
+            if principal is not None:
+                self.mark(request, 'cached')
+                return (principal.to_user(), token)
+
+            payload = payload or decode_token(token)
+            verified_at = time.time()
+            try:
+                user = CustomUser.objects.get(id=payload['user_id'])
+            except CustomUser.DoesNotExist:
+                raise AuthenticationFailed("User not found!")
+            result = self.verified(user, payload, token, key, verified_at)
+            self.mark(request, 'success')
+            return result
+
+    async def aauthenticate(self, request):
+        """Async twin of ``authenticate`` for the ASGI read views."""
+        with span('auth'):
+            self.mark(request, 'failure')
+            token, key, principal, payload = self.parse(request)
+            revoked, version, changed = await revoked_tokens.acheck(key, principal.user_id if principal else payload['user_id'])
+            principal = self.check_state(key, principal, revoked, version, changed)
+            if principal is not None:
+                self.mark(request, 'cached')
+                return (principal.to_user(), token)
+
+            payload = payload or decode_token(token)
+            verified_at = time.time()
+            try:
+                user = await CustomUser.objects.aget(id=payload['user_id'])
+            except CustomUser.DoesNotExist:
+                raise AuthenticationFailed("User not found!")
+            result = self.verified(user, payload, token, key, verified_at)
+            self.mark(request, 'success')
+            return result
+
+    def mark(self, request, outcome):
+        # Read by MetricsMiddleware from the underlying Django request.
+        getattr(request, '_request', request).auth_outcome = outcome
+
+    def parse(self, request):
         auth_header = request.headers.get('Authorization')
         if not auth_header:
             logger.warning("Missing Authorization header")
             raise AuthenticationFailed("Authorization header is missing!")
         if not auth_header.startswith('Bearer '):
             raise AuthenticationFailed("Invalid token prefix! Use 'Bearer'.")
-        
+
         token = auth_header.split(' ')[1]
-        if BlacklistedToken.objects.filter(token=token).exists():
+        key = token_key(token)
+        principal = verified_tokens.get(key)
+        return token, key, principal, None if principal else decode_token(token)
+
+    def check_state(self, key, principal, revoked, version, changed):
+        """The cached principal if it is still current, else None."""
+        if revoked:
             raise AuthenticationFailed("Token has been blacklisted!")
-        try:
-            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-            user = CustomUser.objects.get(id=payload['user_id'])
-
-            if user.username != payload['username']:
-                raise AuthenticationFailed("Token payload mismatch!")
-            return (user, token)
-        
-        except ExpiredSignatureError:
-            raise AuthenticationFailed("Your token has expired!")
-        
-        except CustomUser.DoesNotExist:
-            raise AuthenticationFailed("User not found!")
-        
-        except InvalidTokenError:
-            raise AuthenticationFailed("You have provided an invalid token!")
-        
+        if principal is None:
+            return None
+        if version is not None and version != principal.token_version:
+            # The user logged out everywhere after this token was cached.
+            verified_tokens.discard(key)
+            raise AuthenticationFailed("Token has been revoked!")
+        if changed is not None and changed >= principal.verified_at:
+            # The row changed since (maybe in another worker): read it again.
+            verified_tokens.discard(key)
+            return None
+        return principal
+
+    def verified(self, user, payload, token, key, verified_at):
+        if user.username != payload['username']:
+            raise AuthenticationFailed("Token payload mismatch!")
+        if user.token_version != payload['ver']:
+            raise AuthenticationFailed("Token has been revoked!")
+        verified_tokens.set(key, UserPrincipal(user, verified_at), payload['exp'])
+        return (user, token)
+
     def authenticate_header(self, request):
         return 'Bearer'
-    
\ No newline at end of file
@@ -1,13 +1,19 @@
 from django.contrib.auth.backends import ModelBackend
+from .hashing import make_password, verify_password
 from .models import CustomUser
 
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, email=None, password=None, **kwargs):
-        try:
-            users = CustomUser.objects.filter(email__iexact=email.lower())
-            if users.count() == 1 and users[0].check_password(password):
-                return users[0]
+        email = email or kwargs.get('username') or kwargs.get(CustomUser.USERNAME_FIELD)
+        if email is None or password is None:
             return None
+        try:
+            user = CustomUser.objects.get_by_natural_key(email)
         except CustomUser.DoesNotExist:
-            return None
\ No newline at end of file
+            # Hash anyway so unknown emails take as long as wrong passwords.
+            make_password(password)
+            return None
+        if verify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
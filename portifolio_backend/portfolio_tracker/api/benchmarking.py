@@ -0,0 +1,246 @@
+import base64
+import statistics
+import time
+from contextlib import contextmanager
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .counters import reconcile_comment_counts
+from .models import assign_slugs, make_excerpt, CustomUser, AdminProfile, Skill, Project, BlogPost, BlogComment, ProjectComment
+from .slugs import blog_slugs, project_slugs
+from .sync import encode_token
+from .token_cache import revoked_tokens, verified_tokens
+from .views import generate_token
+
+
+BENCHMARK_TITLE = 'Benchmark post'
+BENCHMARK_SLUG = 'benchmark-post'
+BENCHMARK_EMAIL = 'admin@benchmark.local'
+BENCHMARK_PASSWORD = 'Benchmark1'
+# A 1x1 PNG.
+BENCHMARK_IMAGE = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+def seed_portfolio(comments=100, posts=20, projects=10):
+    """Create an admin portfolio plus ``comments`` comments on one post and
+    one project; returns the admin user."""
+    admin = CustomUser.objects.create_superuser(
+        email=BENCHMARK_EMAIL, fullname='Bench Mark', password=BENCHMARK_PASSWORD,
+    )
+    AdminProfile.objects.create(user=admin, career='Engineer', about_me='Benchmark fixture')
+    Skill.objects.bulk_create([Skill(user=admin, name=f'Skill {i}') for i in range(10)])
+    project_rows = [
+        Project(user=admin, title=BENCHMARK_TITLE if i == 0 else f'Project {i}', description='word ' * 50)
+        for i in range(projects)
+    ]
+    assign_slugs(project_rows)
+    Project.objects.bulk_create(project_rows)
+    content = 'word ' * 200
+    post_rows = [
+        BlogPost(
+            title=BENCHMARK_TITLE if i == 0 else f'Post {i}', content=content,
+            excerpt=make_excerpt(content), category='general', author=admin,
+        )
+        for i in range(posts)
+    ]
+    assign_slugs(post_rows)
+    BlogPost.objects.bulk_create(post_rows)
+    post = BlogPost.objects.get(title=BENCHMARK_TITLE)
+    project = Project.objects.get(title=BENCHMARK_TITLE)
+    BlogComment.objects.bulk_create(
+        [BlogComment(blog_post=post, user=admin, content=f'Comment {i}') for i in range(comments)],
+        batch_size=1000,
+    )
+    ProjectComment.objects.bulk_create(
+        [ProjectComment(project=project, user=admin, content=f'Comment {i}') for i in range(comments)],
+        batch_size=1000,
+    )
+    reconcile_comment_counts()
+    return admin
+
+
+@contextmanager
+def simulated_latency(milliseconds):
+    """Sleep before every SQL statement, on every connection, to stand in for
+    a remote database."""
+    if not milliseconds:
+        yield
+        return
+    delay = milliseconds / 1000
+
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install)
+    for connection in connections.all(initialized_only=True):
+        install(None, connection)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        for connection in connections.all(initialized_only=True):
+            if wrapper in connection.execute_wrappers:
+                connection.execute_wrappers.remove(wrapper)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples, elapsed):
+    """``samples`` are per-request latencies in seconds; returns milliseconds."""
+    return {
+        'requests': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 95) * 1000, 2),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 2) if samples else 0.0,
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+class Route:
+    """One request to benchmark. ``path`` and ``data`` may be callables of
+    ``(context, iteration)`` so writes can vary per iteration."""
+
+    def __init__(self, name, method, path, data=None, label=None, fresh_token=False, anonymous=False, iterations=None, multipart=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.multipart = multipart
+        self.label = label or f'{method} {name}'
+        self.fresh_token = fresh_token
+        self.anonymous = anonymous
+        self.iterations = iterations
+
+    def build(self, context, iteration):
+        path = self.path(context, iteration) if callable(self.path) else self.path
+        data = self.data(context, iteration) if callable(self.data) else self.data
+        return path, data
+
+
+# Every named route in api/urls.py needs at least one entry here;
+# run_route_suite refuses to run otherwise.
+ROUTES = [
+    Route('register', 'POST', '/api/register/', anonymous=True,
+          data=lambda ctx, i: {'email': f'bench{i}@benchmark.local', 'fullname': 'Bench User', 'password': BENCHMARK_PASSWORD}),
+    Route('login', 'POST', '/api/login/', anonymous=True, data={'email': BENCHMARK_EMAIL, 'password': BENCHMARK_PASSWORD}),
+    Route('token-refresh', 'POST', '/api/token/refresh/', anonymous=True, data=lambda ctx, i: {'refresh_token': ctx['refresh_token']}),
+    Route('logout', 'POST', '/api/logout/', fresh_token=True),
+    Route('logout-all', 'POST', '/api/logout/all/', fresh_token=True),
+    Route('home', 'GET', '/api/home/'),
+    Route('admin-profile-update', 'PATCH', '/api/admin-profile/update/', data={'city': 'Lisbon'}),
+    Route('add-skill', 'POST', '/api/skills/add/', data=lambda ctx, i: {'name': f'Bench skill {i}'}),
+    Route('delete-skill', 'DELETE', lambda ctx, i: f"/api/skills/delete/{ctx['skill_ids'][0]}/"),
+    Route('bulk-skills', 'POST', '/api/skills/bulk/', data=lambda ctx, i: [{'name': f'Bulk skill {i}-{n}'} for n in range(10)]),
+    Route('bulk-skills', 'DELETE', '/api/skills/bulk/', data=lambda ctx, i: {'ids': ctx['skill_ids'][1:6]}),
+    Route('project-add', 'POST', '/api/project/add/', data=lambda ctx, i: {'title': f'Bench project {i}', 'description': 'word ' * 50}),
+    Route('project-delete', 'DELETE', lambda ctx, i: f"/api/project/delete/{ctx['project_ids'][0]}/"),
+    Route('bulk-projects', 'POST', '/api/project/bulk/', data=lambda ctx, i: [{'title': f'Bulk project {i}-{n}'} for n in range(10)]),
+    Route('bulk-projects', 'DELETE', '/api/project/bulk/', data=lambda ctx, i: {'ids': ctx['project_ids'][1:6]}),
+    Route('blog-add', 'POST', '/api/blog/add/', data=lambda ctx, i: {'title': f'Bench blog {i}', 'content': 'word ' * 200, 'category': 'general'}),
+    Route('blog-delete', 'DELETE', '/api/blog/delete/post-1/'),
+    Route('get-blogs', 'GET', '/api/blogs/'),
+    Route('get-blogs', 'GET', '/api/blogs/?view=summary', label='GET get-blogs?view=summary'),
+    Route('blog-detail', 'GET', lambda ctx, i: f"/api/blogs/{ctx['blog_id']}/"),
+    Route('blog-comments', 'GET', f'/api/blog/comments/{BENCHMARK_SLUG}/'),
+    Route('blog-comments', 'POST', f'/api/blog/comments/{BENCHMARK_SLUG}/', data={'content': 'Benchmark comment'}),
+    Route('project-comments', 'GET', f'/api/project/comments/{BENCHMARK_SLUG}/'),
+    Route('project-comments', 'POST', f'/api/project/comments/{BENCHMARK_SLUG}/', data={'content': 'Benchmark comment'}),
+    # The test client is WSGI, where streams answer 501 straight away; this
+    # times the authentication in front of them.
+    Route('blog-comments-stream', 'GET', f'/api/blog/comments/{BENCHMARK_SLUG}/stream/'),
+    Route('project-comments-stream', 'GET', f'/api/project/comments/{BENCHMARK_SLUG}/stream/'),
+    Route('image-upload', 'POST', '/api/images/', multipart=True, data=lambda ctx, i: {
+        'file': SimpleUploadedFile('benchmark.png', BENCHMARK_IMAGE, content_type='image/png'),
+        'target': 'project', 'slug': BENCHMARK_SLUG,
+    }),
+    Route('sync', 'GET', lambda ctx, i: f"/api/sync/?since={ctx['sync_token']}"),
+    Route('search', 'GET', '/api/search/?q=word'),
+    Route('export', 'GET', '/api/export/', iterations=3),
+    Route('metrics', 'GET', '/api/metrics/', anonymous=True),
+    Route('profile', 'GET', '/api/user-profile/'),
+    Route('profile', 'PATCH', '/api/user-profile/', data={'profile_url': 'https://example.com/me'}),
+]
+
+
+def route_context(admin):
+    return {
+        'admin': admin,
+        'token': generate_token(admin)[0],
+        'refresh_token': generate_token(admin, token_type='refresh')[0],
+        'skill_ids': list(Skill.objects.filter(user=admin).order_by('pk').values_list('pk', flat=True)),
+        # Skip the first project/post: it carries the seeded comments, and
+        # deleting it would time the cascade rather than the endpoint.
+        'project_ids': list(Project.objects.filter(user=admin).exclude(title=BENCHMARK_TITLE).order_by('pk').values_list('pk', flat=True)),
+        'blog_id': BlogPost.objects.get(title=BENCHMARK_TITLE).pk,
+        # A warm client: synced just now, so nothing has changed since.
+        'sync_token': encode_token(timezone.now()),
+    }
+
+
+def reset_shared_state():
+    cache.clear()
+    verified_tokens.clear()
+    revoked_tokens.clear()
+    blog_slugs.clear()
+    project_slugs.clear()
+
+
+def measure(route, context, iteration):
+    """Run ``route`` once inside a rolled-back transaction; returns
+    ``(seconds, queries, bytes, status)``."""
+    path, data = route.build(context, iteration)
+    client = Client()
+    headers = {}
+    if not route.anonymous:
+        token = generate_token(context['admin'])[0] if route.fresh_token else context['token']
+        headers['Authorization'] = f'Bearer {token}'
+    kwargs = {'headers': headers}
+    if data is not None:
+        kwargs['data'] = data
+        if not route.multipart:
+            kwargs['content_type'] = 'application/json'
+    with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = getattr(client, route.method.lower())(path, **kwargs)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        elapsed = time.perf_counter() - started
+        transaction.set_rollback(True)
+    return elapsed, len(queries), len(body), response.status_code
+
+
+def run_route(route, context, iterations, warmup=2):
+    reset_shared_state()
+    iterations = min(iterations, route.iterations or iterations)
+    for i in range(warmup):
+        measure(route, context, -1 - i)
+    samples, query_counts, sizes, statuses = [], [], [], set()
+    for i in range(iterations):
+        elapsed, queries, size, status_code = measure(route, context, i)
+        samples.append(elapsed)
+        query_counts.append(queries)
+        sizes.append(size)
+        statuses.add(status_code)
+    return {
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(samples, 50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 95) * 1000, 2),
+        'queries': max(query_counts),
+        'bytes': max(sizes),
+    }
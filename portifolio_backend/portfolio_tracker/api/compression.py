@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip only.
+    brotli = None
+
+
+BODY_KEY_PREFIX = 'api:body:'
+
+
+def body_key(name, version, url=None):
+    """Cache key for a rendered body of ``name`` at ``version``. With a
+    URL, normally a paginator's canonical_url(), it is part of the key,
+    since paginated bodies embed next/previous links."""
+    if url is None:
+        return f'{name}:{version}'
+    return f'{name}:{version}:{hashlib.sha1(url.encode()).hexdigest()}'
+
+
+def accepted_encoding(request):
+    """'br' or 'gzip' if the client accepts it (br preferred), else None."""
+    qualities = {}
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    for coding in ('br', 'gzip') if brotli is not None else ('gzip',):
+        if qualities.get(coding, qualities.get('*', 0.0)) > 0:
+            return coding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical input.
+    return gzip.compress(body, compresslevel=settings.GZIP_LEVEL, mtime=0)
+
+
+def get_body(key):
+    return cache.get(BODY_KEY_PREFIX + key)
+
+
+async def aget_body(key):
+    return await cache.aget(BODY_KEY_PREFIX + key)
+
+
+def set_body(key, body):
+    cache.set(BODY_KEY_PREFIX + key, body, settings.CACHED_BODY_TTL)
+
+
+async def aset_body(key, body):
+    await cache.aset(BODY_KEY_PREFIX + key, body, settings.CACHED_BODY_TTL)
+
+
+def _wants(body, encoding):
+    return encoding is not None and len(body) >= settings.COMPRESS_MIN_BYTES
+
+
+def _response(data, encoding, status):
+    response = HttpResponse(data, content_type='application/json', status=status)
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def body_response(request, key, body, status=200):
+    """Respond with ``body``, compressed for the client. Each encoding is
+    compressed once per ``key`` and then served from the cache."""
+    encoding = accepted_encoding(request)
+    if not _wants(body, encoding):
+        return _response(body, None, status)
+    encoded_key = f'{BODY_KEY_PREFIX}{key}:{encoding}'
+    data = cache.get(encoded_key)
+    if data is None:
+        data = compress(body, encoding)
+        cache.set(encoded_key, data, settings.CACHED_BODY_TTL)
+    return _response(data, encoding, status)
+
+
+async def abody_response(request, key, body, status=200):
+    encoding = accepted_encoding(request)
+    if not _wants(body, encoding):
+        return _response(body, None, status)
+    encoded_key = f'{BODY_KEY_PREFIX}{key}:{encoding}'
+    data = await cache.aget(encoded_key)
+    if data is None:
+        data = compress(body, encoding)
+        await cache.aset(encoded_key, data, settings.CACHED_BODY_TTL)
+    return _response(data, encoding, status)
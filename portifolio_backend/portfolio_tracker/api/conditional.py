@@ -0,0 +1,60 @@
+import hashlib
+import time
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from .versions import aget_versions, get_versions
+
+
+class Validators:
+    """ETag and Last-Modified of a response, derived only from content
+    version counters, so a request can be answered 304 before any query
+    or serializer runs.
+
+    ``variant`` separates responses that share versions but not content
+    (page URLs, users); ``vary`` lists the headers the full response
+    varies on, which a 304 has to repeat.
+    """
+
+    def __init__(self, name, versions, variant=None, private=True, vary=()):
+        self.versions = [version for version, _ in versions]
+        tag = '.'.join([name, *map(str, self.versions)])
+        if variant is not None:
+            tag += '.' + hashlib.sha1(str(variant).encode()).hexdigest()[:16]
+        # Weak: the same content goes out as identity, gzip or br.
+        self.etag = f'W/"{tag}"'
+        # HTTP dates have whole seconds: only once the second of the last
+        # change is over can no later change share its Last-Modified.
+        stamps = [modified for _, modified in versions]
+        if stamps and None not in stamps and int(max(stamps)) < int(time.time()):
+            self.last_modified = int(max(stamps))
+        else:
+            self.last_modified = None
+        self.private = private
+        self.vary = vary
+
+    def not_modified(self, request):
+        """A 304 (or 412) if the client's copy is current, else None."""
+        response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        return None if response is None else self.apply(response)
+
+    def apply(self, response):
+        if response.status_code == 304 or 200 <= response.status_code < 300:
+            response['ETag'] = self.etag
+            if self.last_modified is not None:
+                response['Last-Modified'] = http_date(self.last_modified)
+            # Clients may keep the body but must revalidate before using it.
+            if self.private:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            if self.vary:
+                patch_vary_headers(response, self.vary)
+        return response
+
+
+def get_validators(name, version_names, **kwargs):
+    return Validators(name, get_versions(*version_names), **kwargs)
+
+
+async def aget_validators(name, version_names, **kwargs):
+    return Validators(name, await aget_versions(*version_names), **kwargs)
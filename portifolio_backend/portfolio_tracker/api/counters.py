@@ -0,0 +1,71 @@
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import BlogPost, Project, BlogComment, ProjectComment
+from .snapshots import invalidate_home_snapshot
+from .tasks import task
+from .versions import bump_version, comments_version
+
+
+# (parent model, comment model, comment FK name, listing kind)
+COMMENT_RELATIONS = [
+    (BlogPost, BlogComment, 'blog_post', 'blog'),
+    (Project, ProjectComment, 'project', 'project'),
+]
+
+
+def _latest_comment(comment_model, fk_name):
+    return Subquery(
+        comment_model.objects.filter(**{fk_name: OuterRef('pk')})
+        .order_by('-created_at').values('created_at')[:1]
+    )
+
+
+def comment_added(parent_model, parent_id, created_at):
+    parent_model.objects.filter(pk=parent_id).update(
+        comment_count=F('comment_count') + 1,
+        last_commented_at=Coalesce(Greatest(F('last_commented_at'), Value(created_at)), Value(created_at)),
+    )
+
+
+def comment_removed(parent_model, comment_model, fk_name, parent_id):
+    parent_model.objects.filter(pk=parent_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1,
+        last_commented_at=_latest_comment(comment_model, fk_name),
+    )
+
+
+@task('counters.reconcile')
+def reconcile_task(payload):
+    reconcile_comment_counts(batch_size=payload.get('batch_size', 1000))
+
+
+def reconcile_comment_counts(batch_size=1000):
+    updated = 0
+    for parent_model, comment_model, fk_name, kind in COMMENT_RELATIONS:
+        counts = (
+            comment_model.objects.filter(**{fk_name: OuterRef('pk')})
+            .order_by().values(fk_name).annotate(n=Count('pk')).values('n')
+        )
+        latest = (
+            comment_model.objects.filter(**{fk_name: OuterRef('pk')})
+            .order_by().values(fk_name).annotate(latest=Max('created_at')).values('latest')
+        )
+        last_pk = 0
+        while True:
+            ids = list(
+                parent_model.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            updated += parent_model.objects.filter(pk__in=ids).update(
+                comment_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0),
+                last_commented_at=Subquery(latest),
+            )
+            # update() sends no signals; the comment listings nest the counts.
+            bump_version(*(comments_version(kind, pk) for pk in ids))
+            last_pk = ids[-1]
+    if updated:
+        invalidate_home_snapshot()
+        bump_version('blogs')
+    return updated
@@ -0,0 +1,13 @@
+from django.db.backends.mysql import base
+from api.pooling import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def ping_connection(self, connection):
+        connection.ping()
+
+    def _set_autocommit(self, autocommit):
+        # Pooled connections are handed back in autocommit mode, so this is
+        # usually a round trip that changes nothing.
+        if self.connection.get_autocommit() != autocommit:
+            super()._set_autocommit(autocommit)
@@ -0,0 +1,11 @@
+from django.db.backends.sqlite3 import base
+from api.pooling import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """SQLite behind the same pool as mysql_pool, for running the pool
+    locally and in tests. Use a database file: every pooled connection to
+    an in-memory database would see its own empty database."""
+
+    def ping_connection(self, connection):
+        connection.execute('SELECT 1').close()
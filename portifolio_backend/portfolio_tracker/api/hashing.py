@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-in requests in progress, please retry shortly."
+    default_code = 'password_hashing_busy'
+
+
+class HashingPool:
+    """Runs password hashes on a fixed number of threads and refuses work
+    once ``queue_size`` callers are already waiting."""
+
+    def __init__(self, concurrency, queue_size):
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(concurrency + queue_size)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(settings.PASSWORD_HASH_CONCURRENCY, settings.PASSWORD_HASH_QUEUE_SIZE)
+    return _pool
+
+
+def _check(raw_password, encoded):
+    stale = []
+    valid = hashers.check_password(raw_password, encoded, setter=stale.append)
+    return valid, bool(stale)
+
+
+def make_password(raw_password):
+    return get_pool().run(hashers.make_password, raw_password)
+
+
+def verify_password(user, raw_password):
+    """``user.check_password`` on the pool; upgrades stale hashes in place."""
+    valid, stale = get_pool().run(_check, raw_password, user.password)
+    if valid and stale:
+        user.password = make_password(raw_password)
+        user.save(update_fields=['password'])
+    return valid
@@ -0,0 +1,182 @@
+import hashlib
+import io
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.views.static import serve
+from .models import ImageAsset, image_upload_path
+from .tasks import enqueue, task
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional: without Pillow uploads are stored as-is.
+    Image = ImageOps = None
+
+
+# Every stored path embeds the content hash, so a URL never changes meaning.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# (leading bytes, content type, extension), used when Pillow is missing.
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', 'png'),
+    (b'GIF87a', 'image/gif', 'gif'),
+    (b'GIF89a', 'image/gif', 'gif'),
+]
+PIL_FORMATS = {
+    'JPEG': ('image/jpeg', 'jpg'),
+    'PNG': ('image/png', 'png'),
+    'GIF': ('image/gif', 'gif'),
+    'WEBP': ('image/webp', 'webp'),
+}
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def inspect_image(data):
+    """Return ``(content type, extension, width, height)``; the size is None
+    without Pillow."""
+    if Image is None:
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            return 'image/webp', 'webp', None, None
+        for signature, content_type, extension in SIGNATURES:
+            if data.startswith(signature):
+                return content_type, extension, None, None
+        raise InvalidImage("Unsupported image format. Use JPEG, PNG, GIF or WebP.")
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format, (width, height) = image.format, image.size
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise InvalidImage("The uploaded file is not a valid image.")
+    if image_format not in PIL_FORMATS:
+        raise InvalidImage("Unsupported image format. Use JPEG, PNG, GIF or WebP.")
+    return (*PIL_FORMATS[image_format], width, height)
+
+
+def store_upload(owner, uploaded_file):
+    """Save an upload as an ImageAsset and schedule its variants; returns
+    ``(asset, created)``. Bytes the owner already uploaded map to their
+    existing asset, whose variants are retried if they failed; another
+    owner's upload of the same bytes gets its own row over the same file."""
+    data = uploaded_file.read()
+    content_type, extension, width, height = inspect_image(data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    existing = ImageAsset.objects.filter(owner=owner, sha256=sha256).first()
+    if existing is not None:
+        if existing.status == ImageAsset.FAILED:
+            existing.status = ImageAsset.PENDING
+            existing.save(update_fields=['status', 'updated_at'])
+            schedule_variants(existing.pk)
+        return existing, False
+
+    asset = ImageAsset(
+        owner=owner, sha256=sha256, content_type=content_type, width=width, height=height,
+        status=ImageAsset.ORIGINAL if Image is None else ImageAsset.PENDING,
+    )
+    name = image_upload_path(asset, f'original.{extension}')
+    # A previous attempt may have written the file before its row failed.
+    if default_storage.exists(name):
+        asset.original.name = name
+    else:
+        asset.original.save(name, ContentFile(data), save=False)
+    asset.src = asset.original.url
+    try:
+        with transaction.atomic():
+            asset.save()
+    except IntegrityError:
+        # The same bytes were uploaded concurrently.
+        return ImageAsset.objects.get(owner=owner, sha256=sha256), False
+    if asset.status == ImageAsset.PENDING:
+        schedule_variants(asset.pk)
+    return asset, True
+
+
+def schedule_variants(asset_id):
+    enqueue('images.variants', {'id': asset_id}, key=f'images.variants:{asset_id}')
+
+
+def _mark_failed(payload, error):
+    asset = ImageAsset.objects.filter(pk=payload['id']).first()
+    if asset is not None:
+        asset.status = ImageAsset.FAILED
+        asset.save(update_fields=['status', 'updated_at'])
+
+
+@task('images.variants', on_failure=_mark_failed)
+def run_variant_job(payload):
+    try:
+        generate_variants(payload['id'])
+    except ImageAsset.DoesNotExist:
+        pass  # Deleted before its turn came.
+
+
+def variant_widths(width):
+    """Configured widths below ``width``, plus the image itself capped at
+    the largest configured width."""
+    configured = settings.IMAGE_VARIANT_WIDTHS
+    return sorted({w for w in configured if w < width} | {min(width, max(configured))})
+
+
+def _flatten(image):
+    # JPEG has no alpha channel; composite onto white rather than black.
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def _store(name, data):
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return default_storage.url(name)
+
+
+def generate_variants(asset_id):
+    """Write WebP and JPEG copies of the asset at each variant width and
+    record their URLs on it."""
+    if Image is None:
+        return
+    asset = ImageAsset.objects.get(pk=asset_id)
+    with asset.original.open('rb') as handle:
+        with Image.open(handle) as opened:
+            opened.load()
+            image = ImageOps.exif_transpose(opened)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    directory = asset.original.name.rsplit('/', 1)[0]
+    srcset = {'webp': [], 'jpeg': []}
+    for width in variant_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        webp = _encode(resized, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY, method=4)
+        jpeg = _encode(_flatten(resized), 'JPEG', quality=settings.IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+        srcset['webp'].append(f"{_store(f'{directory}/{width}.webp', webp)} {width}w")
+        jpeg_url = _store(f'{directory}/{width}.jpg', jpeg)
+        srcset['jpeg'].append(f"{jpeg_url} {width}w")
+
+    asset.srcset = {kind: ', '.join(entries) for kind, entries in srcset.items()}
+    asset.src = jpeg_url
+    asset.width, asset.height = image.size
+    asset.status = ImageAsset.READY
+    asset.save(update_fields=['srcset', 'src', 'width', 'height', 'status', 'updated_at'])
+
+
+def serve_media(request, path):
+    """Serve uploaded media with long-lived cache headers; meant for
+    deployments without a separate file server or CDN in front."""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -0,0 +1,99 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+MAX_RECORDED_STATEMENTS = 100
+
+_current = ContextVar('api_request_stats', default=None)
+
+
+class RequestStats:
+    """Timings for one request. Lives in a context variable, so queries run
+    through ``sync_to_async`` are attributed to the request that issued them."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = []
+        self.fingerprints = Counter()
+        self.spans = {}
+        self._open = Counter()
+
+    def record(self, sql, params, duration):
+        self.queries += 1
+        self.sql_time += duration
+        # The SQL text alone: it repeats for N+1 lookups that differ only in
+        # their parameters, and formatting every parameter list is not free.
+        self.fingerprints[sql] += 1
+        if len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self.statements.append((sql, duration))
+
+    @property
+    def duplicates(self):
+        """Queries repeated with identical SQL text, beyond the first."""
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current_stats():
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to ``name``; nested spans of the same
+    name (e.g. nested serializers) are only counted once."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    stats._open[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats._open[name] -= 1
+        if not stats._open[name]:
+            stats.spans[name] = stats.spans.get(name, 0.0) + time.perf_counter() - started
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record(sql, params, time.perf_counter() - started)
+
+
+def _install(sender=None, connection=None, **kwargs):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+def install_sql_recorder():
+    """Attach the SQL recorder to current and future connections; it does
+    nothing outside ``collect()``."""
+    connection_created.connect(_install, dispatch_uid='api.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _install(connection=connection)
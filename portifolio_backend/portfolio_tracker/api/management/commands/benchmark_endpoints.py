@@ -0,0 +1,110 @@
+import json
+import platform
+import shutil
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from api import urls
+from api.benchmarking import ROUTES, route_context, run_route, seed_portfolio
+from api.search import rebuild_index
+
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+def compare(baseline, current, latency_threshold, min_latency_delta_ms):
+    regressions = []
+    for scale, routes in current.items():
+        for label, result in routes.items():
+            before = baseline.get(scale, {}).get(label)
+            if before is None:
+                continue
+            where = f"[{scale} comments] {label}"
+            if result['status'] != before['status']:
+                regressions.append(f"{where}: status {before['status']} -> {result['status']}")
+            if result['queries'] > before['queries']:
+                regressions.append(f"{where}: queries {before['queries']} -> {result['queries']}")
+            delta = result['p95_ms'] - before['p95_ms']
+            if delta > min_latency_delta_ms and result['p95_ms'] > before['p95_ms'] * (1 + latency_threshold):
+                regressions.append(f"{where}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database at each scale, time every API route "
+        "through the test client and compare p95 latency, query count and "
+        "status against a baseline file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='10,1000', help="Comma-separated comment counts, e.g. 10,1000,100000.")
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--route', action='append', help="Only run routes with this URL name.")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--update-baseline', action='store_true', help="Write the results as the new baseline.")
+        parser.add_argument('--latency-threshold', type=float, default=0.25, help="Allowed relative p95 increase.")
+        parser.add_argument('--min-latency-delta', type=float, default=5.0, help="Ignore p95 increases below this many ms.")
+
+    def handle(self, *args, **options):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        missing = names - {route.name for route in ROUTES}
+        if missing:
+            raise CommandError(f"No benchmark defined for routes: {', '.join(sorted(missing))}")
+        routes = [route for route in ROUTES if not options['route'] or route.name in options['route']]
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',')]
+        except ValueError:
+            raise CommandError("--scales must be a comma-separated list of integers.")
+
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        # Uploaded files outlive the rolled-back transactions; keep them out of MEDIA_ROOT.
+        media_root = tempfile.mkdtemp(prefix='benchmark-media-')
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                results = {str(scale): self.run_scale(scale, routes, options['iterations']) for scale in scales}
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline'] or not baseline_path.exists():
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            document = {
+                'meta': {'database': connection.vendor, 'python': platform.python_version(), 'iterations': options['iterations']},
+                'results': results,
+            }
+            baseline_path.write_text(json.dumps(document, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote baseline to {baseline_path}"))
+            return
+
+        baseline = json.loads(baseline_path.read_text())['results']
+        regressions = compare(baseline, results, options['latency_threshold'], options['min_latency_delta'])
+        if regressions:
+            raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}"))
+
+    def run_scale(self, scale, routes, iterations):
+        call_command('flush', interactive=False, verbosity=0)
+        admin = seed_portfolio(comments=scale)
+        rebuild_index()
+        context = route_context(admin)
+        self.stdout.write(f"\n{scale} comments")
+        self.stdout.write(f"{'route':<34}{'status':>10}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'bytes':>10}")
+        results = {}
+        for route in routes:
+            result = results[route.label] = run_route(route, context, iterations)
+            status_codes = ','.join(str(code) for code in result['status'])
+            self.stdout.write(
+                f"{route.label:<34}{status_codes:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                f"{result['queries']:>9}{result['bytes']:>10}"
+            )
+        return results
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from api import async_views, views
+from api.benchmarking import BENCHMARK_TITLE, seed_portfolio, simulated_latency, summarize
+from api.views import generate_token
+
+
+# name -> (path, view class name, url kwargs); both modules define the same names.
+ENDPOINTS = {
+    'home': ('/api/home/', 'HomeScreenView', {}),
+    'blogs': ('/api/blogs/?view=summary', 'AdminBlogView', {}),
+    'blog-comments': (f'/api/blog/comments/{BENCHMARK_TITLE}/', 'BlogCommentsView', {'title': BENCHMARK_TITLE}),
+    'project-comments': (f'/api/project/comments/{BENCHMARK_TITLE}/', 'ProjectCommentsView', {'title': BENCHMARK_TITLE}),
+    'profile': ('/api/user-profile/', 'ProfileView', {}),
+}
+
+
+def run_wsgi(view, path, kwargs, headers, requests, concurrency):
+    factory = RequestFactory()
+
+    def client(count):
+        samples = []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = view(factory.get(path, headers=headers), **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = [sample for result in pool.map(client, shares) for sample in result]
+    return samples, time.perf_counter() - started
+
+
+async def run_asgi(view, path, kwargs, headers, requests, concurrency):
+    factory = AsyncRequestFactory()
+
+    async def client(count):
+        samples = []
+        for _ in range(count):
+            started = time.perf_counter()
+            await view(factory.get(path, headers=headers), **kwargs)
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client(count) for count in shares))
+    return [sample for result in results for sample in result], time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the synchronous read views (threaded, as under WSGI) with the "
+        "async ones (one event loop, as under ASGI) against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint and mode.")
+        parser.add_argument('--concurrency', type=int, default=20, help="Concurrent clients (threads for WSGI).")
+        parser.add_argument('--comments', type=int, default=500, help="Comments seeded per post/project.")
+        parser.add_argument('--db-latency', type=float, default=0, help="Milliseconds added to every SQL statement.")
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS), help="Limit to these endpoints.")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            self.compare(options)
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+    def compare(self, options):
+        admin = seed_portfolio(comments=options['comments'])
+        headers = {'Authorization': f'Bearer {generate_token(admin)[0]}'}
+        cache.clear()
+        self.stdout.write(f"{'endpoint':<18}{'mode':<6}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>10}")
+        with simulated_latency(options['db_latency']):
+            for name in options['endpoint'] or ENDPOINTS:
+                path, view_name, kwargs = ENDPOINTS[name]
+                sync_view = getattr(views, view_name).as_view()
+                async_view = getattr(async_views, view_name).as_view()
+                # Warm caches (token principal, home snapshot) outside the timed runs.
+                run_wsgi(sync_view, path, kwargs, headers, 1, 1)
+                asyncio.run(run_asgi(async_view, path, kwargs, headers, 1, 1))
+                for mode, (samples, elapsed) in (
+                    ('wsgi', run_wsgi(sync_view, path, kwargs, headers, options['requests'], options['concurrency'])),
+                    ('asgi', asyncio.run(run_asgi(async_view, path, kwargs, headers, options['requests'], options['concurrency']))),
+                ):
+                    stats = summarize(samples, elapsed)
+                    self.stdout.write(
+                        f"{name:<18}{mode:<6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['throughput_rps']:>10}"
+                    )
@@ -0,0 +1,20 @@
+import sys
+from django.core.management.base import BaseCommand
+from api.portability import iter_export_lines
+
+
+class Command(BaseCommand):
+    help = "Stream users, portfolio content and comments as JSON-lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help="File to write to; '-' for stdout.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        lines = iter_export_lines(chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            sys.stdout.writelines(lines)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(f"Exported portfolio to {options['output']}"))
@@ -0,0 +1,38 @@
+import json
+import sys
+from django.core.management.base import BaseCommand
+from api.counters import reconcile_comment_counts
+from api.portability import ExportEncoder, import_lines
+from api.search import rebuild_index
+from api.snapshots import invalidate_home_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Load JSON-lines written by export_portfolio. Rows that already exist, "
+        "or whose parent can't be found, are skipped and counted; -v 2 lists them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="File to read from; '-' for stdin.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        report = self.report if options['verbosity'] >= 2 else None
+        if options['input'] == '-':
+            totals = import_lines(sys.stdin, batch_size=options['batch_size'], report=report)
+        else:
+            with open(options['input'], encoding='utf-8') as lines:
+                totals = import_lines(lines, batch_size=options['batch_size'], report=report)
+
+        # bulk_create bypasses the signals that keep these in sync.
+        reconcile_comment_counts()
+        rebuild_index()
+        invalidate_home_snapshot()
+
+        for label, (written, existing, unresolved) in totals.items():
+            self.stdout.write(f"{label}: {written} written, {existing} skipped (already present), {unresolved} skipped (unresolved references)")
+        self.stdout.write(self.style.SUCCESS("Import complete"))
+
+    def report(self, model, reason, fields):
+        self.stderr.write(f"Skipped {model._meta.label_lower} ({reason}): {json.dumps(fields, cls=ExportEncoder)}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.counters import reconcile_comment_counts
+from api.snapshots import invalidate_home_snapshot
+from api.tasks import enqueue
+
+
+class Command(BaseCommand):
+    help = "Recompute comment_count and last_commented_at on blog posts and projects."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--enqueue', action='store_true', help="Queue the work for run_tasks instead of running it here.")
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            enqueue('counters.reconcile', {'batch_size': options['batch_size']}, key='counters.reconcile')
+            self.stdout.write(self.style.SUCCESS("Queued comment counter reconciliation"))
+            return
+        updated = reconcile_comment_counts(batch_size=options['batch_size'])
+        invalidate_home_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled comment counters on {updated} rows"))
@@ -0,0 +1,35 @@
+import signal
+from django.core.management.base import BaseCommand
+from api.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks until interrupted (or, with --once, until none are due)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, help="Tasks claimed per round; defaults to TASK_BATCH_SIZE.")
+        parser.add_argument('--poll-interval', type=float, help="Seconds to sleep when idle; defaults to TASK_POLL_INTERVAL.")
+        parser.add_argument('--once', action='store_true', help="Drain the due tasks and exit.")
+
+    def handle(self, *args, **options):
+        worker = Worker(threads=options['threads'], batch_size=options['batch_size'], poll_interval=options['poll_interval'])
+        if options['once']:
+            processed = 0
+            while ran := worker.run_once():
+                processed += ran
+            self.stdout.write(self.style.SUCCESS(f"Ran {processed} tasks"))
+            return
+
+        def shutdown(signum, frame):
+            self.stdout.write("Finishing running tasks...")
+            worker.stop(wait=False)
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        worker.start(daemon=False)
+        self.stdout.write(f"Running tasks on {options['threads']} threads")
+        # Wait in short slices so the signal handlers get to run.
+        while not worker.stopping.wait(1):
+            pass
+        worker.stop(wait=True)
@@ -0,0 +1,259 @@
+import atexit
+import bisect
+import glob
+import ipaddress
+import json
+import math
+import os
+import threading
+import time
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    """Counters, fixed-bucket histograms and callback gauges.
+
+    Each thread writes to its own shard, so recording never takes a lock;
+    shards are only merged when metrics are collected. With
+    METRICS_MULTIPROC_DIR set, every process also flushes its totals to a
+    file there and collection sums the files of all workers, leaving out
+    the gauges of workers that have exited.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def counter(self, name, documentation, labelnames):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames, callback):
+        """``callback()`` returns ``{labels: value}`` and is read at collection."""
+        return self._register(Gauge(self, name, documentation, labelnames, callback))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def snapshot(self):
+        """``{(metric name, labels): value}`` summed over this process's threads."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            # dict.copy() is atomic under the GIL, unlike iterating a dict
+            # another thread may be inserting into.
+            for key, value in shard.copy().items():
+                totals[key] = _add(totals.get(key), value)
+        for metric in list(self.metrics.values()):
+            if metric.kind == 'gauge':
+                for labels, value in metric.callback().items():
+                    totals[(metric.name, labels)] = value
+        return totals
+
+    def collect(self):
+        totals = self.snapshot()
+        directory = settings.METRICS_MULTIPROC_DIR
+        if directory:
+            own = self._path(directory)
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path, encoding='utf-8') as handle:
+                        entries = json.load(handle)
+                except (OSError, ValueError):
+                    continue
+                # Counters and histograms of exited workers still count
+                # towards the totals, or they would go backwards; their
+                # gauges describe a process that no longer exists.
+                alive = _alive(path)
+                for name, labels, value in entries:
+                    metric = self.metrics.get(name)
+                    if not alive and (metric is None or metric.kind == 'gauge'):
+                        continue
+                    key = (name, tuple(labels))
+                    totals[key] = _add(totals.get(key), value)
+        return totals
+
+    def maybe_flush(self):
+        directory = settings.METRICS_MULTIPROC_DIR
+        if not directory or time.monotonic() - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        if self._flush_lock.acquire(blocking=False):
+            try:
+                self.flush(directory)
+            finally:
+                self._flush_lock.release()
+
+    def flush(self, directory=None):
+        directory = directory or settings.METRICS_MULTIPROC_DIR
+        if not directory:
+            return
+        self._last_flush = time.monotonic()
+        entries = [[name, list(labels), value] for (name, labels), value in self.snapshot().items()]
+        path = self._path(directory)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            json.dump(entries, handle)
+        os.replace(temporary, path)
+
+    def _path(self, directory):
+        return os.path.join(directory, f'metrics-{os.getpid()}.json')
+
+    def exposition(self):
+        """Prometheus text format (version 0.0.4)."""
+        totals = self.collect()
+        by_metric = {}
+        for (name, labels), value in totals.items():
+            by_metric.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for labels, value in sorted(by_metric.get(name, [])):
+                lines.extend(metric.render(labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, *labels, amount=1):
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def render(self, labels, value):
+        return [f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}']
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, registry, name, documentation, labelnames, callback):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self, labels, value):
+        return [f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}']
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        # [per-bucket counts..., +Inf count, sum, count]; only this thread
+        # ever mutates its own list.
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def render(self, labels, value):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), value):
+            cumulative += count
+            le = '+Inf' if bound == math.inf else _number(bound)
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames + ("le",), labels + (le,))} {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(value[-2])}')
+        lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {value[-1]}')
+        return lines
+
+
+def _alive(path):
+    try:
+        pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+        os.kill(pid, 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        # Running, under another user.
+        return True
+    return True
+
+
+def is_internal_address(address):
+    """Whether ``address`` is in one of the METRICS_ALLOWED_IPS networks."""
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return any(address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_IPS)
+
+
+def _add(total, value):
+    if total is None:
+        return list(value) if isinstance(value, list) else value
+    if isinstance(value, list):
+        return [a + b for a, b in zip(total, value)]
+    return total + value
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'api_requests_total', "HTTP requests by route, method, status and auth outcome.",
+    ['view', 'method', 'status', 'auth'],
+)
+REQUEST_DURATION = registry.histogram(
+    'api_request_duration_seconds', "Time from request to response by route and method.",
+    ['view', 'method'],
+)
+
+atexit.register(registry.flush)
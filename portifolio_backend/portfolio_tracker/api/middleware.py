@@ -0,0 +1,171 @@
+import logging
+import time
+import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .instrumentation import collect, install_sql_recorder
+from .metrics import REQUESTS, REQUEST_DURATION, registry
+from .routers import ais_pinned, apin_to_primary, is_pinned, pin_to_primary, use_primary
+
+
+logger = logging.getLogger('api.requests')
+
+KNOWN_METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class RequestTimingMiddleware:
+    """Per-request SQL count/time, duplicate queries and span timings (auth,
+    serialize, render), reported as a Server-Timing header. Requests slower
+    than SLOW_REQUEST_MS are logged with their SQL; others only at DEBUG."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install_sql_recorder()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with collect() as stats:
+            response = self.get_response(request)
+            self.report(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        with collect() as stats:
+            response = await self.get_response(request)
+            self.report(request, response, stats)
+        return response
+
+    def report(self, request, response, stats):
+        total_ms = stats.elapsed * 1000
+        sql_ms = stats.sql_time * 1000
+        spans = {name: round(seconds * 1000, 2) for name, seconds in stats.spans.items()}
+        if settings.SERVER_TIMING_HEADER:
+            metrics = [f'db;dur={sql_ms:.2f};desc="{stats.queries} queries, {stats.duplicates} duplicate"']
+            metrics += [f'{name};dur={ms:.2f}' for name, ms in spans.items()]
+            metrics.append(f'total;dur={total_ms:.2f}')
+            response['Server-Timing'] = ', '.join(metrics)
+
+        # Only slow requests are logged by default; the rest go out at DEBUG,
+        # so the record is not even built unless that level is on.
+        slow = total_ms >= settings.SLOW_REQUEST_MS
+        if not slow and not logger.isEnabledFor(logging.DEBUG):
+            return
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'sql_count': stats.queries,
+            'sql_ms': round(sql_ms, 2),
+            'sql_duplicates': stats.duplicates,
+            'spans': spans,
+        }
+        message = "%s %s %s %.1fms sql=%d/%.1fms dup=%d"
+        args = (request.method, request.path, response.status_code, total_ms, stats.queries, sql_ms, stats.duplicates)
+        if slow:
+            record['sql'] = [
+                {'sql': sql, 'duration_ms': round(duration * 1000, 2)}
+                for sql, duration in stats.statements
+            ]
+            logger.warning("Slow request " + message, *args, extra={'request_timing': record})
+        else:
+            logger.debug(message, *args, extra={'request_timing': record})
+
+
+class MetricsMiddleware:
+    """Counts requests and observes their latency, labelled by URL name,
+    status and the auth outcome JWTAuthentication left on the request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, duration):
+        match = request.resolver_match
+        # Unmatched paths share one label so scanners can't blow up cardinality.
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        REQUESTS.inc(view, method, str(response.status_code), getattr(request, 'auth_outcome', 'none'))
+        REQUEST_DURATION.observe(duration, view, method)
+        registry.maybe_flush()
+
+
+def _token_user_id(request):
+    # Routing only: the signature is checked later by JWTAuthentication, and
+    # a forged claim can do no more than send its own reads to the primary.
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    try:
+        payload = jwt.decode(auth_header[7:], options={'verify_signature': False})
+    except jwt.InvalidTokenError:
+        return None
+    return payload.get('user_id')
+
+
+class ReplicaRoutingMiddleware:
+    """Runs writes, and reads by a user who wrote in the last
+    REPLICA_STICKY_SECONDS, entirely against the primary database, so
+    clients always see their own changes. Does nothing without
+    REPLICA_DATABASES."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        user_id = _token_user_id(request)
+        write = request.method not in SAFE_METHODS
+        with use_primary(write or is_pinned(user_id)):
+            response = self.get_response(request)
+        # Failed writes (including rejected tokens) change nothing.
+        if write and response.status_code < 400:
+            pin_to_primary(user_id)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return await self.get_response(request)
+        user_id = _token_user_id(request)
+        write = request.method not in SAFE_METHODS
+        with use_primary(write or await ais_pinned(user_id)):
+            response = await self.get_response(request)
+        if write and response.status_code < 400:
+            await apin_to_primary(user_id)
+        return response
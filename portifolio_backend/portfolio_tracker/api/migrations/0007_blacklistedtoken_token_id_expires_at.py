@@ -0,0 +1,57 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from django.db import migrations, models
+
+
+def hash_existing_tokens(apps, schema_editor):
+    BlacklistedToken = apps.get_model('api', 'BlacklistedToken')
+    for entry in BlacklistedToken.objects.all().iterator(chunk_size=1000):
+        try:
+            exp = jwt.decode(entry.token, options={'verify_signature': False})['exp']
+            expires_at = datetime.fromtimestamp(exp, tz=timezone.utc)
+        except (jwt.InvalidTokenError, KeyError):
+            expires_at = entry.blacklisted_at + timedelta(days=7)
+        entry.token_id = hashlib.sha256(entry.token.encode()).hexdigest()
+        entry.expires_at = expires_at
+        entry.save(update_fields=['token_id', 'expires_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_blogcomment_projectcomment_delete_comment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blacklistedtoken',
+            name='token_id',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='blacklistedtoken',
+            name='expires_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(hash_existing_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='blacklistedtoken',
+            name='token',
+        ),
+        migrations.AlterField(
+            model_name='blacklistedtoken',
+            name='token_id',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='blacklistedtoken',
+            name='expires_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='blacklistedtoken',
+            index=models.Index(fields=['expires_at'], name='blacklisted_expires_d1bb66_idx'),
+        ),
+    ]
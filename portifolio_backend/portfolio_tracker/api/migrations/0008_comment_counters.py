@@ -0,0 +1,48 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_counters(apps, schema_editor):
+    for parent_name, comment_name, fk_name in [
+        ('BlogPost', 'BlogComment', 'blog_post'),
+        ('Project', 'ProjectComment', 'project'),
+    ]:
+        parent_model = apps.get_model('api', parent_name)
+        comment_model = apps.get_model('api', comment_name)
+        comments = comment_model.objects.filter(**{fk_name: OuterRef('pk')}).order_by().values(fk_name)
+        parent_model.objects.update(
+            comment_count=Coalesce(Subquery(comments.annotate(n=Count('pk')).values('n'), output_field=IntegerField()), 0),
+            last_commented_at=Subquery(comments.annotate(latest=Max('created_at')).values('latest')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_blacklistedtoken_token_id_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_comment_counters, migrations.RunPython.noop),
+    ]
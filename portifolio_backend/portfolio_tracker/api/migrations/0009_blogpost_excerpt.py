@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+EXCERPT_LENGTH = 200
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    text = ' '.join(content.split())
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(' ', 1)[0] + '…'
+
+
+def backfill_excerpts(apps, schema_editor):
+    BlogPost = apps.get_model('api', 'BlogPost')
+    for blog in BlogPost.objects.only('id', 'content').iterator(chunk_size=500):
+        BlogPost.objects.filter(pk=blog.pk).update(excerpt=make_excerpt(blog.content))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_comment_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def lowercase_emails(apps, schema_editor):
+    CustomUser = apps.get_model('api', 'CustomUser')
+    # Compared in Python: MySQL's default collation treats email = LOWER(email)
+    # as true for every row.
+    mixed = [
+        (pk, email) for pk, email in CustomUser.objects.values_list('pk', 'email').iterator()
+        if email != email.lower()
+    ]
+    for pk, email in mixed:
+        lowered = email.lower()
+        if CustomUser.objects.filter(email=lowered).exclude(pk=pk).exists():
+            raise RuntimeError(
+                f"Cannot lowercase {email!r}: {lowered!r} belongs to another user. "
+                "Merge or rename one of the accounts and re-run the migration."
+            )
+        CustomUser.objects.filter(pk=pk).update(email=lowered)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_searchdocument_searchposting'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+    ]
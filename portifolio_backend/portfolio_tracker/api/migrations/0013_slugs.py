@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.utils.text import slugify
+
+SLUG_BASE_LENGTH = 100
+
+
+def populate_slugs(apps, schema_editor):
+    for model_name in ('BlogPost', 'Project'):
+        model = apps.get_model('api', model_name)
+        taken = set()
+        for obj in model.objects.only('id', 'title').order_by('pk').iterator(chunk_size=500):
+            base = slug = slugify(obj.title)[:SLUG_BASE_LENGTH].strip('-') or model_name.lower()
+            suffix = 2
+            while slug in taken:
+                slug = f'{base}-{suffix}'
+                suffix += 1
+            taken.add(slug)
+            model.objects.filter(pk=obj.pk).update(slug=slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_customuser_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='slug',
+            field=models.SlugField(blank=True, db_index=False, editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='slug',
+            field=models.SlugField(blank=True, db_index=False, editable=False, max_length=120),
+        ),
+        migrations.RunPython(populate_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='blogpost',
+            name='slug',
+            field=models.SlugField(blank=True, editable=False, max_length=120, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='slug',
+            field=models.SlugField(blank=True, editable=False, max_length=120, unique=True),
+        ),
+    ]
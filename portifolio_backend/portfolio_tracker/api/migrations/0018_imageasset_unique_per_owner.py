@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_customuser_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imageasset',
+            name='sha256',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='imageasset',
+            constraint=models.UniqueConstraint(fields=('owner', 'sha256'), name='unique_image_per_owner'),
+        ),
+    ]
@@ -1,14 +1,74 @@
+import re
+from functools import reduce
+from operator import or_
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.validators import RegexValidator
+from django.utils.text import slugify
+from .hashing import make_password
+
+EXCERPT_LENGTH = 200
+SLUG_BASE_LENGTH = 100
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    text = ' '.join(content.split())
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(' ', 1)[0] + '…'
+
+
+def slug_base(obj):
+    return slugify(obj.title)[:SLUG_BASE_LENGTH].strip('-') or obj._meta.model_name
+
+
+def _slug_matches(slug, base):
+    return slug == base or re.fullmatch(re.escape(base) + r'-\d+', slug) is not None
+
+
+def assign_slugs(instances):
+    """Give every instance whose slug no longer matches its title a unique
+    one (``base``, ``base-2``, ...), with one query for the whole batch."""
+    pending = [obj for obj in instances if not obj.slug or not _slug_matches(obj.slug, slug_base(obj))]
+    if not pending:
+        return
+    model = type(pending[0])
+    bases = {slug_base(obj) for obj in pending}
+    taken = set(
+        model.objects.filter(reduce(or_, (Q(slug__startswith=base) for base in bases)))
+        .exclude(pk__in=[obj.pk for obj in pending if obj.pk])
+        .values_list('slug', flat=True)
+    )
+    for obj in pending:
+        base = slug = slug_base(obj)
+        suffix = 2
+        while slug in taken:
+            slug = f'{base}-{suffix}'
+            suffix += 1
+        taken.add(slug)
+        obj.slug = slug
+
 
 class CustomUserManager(BaseUserManager):
+    @classmethod
+    def normalize_email(cls, email):
+        # Emails are stored lowercased so logins can use the unique index
+        # with an exact match instead of an iexact scan.
+        return super().normalize_email(email).lower()
+
+    def get_by_natural_key(self, username):
+        return self.get(**{self.model.USERNAME_FIELD: self.normalize_email(username)})
+
     def create_user(self, email, fullname, password=None, **extra_fields):
         if not email:
             raise ValueError("The Email field must be set")
         email = self.normalize_email(email)
         user = self.model(email=email, fullname=fullname, **extra_fields)
-        user.set_password(password)
+        if password is None:
+            user.set_unusable_password()
+        else:
+            user.password = make_password(password)
         user.save(using=self._db)
         return user
 
@@ -22,6 +82,10 @@ class CustomUser(AbstractUser):
     fullname = models.CharField(max_length=50, validators=[RegexValidator(r'^[a-zA-Z\s-]+$', 'Full name can only contain letters, spaces, or hyphens.')])
     username = models.CharField(max_length=150, unique=False, blank=True, null=True)
     profile_url = models.URLField(max_length=1250, blank=True, null=True) 
+    profile_image = models.ForeignKey('ImageAsset', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    # Embedded in every token as 'ver'; bumping it invalidates them all.
+    token_version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
     
     objects = CustomUserManager()
 
@@ -29,6 +93,8 @@ class CustomUser(AbstractUser):
     REQUIRED_FIELDS = ['fullname']
 
     def save(self, *args, **kwargs):
+        if self.email:
+            self.email = CustomUserManager.normalize_email(self.email)
         if not self.username:  
             self.username = self.fullname.lower().replace(' ', '_')[:150]
         super().save(*args, **kwargs)
@@ -40,15 +106,18 @@ class AdminProfile(models.Model):
     country = models.CharField(max_length=50, unique=True, blank=True, null=True)
     city = models.CharField(max_length=100, unique=True, blank=True, null=True)
     about_me = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class BlacklistedToken(models.Model):
-    token = models.CharField(max_length=500, unique=True)
+    # SHA-256 hex digest of the raw JWT, so the unique index stays fixed-width.
+    token_id = models.CharField(max_length=64, unique=True)
     blacklisted_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
 
     class Meta:
         db_table = 'blacklisted_tokens'
-        indexes = [models.Index(fields=['blacklisted_at'])]
+        indexes = [models.Index(fields=['blacklisted_at']), models.Index(fields=['expires_at'])]
 
 
 class Skill(models.Model):
@@ -63,33 +132,63 @@ class Skill(models.Model):
 class Project(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='project_set') 
     title = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=120, unique=True, blank=True, editable=False)
     description = models.TextField(blank=True)
     image = models.URLField(blank=True, null=True)
+    image_asset = models.ForeignKey('ImageAsset', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    comment_count = models.PositiveIntegerField(default=0)
+    last_commented_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['user', 'title']  
         indexes = [models.Index(fields=['user'])]  
 
+    def save(self, *args, **kwargs):
+        assign_slugs([self])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'title' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'slug'}
+        super().save(*args, **kwargs)
+
 
 class BlogPost(models.Model):
     title = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=120, unique=True, blank=True, editable=False)
     content = models.TextField()
+    excerpt = models.CharField(max_length=300, blank=True, editable=False)
     category = models.CharField(max_length=100)
     image = models.URLField(blank=True, null=True)  
+    image_asset = models.ForeignKey('ImageAsset', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='blogs')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-
+    comment_count = models.PositiveIntegerField(default=0)
+    last_commented_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         indexes = [models.Index(fields=['author'])]
 
+    def save(self, *args, **kwargs):
+        self.excerpt = make_excerpt(self.content)
+        assign_slugs([self])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields}
+            if 'content' in update_fields:
+                kwargs['update_fields'].add('excerpt')
+            if 'title' in update_fields:
+                kwargs['update_fields'].add('slug')
+        super().save(*args, **kwargs)
+
 
 class BlogComment(models.Model):
     blog_post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='blog_comments')
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='blog_comments')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Indexed for api/sync/, which looks up comments changed since a token.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         indexes = [models.Index(fields=['blog_post', 'created_at'])]
@@ -100,6 +199,94 @@ class ProjectComment(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='project_comments')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Indexed for api/sync/, which looks up comments changed since a token.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         indexes = [models.Index(fields=['project', 'created_at'])]
+
+
+class SearchDocument(models.Model):
+    kind = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    length = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+
+
+class SearchPosting(models.Model):
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    frequency = models.PositiveIntegerField()
+
+    class Meta:
+        # The leading `term` column doubles as the lookup index for queries.
+        unique_together = ['term', 'document']
+
+
+def image_upload_path(instance, filename):
+    # Content-addressed, so a stored file never changes and can be cached forever.
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+    return f'images/{instance.sha256[:2]}/{instance.sha256}/original.{extension}'
+
+
+class ImageAsset(models.Model):
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    # Stored as uploaded; Pillow isn't installed, so no variants are made.
+    ORIGINAL = 'original'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (READY, 'Ready'), (FAILED, 'Failed'), (ORIGINAL, 'Original only')]
+
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='image_assets')
+    original = models.FileField(upload_to=image_upload_path, max_length=255)
+    sha256 = models.CharField(max_length=64)
+    content_type = models.CharField(max_length=50)
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # Fallback URL for clients that ignore srcset: the largest JPEG variant
+    # once generated, the original until then.
+    src = models.CharField(max_length=500)
+    # {"webp": "<url> 320w, <url> 640w, ...", "jpeg": "..."}
+    srcset = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Rows are per owner; owners uploading the same bytes share the file.
+        constraints = [models.UniqueConstraint(fields=['owner', 'sha256'], name='unique_image_per_owner')]
+
+
+class Task(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Set while queued only: enqueueing the same key again is a no-op until a
+    # worker picks the task up, so repeated writes collapse into one run.
+    key = models.CharField(max_length=200, unique=True, blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField()
+    # A running task whose worker died is picked up again after this.
+    locked_until = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'api_tasks'
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+
+class Tombstone(models.Model):
+    """A deleted row, kept for SYNC_TOMBSTONE_RETENTION_DAYS so api/sync/ can
+    tell clients to drop their copy."""
+    kind = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,186 @@
+import base64
+import json
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Seek pagination over ``(created_at, id)``.
+
+    Pages are fetched with ``WHERE (created_at, id) < (c, i) ORDER BY
+    created_at DESC, id DESC LIMIT n + 1`` (or the ascending mirror), which the
+    ``(parent, created_at)`` comment indexes serve directly; InnoDB appends the
+    primary key to every secondary index, so the ``id`` tiebreak is free too.
+    No ``COUNT(*)`` is issued unless ``include_total`` is passed.
+    """
+
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    total_query_param = 'include_total'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None, total=None):
+        # Callers that keep a denormalized count pass it as ``total``, or a
+        # callable returning it so the lookup only runs when a count is asked for.
+        page_queryset = self.get_page_queryset(queryset, request)
+        if self.wants_total():
+            self.total = total() if callable(total) else total
+            if self.total is None:
+                self.total = queryset.count()
+        return self.finish_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None, total=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        if self.wants_total():
+            self.total = await total() if callable(total) else total
+            if self.total is None:
+                self.total = await queryset.acount()
+        return self.finish_page([row async for row in page_queryset])
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_page_size(request)
+        self.newest_first = request.query_params.get(self.ordering_query_param, 'newest') != 'oldest'
+        self.position, self.reverse = self.decode_cursor(request)
+        self.total = None
+
+        # Walking backwards through the pages flips the scan direction.
+        descending = self.newest_first != self.reverse
+        if self.position is not None:
+            created_at, pk = self.position
+            if descending:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+        ordering = ('-created_at', '-id') if descending else ('created_at', 'id')
+        return queryset.order_by(*ordering)[:self.limit + 1]
+
+    def finish_page(self, rows):
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if self.reverse:
+            rows.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        self.rows = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def wants_total(self):
+        return self.request.query_params.get(self.total_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            created_at = parse_datetime(data['c'])
+            pk = int(data['i'])
+            reverse = bool(data.get('r', False))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (created_at, pk), reverse
+
+    def encode_cursor(self, row, reverse):
+        data = {'c': row.created_at.isoformat(), 'i': row.pk}
+        if reverse:
+            data['r'] = True
+        encoded = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        body = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.wants_total():
+            body['count'] = self.total
+        return Response(body)
+
+
+class CanonicalPageNumberPagination(PageNumberPagination):
+    """Page number pagination over a canonical URL: the path plus the page
+    number and whichever params the view recognises, normalised and sorted.
+    Views cache bodies and ETags by it, so junk or reordered query strings
+    share one entry, and the page links are built from it as well."""
+
+    def canonical_url(self, request, **params):
+        page = request.query_params.get(self.page_query_param, '')
+        if page.isdigit():
+            page = str(int(page))
+        query = {name: value for name, value in params.items() if value is not None}
+        if page not in ('', '1'):
+            query[self.page_query_param] = page
+        self.base_url = request.build_absolute_uri(request.path)
+        if query:
+            self.base_url += '?' + urlencode(sorted(query.items()))
+        return self.base_url
+
+    def get_next_link(self):
+        if not self.page.has_next():
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.page.next_page_number())
+
+    def get_previous_link(self):
+        if not self.page.has_previous():
+            return None
+        page_number = self.page.previous_page_number()
+        if page_number == 1:
+            return remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(self.base_url, self.page_query_param, page_number)
+
+
+class AsyncPageNumberPagination(CanonicalPageNumberPagination):
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        count = await queryset.acount()
+        # Paginate a range of the right length so Django's Page does the page
+        # arithmetic and DRF's get_paginated_response works unchanged.
+        paginator = self.django_paginator_class(range(count), page_size)
+        page_number = self.get_page_number(request, paginator)
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        if not count:
+            return []
+        return [row async for row in queryset[self.page.start_index() - 1:self.page.end_index()]]
@@ -0,0 +1,276 @@
+import os
+import threading
+import time
+from collections import deque
+from .metrics import registry
+
+
+POOL_CHECKOUT_WAIT = registry.histogram(
+    'db_pool_checkout_wait_seconds', "Time spent waiting for a pooled database connection.",
+    ['alias'], buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+POOL_TIMEOUTS = registry.counter(
+    'db_pool_checkout_timeouts_total', "Checkouts that gave up after the pool's TIMEOUT.", ['alias'],
+)
+POOL_CLOSED = registry.counter(
+    'db_pool_connections_closed_total', "Pooled connections closed, by reason.", ['alias', 'reason'],
+)
+POOL_OPENED = registry.counter(
+    'db_pool_connections_opened_total', "Connections opened by the pool.", ['alias'],
+)
+
+DEFAULTS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    # Seconds to wait for a free connection before failing the query.
+    'TIMEOUT': 10.0,
+    # Connections older than this are closed instead of reused.
+    'MAX_LIFETIME': 30 * 60,
+    # Idle connections beyond MIN_SIZE are closed after this long.
+    'MAX_IDLE': 5 * 60,
+    # Reused connections idle for longer than this are pinged first.
+    'PING_AFTER': 5.0,
+}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Entry:
+    __slots__ = ('connection', 'created', 'last_used', 'suspect')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created = self.last_used = time.monotonic()
+        self.suspect = False
+
+
+class ConnectionPool:
+    """A bounded set of raw DB-API connections shared by the threads of one
+    process. ``connect``, ``ping`` and ``close`` are supplied by the
+    database backend; blocking only ever happens in ORM threads, never on
+    the event loop."""
+
+    def __init__(self, alias, connect, ping, close, options=None):
+        options = {**DEFAULTS, **(options or {})}
+        self.alias = alias
+        self.min_size = options['MIN_SIZE']
+        self.max_size = options['MAX_SIZE']
+        self.timeout = options['TIMEOUT']
+        self.max_lifetime = options['MAX_LIFETIME']
+        self.max_idle = options['MAX_IDLE']
+        self.ping_after = options['PING_AFTER']
+        self._connect = connect
+        self._ping = ping
+        self._close = close
+        self._condition = threading.Condition()
+        # Most recently used at the right, so hot connections are reused and
+        # the rest age out from the left.
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self.pid = os.getpid()
+
+    def stats(self):
+        with self._condition:
+            return {'in_use': len(self._in_use), 'idle': len(self._idle)}
+
+    def warm(self):
+        """Open connections up to MIN_SIZE."""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = self._open()
+            except Exception:
+                self._forget()
+                raise
+            with self._condition:
+                self._idle.appendleft(entry)
+                self._condition.notify()
+
+    def checkout(self):
+        """Return ``(raw connection, reused)``."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._condition:
+            while True:
+                stale = self._prune_idle()
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    POOL_TIMEOUTS.inc(self.alias)
+                    raise PoolTimeout(
+                        f"No connection to '{self.alias}' became free within {self.timeout}s "
+                        f"({self.max_size} in use)."
+                    )
+                self._condition.wait(remaining)
+        POOL_CHECKOUT_WAIT.observe(time.monotonic() - started, self.alias)
+        for old in stale:
+            self._discard(old, 'idle')
+
+        if entry is not None and not self._usable(entry):
+            entry = None
+        reused = entry is not None
+        if entry is None:
+            try:
+                entry = self._open()
+            except Exception:
+                self._forget()
+                raise
+        with self._condition:
+            self._in_use[id(entry.connection)] = entry
+        return entry.connection, reused
+
+    def release(self, connection, discard=False, suspect=False):
+        """Hand ``connection`` back. ``discard`` closes it (e.g. it was
+        left mid-transaction); ``suspect`` makes the next checkout ping it."""
+        with self._condition:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            # Not ours (e.g. checked out before a pool reset); just close it.
+            self._close(connection)
+            return
+        if discard or self._expired(entry):
+            self._discard(entry, 'discarded' if discard else 'lifetime')
+            return
+        entry.last_used = time.monotonic()
+        entry.suspect = suspect
+        with self._condition:
+            self._idle.append(entry)
+            self._condition.notify()
+
+    def close_all(self):
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for entry in idle:
+            self._discard(entry, 'shutdown')
+
+    def _open(self):
+        entry = _Entry(self._connect())
+        POOL_OPENED.inc(self.alias)
+        return entry
+
+    def _expired(self, entry):
+        return time.monotonic() - entry.created > self.max_lifetime
+
+    def _usable(self, entry):
+        if self._expired(entry):
+            self._discard(entry, 'lifetime', forget=False)
+            return False
+        if entry.suspect or time.monotonic() - entry.last_used > self.ping_after:
+            try:
+                self._ping(entry.connection)
+            except Exception:
+                self._discard(entry, 'unhealthy', forget=False)
+                return False
+        return True
+
+    def _prune_idle(self):
+        # Called with the lock held; the caller closes what is returned.
+        stale = []
+        now = time.monotonic()
+        while self._idle and self._size - len(stale) > self.min_size and now - self._idle[0].last_used > self.max_idle:
+            stale.append(self._idle.popleft())
+        return stale
+
+    def _discard(self, entry, reason, forget=True):
+        # forget=False keeps the slot for the replacement the caller opens.
+        try:
+            self._close(entry.connection)
+        except Exception:
+            pass
+        POOL_CLOSED.inc(self.alias, reason)
+        if forget:
+            self._forget()
+
+    def _forget(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, ping, close, options):
+    pool = _pools.get(alias)
+    # A forked worker must not share its parent's sockets; the inherited
+    # connections are dropped without closing them.
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None or pool.pid != os.getpid():
+                pool = _pools[alias] = ConnectionPool(alias, connect, ping, close, options)
+                created = True
+            else:
+                created = False
+        if created:
+            pool.warm()
+    return pool
+
+
+def _occupancy():
+    values = {}
+    for alias, pool in list(_pools.items()):
+        if pool.pid == os.getpid():
+            for state, count in pool.stats().items():
+                values[(alias, state)] = count
+    return values
+
+
+registry.gauge('db_pool_connections', "Pooled database connections by state.", ['alias', 'state'], _occupancy)
+
+
+class PooledDatabaseWrapperMixin:
+    """Mix into a backend's DatabaseWrapper so Django's connect/close check
+    connections out of, and back into, a per-process ConnectionPool.
+    Configure with a ``POOL`` dict in the DATABASES entry (see DEFAULTS)
+    and leave CONN_MAX_AGE at 0 so each request returns its connection."""
+
+    _pool_reused = False
+
+    def ping_connection(self, connection):
+        raise NotImplementedError
+
+    def get_pool(self, conn_params):
+        return get_pool(
+            self.alias,
+            lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params),
+            self.ping_connection,
+            lambda connection: connection.close(),
+            self.settings_dict.get('POOL'),
+        )
+
+    def get_new_connection(self, conn_params):
+        try:
+            connection, self._pool_reused = self.get_pool(conn_params).checkout()
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+        return connection
+
+    def init_connection_state(self):
+        # Session settings survive on a reused connection.
+        if not self._pool_reused:
+            super().init_connection_state()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = _pools.get(self.alias)
+        if pool is None or pool.pid != os.getpid():
+            return super()._close()
+        # Closed mid-transaction: rolling back costs as much as reconnecting
+        # and is easier to get wrong, so the connection is dropped.
+        discard = self.in_atomic_block or not self.autocommit
+        pool.release(self.connection, discard=discard, suspect=self.errors_occurred)
@@ -0,0 +1,210 @@
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from functools import reduce
+from operator import or_
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import DateTimeField, Q
+from django.utils import timezone
+from .models import assign_slugs, CustomUser, AdminProfile, Skill, Project, BlogPost, BlogComment, ProjectComment, ImageAsset
+
+
+# Parents come before children so foreign keys always resolve on import.
+EXPORT_MODELS = [CustomUser, AdminProfile, Skill, Project, BlogPost, BlogComment, ProjectComment]
+
+NATURAL_KEYS = {
+    CustomUser: ['email'],
+    Project: ['user__email', 'title'],
+    BlogPost: ['title'],
+}
+
+# Columns (after foreign keys are resolved) that identify a row already
+# present, so re-running an import skips it rather than adding it twice.
+IDENTITIES = {
+    CustomUser: ['email'],
+    AdminProfile: ['user_id'],
+    Skill: ['user_id', 'name'],
+    Project: ['user_id', 'title'],
+    BlogPost: ['title'],
+    BlogComment: ['blog_post_id', 'user_id', 'created_at'],
+    ProjectComment: ['project_id', 'user_id', 'created_at'],
+}
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder truncates to milliseconds; keep the full value so
+        # (created_at, id) ordering survives a round trip.
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _columns(model):
+    """Return ``(plain field names, {fk name: [natural key paths]})``."""
+    plain, foreign = [], {}
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        if field.is_relation and field.related_model is ImageAsset:
+            # Uploaded files aren't part of the export, so neither are references to them.
+            continue
+        if field.is_relation:
+            foreign[field.name] = [f'{field.name}__{path}' for path in NATURAL_KEYS[field.related_model]]
+        else:
+            plain.append(field.name)
+    return plain, foreign
+
+
+def _keyset(queryset, columns, chunk_size):
+    # Batches by primary key rather than iterator(): mysqlclient buffers a
+    # whole result set on the client, so only bounded queries keep memory flat.
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', *columns)[:chunk_size])
+        for row in rows:
+            yield row[1:]
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def iter_export_lines(chunk_size=2000):
+    encoder = ExportEncoder(separators=(',', ':'))
+    for model in EXPORT_MODELS:
+        plain, foreign = _columns(model)
+        paths = [path for key_paths in foreign.values() for path in key_paths]
+        for row in _keyset(model.objects.all(), [*plain, *paths], chunk_size):
+            fields = dict(zip(plain, row))
+            position = len(plain)
+            for name, key_paths in foreign.items():
+                key = row[position:position + len(key_paths)]
+                fields[name] = key[0] if len(key) == 1 else list(key)
+                position += len(key_paths)
+            yield encoder.encode({'model': model._meta.label_lower, 'fields': fields}) + '\n'
+
+
+@contextmanager
+def preserved_timestamps(models):
+    # bulk_create runs pre_save(add=True), which would stamp auto_now and
+    # auto_now_add columns with the import time instead of the exported one.
+    patched = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                patched.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in patched:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def resolve_natural_keys(model, keys):
+    """``{natural key: pk}`` for those of ``keys`` that exist. Nothing is
+    kept between batches, so memory doesn't grow with the number of users."""
+    if not keys:
+        return {}
+    paths = NATURAL_KEYS[model]
+    if len(paths) == 1:
+        condition = Q(**{f'{paths[0]}__in': [key[0] for key in keys]})
+    else:
+        condition = reduce(or_, (Q(**dict(zip(paths, key))) for key in keys))
+    return {tuple(key): pk for *key, pk in model.objects.filter(condition).values_list(*paths, 'pk')}
+
+
+def _existing(model, records):
+    """Identities of ``records`` that are already stored."""
+    fields = IDENTITIES[model]
+    values = {name: {record[name] for record in records} for name in fields}
+    # Each column narrows the candidates; the exact match is done here.
+    rows = model.objects.filter(**{f'{name}__in': values[name] for name in fields}).values_list(*fields)
+    return set(rows) if len(fields) > 1 else {(value,) for value, in rows}
+
+
+def _as_key(value):
+    return tuple(value) if isinstance(value, list) else (value,)
+
+
+def _flush(model, records, report):
+    """Write ``records``; returns ``(written, existing, unresolved)`` counts.
+    ``report(model, reason, fields)`` is called for every skipped row."""
+    plain, foreign = _columns(model)
+    total = len(records)
+    for name in foreign:
+        related_model = model._meta.get_field(name).related_model
+        ids = resolve_natural_keys(related_model, {_as_key(record[name]) for record in records})
+        resolved = []
+        for record in records:
+            record[f'{name}_id'] = ids.get(_as_key(record[name]))
+            if record[f'{name}_id'] is None:
+                report(model, f'no {name} {record[name]!r}', record)
+            else:
+                del record[name]
+                resolved.append(record)
+        records = resolved
+    unresolved = total - len(records)
+    # Exports from before a timestamp column existed don't carry it.
+    stamped = [field.name for field in model._meta.concrete_fields if isinstance(field, DateTimeField) and not field.null and not field.has_default()]
+    now = timezone.now()
+    for record in records:
+        for name in stamped:
+            record.setdefault(name, now)
+    # Rows that are already there (e.g. an import being re-run) are skipped.
+    identity = [model._meta.get_field(name) for name in IDENTITIES[model]]
+    for record in records:
+        for field in identity:
+            record[field.attname] = field.to_python(record[field.attname])
+    existing = _existing(model, records) if records else set()
+    fresh = []
+    for record in records:
+        if tuple(record[field.attname] for field in identity) in existing:
+            report(model, 'already exists', record)
+        else:
+            fresh.append(record)
+    instances = [model(**record) for record in fresh]
+    if model in (Project, BlogPost):
+        # A new row whose exported slug belongs to another row gets a fresh
+        # one, as do exports from before slugs existed.
+        taken = set(model.objects.filter(slug__in=[instance.slug for instance in instances if instance.slug]).values_list('slug', flat=True))
+        for instance in instances:
+            if instance.slug in taken:
+                instance.slug = ''
+        assign_slugs([instance for instance in instances if not instance.slug])
+    with transaction.atomic():
+        model.objects.bulk_create(instances)
+    return len(instances), len(records) - len(fresh), unresolved
+
+
+def import_lines(lines, batch_size=1000, report=None):
+    """Load JSON-lines produced by ``iter_export_lines``; returns
+    ``{model label: (written, existing, unresolved)}``, counting rows
+    written, skipped as already present and skipped for a missing parent.
+    ``report(model, reason, fields)`` is told about each skipped row."""
+    models = {model._meta.label_lower: model for model in EXPORT_MODELS}
+    report = report or (lambda model, reason, fields: None)
+    totals = {}
+    current, buffer = None, []
+
+    def flush():
+        if buffer:
+            counts = _flush(current, buffer, report)
+            done = totals.setdefault(current._meta.label_lower, [0, 0, 0])
+            for index, count in enumerate(counts):
+                done[index] += count
+            buffer.clear()
+
+    with preserved_timestamps(EXPORT_MODELS):
+        for line in lines:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            model = models[entry['model']]
+            if model is not current or len(buffer) >= batch_size:
+                flush()
+                current = model
+            buffer.append(entry['fields'])
+        flush()
+    return {label: tuple(counts) for label, counts in totals.items()}
@@ -0,0 +1,79 @@
+from functools import lru_cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class QueryPlan:
+    def __init__(self, select_related, prefetches, only):
+        self.select_related = select_related
+        # (lookup, related model, nested QueryPlan)
+        self.prefetches = prefetches
+        # None when some field reads a non-column attribute and the row
+        # therefore has to be loaded in full.
+        self.only = only
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetches:
+            queryset = queryset.prefetch_related(*[
+                Prefetch(lookup, queryset=plan.apply(model._default_manager.all()))
+                for lookup, model, plan in self.prefetches
+            ])
+        if self.only is not None:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def _walk(model, serializer, prefix, plan):
+    fields = []
+    complete = True
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or '.' in field.source or isinstance(field, serializers.SerializerMethodField):
+            complete = False
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            complete = False
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            related_model = model_field.related_model
+            child_plan = QueryPlan([], [], [])
+            child_only = _walk(related_model, field.child, '', child_plan)
+            if child_only is not None and model_field.one_to_many and model_field.field.name not in child_only:
+                # The prefetch joins rows back through the reverse FK column.
+                child_only.append(model_field.field.name)
+            child_plan.only = child_only
+            plan.prefetches.append((prefix + field.source, related_model, child_plan))
+        elif isinstance(field, serializers.BaseSerializer):
+            path = prefix + field.source
+            plan.select_related.append(path)
+            if model_field.concrete:
+                fields.append(field.source)
+            nested = _walk(model_field.related_model, field, path + '__', plan)
+            if nested is None:
+                complete = False
+            else:
+                fields.extend(field.source + '__' + name for name in nested)
+        elif model_field.concrete:
+            fields.append(field.source)
+        else:
+            complete = False
+    return fields if complete else None
+
+
+@lru_cache(maxsize=None)
+def get_query_plan(model, serializer_class):
+    plan = QueryPlan([], [], [])
+    plan.only = _walk(model, serializer_class(), '', plan)
+    return plan
+
+
+def plan_queryset(queryset, serializer_class):
+    """Apply the select_related/prefetch_related/only() calls needed to render
+    ``serializer_class`` over ``queryset`` without per-row queries."""
+    return get_query_plan(queryset.model, serializer_class).apply(queryset)
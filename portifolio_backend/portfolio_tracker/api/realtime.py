@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+from .metrics import registry
+from .models import BlogComment, ProjectComment
+from .prefetch import plan_queryset
+from .renderers import FastJSONRenderer
+from .routers import use_primary
+from .serializers import SyncBlogCommentSerializer, SyncProjectCommentSerializer
+
+try:
+    import redis
+except ImportError:  # Optional; only RedisBackend needs it.
+    redis = None
+
+
+logger = logging.getLogger(__name__)
+
+# kind -> (comment model, comment FK name, serializer); events carry the
+# api/sync/ representation, with the parent by id: subscribers already have
+# the post, and nesting it would send its whole content with every comment.
+STREAMS = {
+    'blog': (BlogComment, 'blog_post', SyncBlogCommentSerializer),
+    'project': (ProjectComment, 'project', SyncProjectCommentSerializer),
+}
+
+
+def channel_name(kind, parent_id):
+    return f'{kind}:{parent_id}'
+
+
+def comment_frame(comment, serializer_class):
+    """One SSE message; the id lets a reconnecting client resume after it."""
+    data = FastJSONRenderer().render(serializer_class(comment).data)
+    return b'id: %d\nevent: comment\ndata: %s\n\n' % (comment.pk, data)
+
+
+def render_comments(kind, queryset):
+    serializer_class = STREAMS[kind][2]
+    return [(comment.pk, comment_frame(comment, serializer_class)) for comment in plan_queryset(queryset, serializer_class)]
+
+
+class Subscription:
+    """A subscriber's undelivered frames. Kept small on purpose: an idle
+    subscriber costs this object and its response generator, nothing else."""
+
+    __slots__ = ('channel', 'loop', 'pending', 'ready', 'overflowed')
+
+    def __init__(self, channel, loop, ready):
+        self.channel = channel
+        self.loop = loop
+        self.pending = deque()
+        self.ready = ready
+        self.overflowed = False
+
+    def push(self, event_id, frame):
+        # Runs on the subscriber's event loop.
+        if len(self.pending) >= settings.REALTIME_QUEUE_SIZE:
+            # Too slow to keep up: end its stream; it resumes from the
+            # database with Last-Event-ID.
+            self.overflowed = True
+        else:
+            self.pending.append((event_id, frame))
+        self.ready.set()
+
+
+class Hub:
+    """In-process fan-out from channels to subscribed SSE responses.
+
+    ``deliver`` may be called from any thread; each comment is rendered
+    once, only if someone in this process is listening, and handed to the
+    subscribers' event loops. ``deliver_later`` does the same on the hub's
+    own thread, so a writer's commit does not wait for the render.
+    """
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='realtime-render')
+
+    def subscribe(self, channel, loop, ready):
+        subscription = Subscription(channel, loop, ready)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+    def _subscribers(self, kind, parent_id):
+        with self._lock:
+            return list(self._channels.get(channel_name(kind, parent_id), ()))
+
+    def deliver_later(self, kind, parent_id, comment_id):
+        if self._subscribers(kind, parent_id):
+            self._executor.submit(self._deliver_logged, kind, parent_id, comment_id)
+
+    def _deliver_logged(self, kind, parent_id, comment_id):
+        try:
+            self.deliver(kind, parent_id, comment_id)
+        except Exception:
+            logger.exception("Delivering comment %s failed", comment_id)
+        finally:
+            close_old_connections()
+
+    def deliver(self, kind, parent_id, comment_id):
+        subscribers = self._subscribers(kind, parent_id)
+        if not subscribers:
+            return
+        with use_primary():
+            frames = render_comments(kind, STREAMS[kind][0].objects.filter(pk=comment_id))
+        for event_id, frame in frames:
+            for subscription in subscribers:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.push, event_id, frame)
+                except RuntimeError:
+                    # Its event loop has shut down.
+                    self.unsubscribe(subscription)
+
+
+hub = Hub()
+
+registry.gauge(
+    'api_realtime_subscribers', "Open comment streams in this process.", [],
+    lambda: {(): hub.subscriber_count()},
+)
+
+
+class LocalBackend:
+    """Delivers to this process only: enough for a single ASGI worker."""
+
+    def publish(self, kind, parent_id, comment_id):
+        hub.deliver_later(kind, parent_id, comment_id)
+
+    def start(self):
+        pass
+
+
+class RedisBackend:
+    """Fans out across processes through Redis pub/sub (REALTIME_REDIS_URL).
+    Only ids cross Redis; each process renders for its own subscribers.
+
+    A lost connection is retried with growing delays. Comments published
+    meanwhile are not streamed; clients that reconnect with Last-Event-ID
+    still get them from the database.
+    """
+
+    prefix = 'api:realtime:'
+    retry_delay = 1
+    max_retry_delay = 30
+
+    def __init__(self):
+        if redis is None:
+            raise RuntimeError("RedisBackend needs the redis package.")
+        self.client = redis.Redis.from_url(settings.REALTIME_REDIS_URL)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, kind, parent_id, comment_id):
+        self.client.publish(f'{self.prefix}{channel_name(kind, parent_id)}', comment_id)
+
+    def start(self):
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, name='realtime-redis', daemon=True)
+                    self._listener.start()
+
+    def _listen(self):
+        delay = self.retry_delay
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(f'{self.prefix}*')
+                delay = self.retry_delay
+                for message in pubsub.listen():
+                    self._dispatch(message)
+            except Exception:
+                logger.exception("Realtime Redis subscription lost; retrying in %ss", delay)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _dispatch(self, message):
+        try:
+            kind, parent_id = message['channel'].decode()[len(self.prefix):].split(':')
+            hub.deliver(kind, int(parent_id), int(message['data']))
+        except Exception:
+            logger.exception("Delivering realtime message %r failed", message)
+        finally:
+            # This thread lives as long as the process; don't let its
+            # connection outlive CONN_MAX_AGE or a server-side timeout.
+            close_old_connections()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.REALTIME_BACKEND)()
+    return _backend
+
+
+def publish_comment(kind, parent_id, comment_id):
+    try:
+        get_backend().publish(kind, parent_id, comment_id)
+    except Exception:
+        # Streams are best effort; the comment itself is saved.
+        logger.exception("Publishing comment %s failed", comment_id)
@@ -0,0 +1,42 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from .instrumentation import span
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used instead.
+    orjson = None
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span('render'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Decimals, lazy strings, timedeltas, querysets... as DRF encodes them.
+    return _fallback_encoder.default(obj)
+
+
+class FastJSONRenderer(TimedJSONRenderer):
+    """orjson when installed, with DRF's output: compact, UTF-8, datetimes
+    in ISO 8601 with a 'Z' suffix for UTC. Indented (browsable API)
+    requests and values orjson can't encode (e.g. ints over 64 bits) go
+    through the stdlib renderer."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        with span('render'):
+            try:
+                body = orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+            except orjson.JSONEncodeError:
+                return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer, keep U+2028/U+2029 escaped for embedding in <script>.
+        if b'\xe2\x80' in body:
+            body = body.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return body
@@ -0,0 +1,72 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+STICKY_KEY_PREFIX = 'api:primary-pin:'
+
+_use_primary = ContextVar('api_use_primary', default=False)
+
+
+class PrimaryReplicaRouter:
+    """Reads go to a random alias from REPLICA_DATABASES, writes to
+    ``default``. Reads stay on the primary inside ``use_primary()``, inside
+    a transaction on the primary, and for objects that were loaded from it
+    (related lookups, refresh_from_db)."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or _use_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_primary(enabled=True):
+    """Route reads in the block to the primary; ``enabled=False`` leaves
+    the current routing alone."""
+    token = _use_primary.set(enabled or _use_primary.get())
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def _sticky_key(user_id):
+    return f'{STICKY_KEY_PREFIX}{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send ``user_id``'s reads to the primary for REPLICA_STICKY_SECONDS,
+    long enough for replicas to catch up with what they just wrote."""
+    if settings.REPLICA_DATABASES and user_id is not None:
+        cache.set(_sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+async def apin_to_primary(user_id):
+    if settings.REPLICA_DATABASES and user_id is not None:
+        await cache.aset(_sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user_id):
+    return user_id is not None and bool(cache.get(_sticky_key(user_id)))
+
+
+async def ais_pinned(user_id):
+    return user_id is not None and bool(await cache.aget(_sticky_key(user_id)))
@@ -0,0 +1,169 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count
+from .models import BlogPost, Project, SearchDocument, SearchPosting
+from .tasks import enqueue, task
+
+
+STATS_CACHE_KEY = 'api:search:stats'
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_TERM_LENGTH = 64
+
+STOPWORDS = frozenset("""
+a about an and are as at be but by for from has have how i in is it its of on or
+that the this to was were what when where which who will with you your
+""".split())
+
+# (suffix, replacement), longest first; applied once per word.
+SUFFIXES = [
+    ('ational', 'ate'), ('ization', 'ize'), ('fulness', 'ful'), ('iveness', 'ive'),
+    ('ousness', 'ous'), ('tional', 'tion'), ('biliti', 'ble'), ('ements', ''),
+    ('ement', ''), ('ments', ''), ('ment', ''), ('ness', ''), ('ings', ''),
+    ('ing', ''), ('ies', 'y'), ('ied', 'y'), ('edly', ''), ('ed', ''),
+    ('ers', ''), ('er', ''), ('ly', ''), ('es', ''), ('s', ''),
+]
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# kind -> (model, [(attribute, weight)]). Weights repeat a field's terms so
+# title matches outrank body matches.
+INDEXED_MODELS = {
+    'blog': (BlogPost, [('title', 3), ('category', 2), ('content', 1)]),
+    'project': (Project, [('title', 3), ('description', 1)]),
+}
+
+
+def stem(word):
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) + len(replacement) >= 3:
+            word = word[:-len(suffix)] + replacement
+            break
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+        word = word[:-1]
+    return word
+
+
+def analyze(text):
+    return [
+        stem(token)[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if token not in STOPWORDS
+    ]
+
+
+def _term_frequencies(kind, obj):
+    frequencies = Counter()
+    for attribute, weight in INDEXED_MODELS[kind][1]:
+        for term in analyze(getattr(obj, attribute)):
+            frequencies[term] += weight
+    return frequencies
+
+
+def schedule_sync(kind, object_id):
+    """Bring the object's index entry up to date in the background."""
+    enqueue('search.sync', {'kind': kind, 'id': object_id}, key=f'search.sync:{kind}:{object_id}')
+
+
+@task('search.sync', batch=True)
+def sync_objects(payloads):
+    # Whatever happened to the object since it was queued, index it as it is
+    # now, or drop it if it is gone.
+    ids_by_kind = defaultdict(set)
+    for payload in payloads:
+        ids_by_kind[payload['kind']].add(payload['id'])
+    for kind, ids in ids_by_kind.items():
+        model, fields = INDEXED_MODELS[kind]
+        objects = list(model.objects.filter(pk__in=ids).only('pk', *(attribute for attribute, _ in fields)))
+        index_objects(kind, objects)
+        missing = ids - {obj.pk for obj in objects}
+        if missing:
+            SearchDocument.objects.filter(kind=kind, object_id__in=missing).delete()
+
+
+def _index_batch(kind, objects):
+    frequencies = {obj.pk: _term_frequencies(kind, obj) for obj in objects}
+    SearchDocument.objects.bulk_create([
+        SearchDocument(kind=kind, object_id=pk, length=sum(counts.values()))
+        for pk, counts in frequencies.items()
+    ])
+    # bulk_create does not return primary keys on MySQL, so read them back.
+    document_ids = dict(
+        SearchDocument.objects.filter(kind=kind, object_id__in=list(frequencies))
+        .values_list('object_id', 'id')
+    )
+    SearchPosting.objects.bulk_create([
+        SearchPosting(term=term, document_id=document_ids[pk], frequency=frequency)
+        for pk, counts in frequencies.items()
+        for term, frequency in counts.items()
+    ], batch_size=2000)
+
+
+def index_objects(kind, objects):
+    objects = list(objects)
+    with transaction.atomic():
+        SearchDocument.objects.filter(kind=kind, object_id__in=[obj.pk for obj in objects]).delete()
+        _index_batch(kind, objects)
+    cache.delete(STATS_CACHE_KEY)
+
+
+def rebuild_index(batch_size=500):
+    SearchPosting.objects.all().delete()
+    SearchDocument.objects.all().delete()
+    indexed = 0
+    for kind, (model, fields) in INDEXED_MODELS.items():
+        attributes = [attribute for attribute, _ in fields]
+        batch = []
+        for obj in model.objects.only('pk', *attributes).iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) == batch_size:
+                _index_batch(kind, batch)
+                indexed += len(batch)
+                batch = []
+        if batch:
+            _index_batch(kind, batch)
+            indexed += len(batch)
+    cache.delete(STATS_CACHE_KEY)
+    return indexed
+
+
+def _corpus_stats():
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = {
+            row['kind']: (row['total'], row['avg_length'] or 0.0)
+            for row in SearchDocument.objects.values('kind').annotate(total=Count('id'), avg_length=Avg('length'))
+        }
+        cache.set(STATS_CACHE_KEY, stats, timeout=None)
+    return stats
+
+
+def search(query, kinds=None, limit=20):
+    """Return ``[(kind, object_id, score)]`` ranked by BM25, best first."""
+    terms = set(analyze(query))
+    kinds = list(kinds or INDEXED_MODELS)
+    stats = _corpus_stats()
+    total = sum(stats.get(kind, (0, 0))[0] for kind in kinds)
+    if not terms or not total:
+        return []
+    avg_length = sum(stats[kind][0] * stats[kind][1] for kind in kinds if kind in stats) / total
+
+    postings = list(
+        SearchPosting.objects.filter(term__in=terms, document__kind__in=kinds)
+        .values_list('term', 'frequency', 'document__kind', 'document__object_id', 'document__length')
+    )
+    document_frequency = Counter(term for term, *_ in postings)
+    scores = defaultdict(float)
+    for term, frequency, kind, object_id, length in postings:
+        df = document_frequency[term]
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        norm = frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1))
+        scores[(kind, object_id)] += idf * frequency * (BM25_K1 + 1) / norm
+    best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+    return [(kind, object_id, score) for (kind, object_id), score in best]
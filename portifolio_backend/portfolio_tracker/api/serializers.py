@@ -1,9 +1,17 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import CustomUser, AdminProfile, Skill, Project, BlogPost, BlogComment, ProjectComment
+from .models import CustomUser, AdminProfile, Skill, Project, BlogPost, BlogComment, ProjectComment, ImageAsset
 from django.contrib.auth import authenticate
+from .instrumentation import span
 
 
-class RegisterationSerializer(serializers.ModelSerializer):
+class TimedModelSerializer(serializers.ModelSerializer):
+    def to_representation(self, instance):
+        with span('serialize'):
+            return super().to_representation(instance)
+
+
+class RegisterationSerializer(TimedModelSerializer):
     email = serializers.EmailField(required=True)
     fullname = serializers.CharField(required=True)
     password = serializers.CharField(write_only=True, required=True)
@@ -13,9 +21,10 @@ class RegisterationSerializer(serializers.ModelSerializer):
         fields = ['email', 'username', 'fullname', 'password']
 
     def validate_email(self, value):
-        if CustomUser.objects.filter(email__iexact=value.lower()).exists():
+        email = CustomUser.objects.normalize_email(value)
+        if CustomUser.objects.filter(email=email).exists():
             raise serializers.ValidationError('This email is already in use.')
-        return value.lower()
+        return email
 
     def validate_password(self, value):
         if len(value) < 8:
@@ -30,10 +39,9 @@ class RegisterationSerializer(serializers.ModelSerializer):
         user = CustomUser.objects.create_user(
             fullname=validated_data['fullname'],
             username=validated_data.get('username', validated_data['fullname']),
-            email=validated_data['email']
+            email=validated_data['email'],
+            password=validated_data['password'],
         )
-        user.set_password(validated_data['password'])
-        user.save()
         return user
 
 
@@ -51,7 +59,7 @@ class LoginSerializer(serializers.Serializer):
         raise serializers.ValidationError({'error': 'Invalid credentials'})
 
 
-class AdminProfileSerializer(serializers.ModelSerializer):
+class AdminProfileSerializer(TimedModelSerializer):
     class Meta:
         model = AdminProfile
         fields = ['user', 'career', 'country', 'city', 'about_me']
@@ -59,37 +67,71 @@ class AdminProfileSerializer(serializers.ModelSerializer):
                     'user': {'write_only': True}
                 }
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ImageAssetSerializer(TimedModelSerializer):
+    class Meta:
+        model = ImageAsset
+        fields = ['id', 'src', 'width', 'height', 'srcset', 'status']
+        read_only_fields = fields
+
+
+class ImageUploadSerializer(serializers.Serializer):
+    file = serializers.FileField(required=True)
+    target = serializers.ChoiceField(choices=['profile', 'project', 'blog'], required=False)
+    slug = serializers.CharField(required=False, max_length=120)
+
+    def validate_file(self, value):
+        if value.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f'Images must be at most {settings.IMAGE_UPLOAD_MAX_BYTES} bytes.')
+        return value
+
+    def validate(self, data):
+        if data.get('target') in ('project', 'blog') and not data.get('slug'):
+            raise serializers.ValidationError({'slug': 'Required when attaching to a project or blog.'})
+        return data
+
+
+class ProfileSerializer(TimedModelSerializer):
+    profile_image = ImageAssetSerializer(read_only=True)
     class Meta:
         model = CustomUser
-        fields = ['email', 'fullname', 'profile_url']
+        fields = ['email', 'fullname', 'profile_url', 'profile_image']
         read_only_fields = ['email', 'fullname']
 
 
-class AdminSkillSerializer(serializers.ModelSerializer):
+class AdminSkillSerializer(TimedModelSerializer):
     class Meta:
         model = Skill
         fields = ['user', 'name', 'last_updated']
         read_only_fields = ['user', 'last_updated']
 
 
-class AdminProjectSerializer(serializers.ModelSerializer):
+class AdminProjectSerializer(TimedModelSerializer):
     user = ProfileSerializer(read_only=True)
+    image_set = ImageAssetSerializer(source='image_asset', read_only=True)
     class Meta:
         model = Project
-        fields = ['user', 'title', 'description', 'image']
-        read_only_fields = ['user']
+        fields = ['user', 'title', 'slug', 'description', 'image', 'image_set', 'comment_count', 'last_commented_at']
+        read_only_fields = ['user', 'slug', 'comment_count', 'last_commented_at']
 
 
-class AdminBlogSerializer(serializers.ModelSerializer):
+class AdminBlogSerializer(TimedModelSerializer):
     author = ProfileSerializer(read_only=True)
+    image_set = ImageAssetSerializer(source='image_asset', read_only=True)
     class Meta:
         model = BlogPost
-        fields = ['title',  'content', 'category', 'image', 'author', 'created_at', 'updated_at']
-        read_only_fields = ['author', 'created_at', 'updated_at']
+        fields = ['title', 'slug', 'content', 'category', 'image', 'image_set', 'author', 'created_at', 'updated_at', 'comment_count', 'last_commented_at']
+        read_only_fields = ['slug', 'author', 'created_at', 'updated_at', 'comment_count', 'last_commented_at']
 
 
-class BlogCommentsSerializer(serializers.ModelSerializer):
+class BlogSummarySerializer(TimedModelSerializer):
+    image_set = ImageAssetSerializer(source='image_asset', read_only=True)
+    class Meta:
+        model = BlogPost
+        fields = ['id', 'title', 'slug', 'excerpt', 'category', 'image', 'image_set', 'created_at', 'comment_count']
+        read_only_fields = fields
+
+
+class BlogCommentsSerializer(TimedModelSerializer):
     user = ProfileSerializer(read_only=True)
     blog_post = AdminBlogSerializer(read_only=True)
     class Meta:
@@ -103,7 +145,7 @@ class BlogCommentsSerializer(serializers.ModelSerializer):
         return value
     
 
-class ProjectCommentsSerializer(serializers.ModelSerializer):
+class ProjectCommentsSerializer(TimedModelSerializer):
     user = ProfileSerializer(read_only=True)
     project = AdminProjectSerializer(read_only=True)
     class Meta:
@@ -117,13 +159,83 @@ class ProjectCommentsSerializer(serializers.ModelSerializer):
         return value
 
 
-class HomeScreenSerializer(serializers.ModelSerializer):
+# api/sync/ rows: ids and modification times, parents by id instead of nested.
+class SyncUserSerializer(TimedModelSerializer):
+    profile_image = ImageAssetSerializer(read_only=True)
+    class Meta:
+        model = CustomUser
+        fields = ['id', 'email', 'fullname', 'profile_url', 'profile_image', 'updated_at']
+        read_only_fields = fields
+
+
+class SyncProfileSerializer(TimedModelSerializer):
+    class Meta:
+        model = AdminProfile
+        fields = ['id', 'career', 'country', 'city', 'about_me', 'updated_at']
+        read_only_fields = fields
+
+
+class SyncSkillSerializer(TimedModelSerializer):
+    class Meta:
+        model = Skill
+        fields = ['id', 'name', 'last_updated']
+        read_only_fields = fields
+
+
+class SyncProjectSerializer(TimedModelSerializer):
+    image_set = ImageAssetSerializer(source='image_asset', read_only=True)
+    class Meta:
+        model = Project
+        fields = ['id', 'title', 'slug', 'description', 'image', 'image_set', 'comment_count', 'last_commented_at', 'updated_at']
+        read_only_fields = fields
+
+
+class SyncBlogSerializer(BlogSummarySerializer):
+    class Meta(BlogSummarySerializer.Meta):
+        fields = BlogSummarySerializer.Meta.fields + ['last_commented_at', 'updated_at']
+        read_only_fields = fields
+
+
+class SyncBlogCommentSerializer(TimedModelSerializer):
+    user = ProfileSerializer(read_only=True)
+    class Meta:
+        model = BlogComment
+        fields = ['id', 'blog_post', 'user', 'content', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+class SyncProjectCommentSerializer(TimedModelSerializer):
+    user = ProfileSerializer(read_only=True)
+    class Meta:
+        model = ProjectComment
+        fields = ['id', 'project', 'user', 'content', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+class BulkSkillItemSerializer(AdminSkillSerializer):
+    # Uniqueness is checked for the whole batch with one query in the view.
+    class Meta(AdminSkillSerializer.Meta):
+        extra_kwargs = {'name': {'validators': []}}
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500)
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(required=True, max_length=200)
+    type = serializers.ChoiceField(choices=['blog', 'project'], required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=50, default=20)
+
+
+class HomeScreenSerializer(TimedModelSerializer):
     profile = AdminProfileSerializer(source="adminprofile", read_only=True)
     skills = AdminSkillSerializer(source="skill_set", many=True, read_only=True)  # Changed from 'skill_set'
     projects = AdminProjectSerializer(source="project_set", many=True, read_only=True)  # Changed from 'project_set'
+    profile_image = ImageAssetSerializer(read_only=True)
 
     class Meta:
         model = CustomUser
-        fields = ['id', 'email', 'fullname', 'profile_url', 'profile', 'skills', 'projects']
+        fields = ['id', 'email', 'fullname', 'profile_url', 'profile_image', 'profile', 'skills', 'projects']
 
     
\ No newline at end of file
@@ -0,0 +1,198 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .counters import comment_added, comment_removed
+from .models import CustomUser, AdminProfile, Skill, Project, BlogPost, BlogComment, ProjectComment, ImageAsset
+from .realtime import publish_comment
+from .search import schedule_sync
+from .slugs import blog_slugs, project_slugs
+from .snapshots import invalidate_home_snapshot, is_home_admin
+from .sync import record_tombstone
+from .token_cache import user_changed
+from .versions import bump_version, comments_version, profile_version
+
+
+@receiver([post_save, post_delete], sender=AdminProfile)
+@receiver([post_save, post_delete], sender=Skill)
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_home_on_portfolio_change(sender, instance, **kwargs):
+    invalidate_home_snapshot()
+
+
+@receiver([post_save, post_delete], sender=ImageAsset)
+def invalidate_home_on_image_change(sender, instance, **kwargs):
+    # Variants land after the upload request; the snapshot embeds their srcset.
+    invalidate_home_snapshot()
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_home_on_admin_change(sender, instance, **kwargs):
+    # Project owners are rendered through ProfileSerializer, so any change to
+    # the admin row (or a user being promoted/demoted) affects the snapshot.
+    if instance.is_superuser or is_home_admin(instance.pk):
+        invalidate_home_snapshot()
+        bump_version('blogs')
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=BlogComment)
+@receiver([post_save, post_delete], sender=ImageAsset)
+def bump_blogs_version(sender, instance, **kwargs):
+    # Blog pages embed comment counts and image variants as well as the posts.
+    bump_version('blogs')
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=Project)
+def discard_cached_slugs(sender, instance, created=False, **kwargs):
+    # A rename changes the slug, a delete removes it. A new row retires
+    # nothing: missing slugs are never cached.
+    if created:
+        return
+    resolver = blog_slugs if sender is BlogPost else project_slugs
+    resolver.discard_pk(instance.pk)
+    bump_version(resolver.version_name)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def discard_cached_principals(sender, instance, **kwargs):
+    # Also after commit: a worker re-reading the row before then would cache
+    # the old values again.
+    user_id = instance.pk
+    user_changed(user_id)
+    transaction.on_commit(lambda: user_changed(user_id))
+
+
+def _deleted_with_parent(origin, parent_model):
+    # Cascading from the parent itself: its counter row is going away too, so
+    # skip the per-comment UPDATEs.
+    model = getattr(origin, 'model', type(origin))
+    return model is parent_model
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=BlogComment)
+@receiver([post_save, post_delete], sender=ProjectComment)
+def bump_comments_version(sender, instance, origin=None, **kwargs):
+    # Listings embed the parent as well as its comments; one bump covers a
+    # parent deleted with all of them.
+    if sender is BlogPost or sender is Project:
+        kind, parent_id = ('blog' if sender is BlogPost else 'project'), instance.pk
+    elif sender is BlogComment:
+        if _deleted_with_parent(origin, BlogPost):
+            return
+        kind, parent_id = 'blog', instance.blog_post_id
+    else:
+        if _deleted_with_parent(origin, Project):
+            return
+        kind, parent_id = 'project', instance.project_id
+    bump_version(comments_version(kind, parent_id))
+
+
+def _profile_versions(user_ids):
+    """Versions that show the profiles of ``user_ids``: their own, and the
+    comment listings nesting them as commenters or as the parent's author."""
+    names = [profile_version(user_id) for user_id in user_ids]
+    for kind, comment_model, fk_name, parent_model, owner in (
+        ('blog', BlogComment, 'blog_post_id', BlogPost, 'author_id'),
+        ('project', ProjectComment, 'project_id', Project, 'user_id'),
+    ):
+        parent_ids = set(comment_model.objects.filter(user_id__in=user_ids).order_by().values_list(fk_name, flat=True).distinct())
+        parent_ids.update(parent_model.objects.filter(**{f'{owner}__in': user_ids}).values_list('pk', flat=True))
+        names += [comments_version(kind, parent_id) for parent_id in parent_ids]
+    return names
+
+
+@receiver(post_save, sender=CustomUser)
+def bump_profile_versions(sender, instance, created, update_fields=None, **kwargs):
+    # A new user isn't shown anywhere yet, and a password rehash on login
+    # changes nothing that is.
+    if created or (update_fields is not None and set(update_fields) <= {'password', 'last_login'}):
+        return
+    bump_version(*_profile_versions([instance.pk]))
+
+
+@receiver(post_delete, sender=CustomUser)
+def bump_deleted_profile_version(sender, instance, **kwargs):
+    # Their comments and posts go with them, and bump their own listings.
+    bump_version(profile_version(instance.pk))
+
+
+@receiver(post_save, sender=ImageAsset)
+@receiver(pre_delete, sender=ImageAsset)
+def bump_image_versions(sender, instance, created=False, **kwargs):
+    # A new upload isn't shown anywhere yet. Deletes are handled before the
+    # fact, while the rows still point at the image.
+    if created:
+        return
+    user_ids = list(CustomUser.objects.filter(profile_image_id=instance.pk).values_list('pk', flat=True))
+    names = _profile_versions(user_ids) if user_ids else []
+    names += [comments_version('blog', pk) for pk in BlogPost.objects.filter(image_asset_id=instance.pk).values_list('pk', flat=True)]
+    names += [comments_version('project', pk) for pk in Project.objects.filter(image_asset_id=instance.pk).values_list('pk', flat=True)]
+    if names:
+        bump_version(*names)
+
+
+@receiver(post_save, sender=BlogComment)
+def count_blog_comment(sender, instance, created, **kwargs):
+    if created:
+        comment_added(BlogPost, instance.blog_post_id, instance.created_at)
+
+
+@receiver(post_save, sender=BlogComment)
+@receiver(post_save, sender=ProjectComment)
+def stream_comment(sender, instance, created, **kwargs):
+    if created:
+        kind, parent_id = ('blog', instance.blog_post_id) if sender is BlogComment else ('project', instance.project_id)
+        transaction.on_commit(lambda: publish_comment(kind, parent_id, instance.pk))
+
+
+@receiver(post_delete, sender=BlogComment)
+def uncount_blog_comment(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_parent(origin, BlogPost):
+        comment_removed(BlogPost, BlogComment, 'blog_post', instance.blog_post_id)
+
+
+@receiver(post_save, sender=ProjectComment)
+def count_project_comment(sender, instance, created, **kwargs):
+    if created:
+        comment_added(Project, instance.project_id, instance.created_at)
+        invalidate_home_snapshot()
+
+
+@receiver(post_delete, sender=ProjectComment)
+def uncount_project_comment(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_parent(origin, Project):
+        comment_removed(Project, ProjectComment, 'project', instance.project_id)
+        invalidate_home_snapshot()
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=Project)
+def index_searchable(sender, instance, update_fields=None, **kwargs):
+    # Counter bumps go through queryset.update(), but guard against saves that
+    # only touch non-indexed columns anyway.
+    if update_fields is not None and not {'title', 'content', 'category', 'description'} & set(update_fields):
+        return
+    schedule_sync('blog' if sender is BlogPost else 'project', instance.pk)
+
+
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=Project)
+def unindex_searchable(sender, instance, **kwargs):
+    schedule_sync('blog' if sender is BlogPost else 'project', instance.pk)
+
+
+@receiver(post_delete, sender=Skill)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=BlogComment)
+@receiver(post_delete, sender=ProjectComment)
+def leave_tombstone(sender, instance, origin=None, **kwargs):
+    # Comments removed with their post or project are implied by its tombstone.
+    if sender is BlogComment and _deleted_with_parent(origin, BlogPost):
+        return
+    if sender is ProjectComment and _deleted_with_parent(origin, Project):
+        return
+    record_tombstone(sender, instance.pk)
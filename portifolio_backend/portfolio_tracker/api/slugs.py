@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from django.utils.text import slugify
+from .models import BlogPost, Project
+from .versions import aget_version, get_version, slugs_version
+
+
+SLUG_CACHE_SIZE = 2048
+SLUG_CACHE_TTL = 300
+
+
+class SlugResolver:
+    """Per-process ``slug -> primary key`` cache for one model.
+
+    URLs may carry a slug or, as older clients do, the raw title; a title
+    resolves only while exactly one row has it, since slugs are suffixed to
+    tell duplicates apart. Entries remember the shared slugs version they
+    were read under and are only served while it is current, so a rename or
+    delete in any worker retires them everywhere.
+    """
+
+    def __init__(self, model, kind, max_size=SLUG_CACHE_SIZE, ttl=SLUG_CACHE_TTL):
+        self.model = model
+        self.version_name = slugs_version(kind)
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, value):
+        """Query for the primary keys ``value`` may name: one at most for a
+        slug, two at most for a title, enough to tell it is ambiguous."""
+        if slugify(value) == value:
+            return self.model.objects.filter(slug=value).values_list('pk', flat=True)
+        return self.model.objects.filter(title=value).values_list('pk', flat=True)[:2]
+
+    def resolve(self, value):
+        # Read before the query: a rename committed meanwhile moves the
+        # version, and the entry stored under the old one is never served.
+        version = get_version(self.version_name)
+        pk = self._cached(value, version)
+        if pk is None:
+            pk = self._remember(value, list(self.lookup(value)), version)
+        return pk
+
+    async def aresolve(self, value):
+        version = await aget_version(self.version_name)
+        pk = self._cached(value, version)
+        if pk is None:
+            pk = self._remember(value, [pk async for pk in self.lookup(value)], version)
+        return pk
+
+    def _cached(self, value, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(value)
+            if entry is None:
+                return None
+            expires_at, pk, entry_version = entry
+            if expires_at <= now or entry_version != version:
+                del self._entries[value]
+                return None
+            self._entries.move_to_end(value)
+            return pk
+
+    def _remember(self, value, pks, version):
+        if len(pks) != 1:
+            return None
+        with self._lock:
+            self._entries[value] = (time.monotonic() + self.ttl, pks[0], version)
+            self._entries.move_to_end(value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return pks[0]
+
+    def discard_pk(self, pk):
+        with self._lock:
+            stale = [slug for slug, (_, cached_pk, _) in self._entries.items() if cached_pk == pk]
+            for slug in stale:
+                del self._entries[slug]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+blog_slugs = SlugResolver(BlogPost, 'blog')
+project_slugs = SlugResolver(Project, 'project')
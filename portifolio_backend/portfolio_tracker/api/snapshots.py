@@ -0,0 +1,63 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from .models import CustomUser
+from .prefetch import plan_queryset
+from .renderers import FastJSONRenderer
+from .routers import use_primary
+from .serializers import HomeScreenSerializer
+from .versions import aget_version, bump_version, get_version
+
+
+HOME_SNAPSHOT_PREFIX = 'api:home:snapshot:'
+
+
+def _key(version):
+    return f'{HOME_SNAPSHOT_PREFIX}{version}'
+
+
+def build_home_snapshot(version):
+    # From the primary: a lagging replica would get cached until the next write.
+    try:
+        with use_primary():
+            admin = plan_queryset(CustomUser.objects.filter(is_superuser=True), HomeScreenSerializer).get()
+    except CustomUser.DoesNotExist:
+        return None
+    serializer = HomeScreenSerializer(admin)
+    body = FastJSONRenderer().render({"status": "success", "data": serializer.data})
+    snapshot = {'admin_id': admin.pk, 'body': body}
+    cache.set(_key(version), snapshot, settings.CACHED_BODY_TTL)
+    return snapshot
+
+
+def get_home_snapshot(version=None):
+    """The snapshot of ``version`` of the home content, by default the
+    current one. Callers read the version before anything else: rows newer
+    than their version are harmless, since the next write moves readers to
+    a new key, but a snapshot can never be older than its key."""
+    if version is None:
+        version = get_version('home')
+    snapshot = cache.get(_key(version))
+    if snapshot is None:
+        snapshot = build_home_snapshot(version)
+    return snapshot
+
+
+async def aget_home_snapshot(version=None):
+    if version is None:
+        version = await aget_version('home')
+    snapshot = await cache.aget(_key(version))
+    if snapshot is None:
+        snapshot = await sync_to_async(build_home_snapshot)(version)
+    return snapshot
+
+
+def invalidate_home_snapshot():
+    # The version moves after commit; snapshots of older versions are never
+    # read again and expire after CACHED_BODY_TTL.
+    bump_version('home')
+
+
+def is_home_admin(user_id):
+    snapshot = cache.get(_key(get_version('home')))
+    return snapshot is not None and snapshot['admin_id'] == user_id
@@ -0,0 +1,111 @@
+import base64
+import binascii
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import CustomUser, AdminProfile, Skill, Project, BlogPost, BlogComment, ProjectComment, Tombstone
+from .prefetch import plan_queryset
+from .routers import use_primary
+from .serializers import (
+    SyncUserSerializer, SyncProfileSerializer, SyncSkillSerializer, SyncProjectSerializer, SyncBlogSerializer,
+    SyncBlogCommentSerializer, SyncProjectCommentSerializer,
+)
+
+
+TOKEN_VERSION = 1
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _touched(since):
+    # Counter and image updates don't bump updated_at, but they change what
+    # a post or project looks like to the client.
+    return Q(updated_at__gt=since) | Q(last_commented_at__gt=since) | Q(image_asset__updated_at__gt=since)
+
+
+# (name, model, serializer, rows changed since a moment for the admin's id)
+SYNCED = [
+    ('user', CustomUser, SyncUserSerializer, lambda since, admin_id: Q(pk=admin_id) & (Q(updated_at__gt=since) | Q(profile_image__updated_at__gt=since))),
+    ('profile', AdminProfile, SyncProfileSerializer, lambda since, admin_id: Q(user_id=admin_id, updated_at__gt=since)),
+    ('skills', Skill, SyncSkillSerializer, lambda since, admin_id: Q(user_id=admin_id, last_updated__gt=since)),
+    ('projects', Project, SyncProjectSerializer, lambda since, admin_id: Q(user_id=admin_id) & _touched(since)),
+    ('blogs', BlogPost, SyncBlogSerializer, lambda since, admin_id: Q(author_id=admin_id) & _touched(since)),
+    ('blog_comments', BlogComment, SyncBlogCommentSerializer, lambda since, admin_id: Q(updated_at__gt=since)),
+    ('project_comments', ProjectComment, SyncProjectCommentSerializer, lambda since, admin_id: Q(updated_at__gt=since)),
+]
+TOMBSTONE_KINDS = {model: name for name, model, _, _ in SYNCED if model not in (CustomUser, AdminProfile)}
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_token(moment):
+    micros = (moment - EPOCH) // timedelta(microseconds=1)
+    return base64.urlsafe_b64encode(struct.pack('>BQ', TOKEN_VERSION, micros)).rstrip(b'=').decode()
+
+
+def decode_token(token):
+    try:
+        version, micros = struct.unpack('>BQ', base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, struct.error, ValueError):
+        raise InvalidSyncToken("Invalid sync token.")
+    if version != TOKEN_VERSION:
+        raise InvalidSyncToken("Invalid sync token.")
+    try:
+        return EPOCH + timedelta(microseconds=micros)
+    except OverflowError:
+        # Past year 9999: not one of ours.
+        raise InvalidSyncToken("Invalid sync token.")
+
+
+def record_tombstone(model, object_id):
+    Tombstone.objects.create(kind=TOMBSTONE_KINDS[model], object_id=object_id)
+
+
+def changes_since(token, admin_id):
+    """Rows of the admin's portfolio and of comments changed or deleted
+    since ``token``, plus the token to send next time.
+
+    The next token is backdated by SYNC_OVERLAP_SECONDS so rows committed by
+    a transaction that was still open now are not skipped; clients apply
+    rows by id, so seeing one twice is harmless. ``reset`` means the client
+    must reload through the regular endpoints: it had no token, its token
+    predates the tombstone retention, or more than SYNC_MAX_CHANGES rows of
+    one kind changed.
+    """
+    now = timezone.now()
+    reset = {'token': encode_token(now - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)), 'reset': True}
+    if not token:
+        return reset
+    since = decode_token(token)
+    if since > now:
+        raise InvalidSyncToken("Invalid sync token.")
+    if since < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+        return reset
+
+    limit = settings.SYNC_MAX_CHANGES
+    changed, deleted = {}, {}
+    # A replica behind the primary would let the client skip rows for good.
+    with use_primary():
+        for name, model, serializer_class, condition in SYNCED:
+            rows = list(plan_queryset(model.objects.filter(condition(since, admin_id)), serializer_class).order_by('pk')[:limit + 1])
+            if len(rows) > limit:
+                return reset
+            if rows:
+                changed[name] = serializer_class(rows, many=True).data
+        tombstones = list(Tombstone.objects.filter(deleted_at__gt=since).values_list('kind', 'object_id')[:limit * len(SYNCED) + 1])
+    if len(tombstones) > limit * len(SYNCED):
+        return reset
+    for kind, object_id in tombstones:
+        deleted.setdefault(kind, []).append(object_id)
+
+    # Empty sections are left out, so an up-to-date client gets little more
+    # than the token back.
+    result = {'token': reset['token']}
+    if changed:
+        result['changed'] = changed
+    if deleted:
+        result['deleted'] = deleted
+    return result
@@ -0,0 +1,227 @@
+import logging
+import os
+import random
+import threading
+import time
+import traceback
+import uuid
+from datetime import timedelta
+from itertools import groupby
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .metrics import registry
+from .models import Task
+from .routers import use_primary
+
+
+logger = logging.getLogger(__name__)
+
+TASKS_PROCESSED = registry.counter(
+    'api_tasks_processed_total', "Background tasks run, by name and outcome (done, retry, failed).",
+    ['name', 'outcome'],
+)
+TASK_DURATION = registry.histogram(
+    'api_task_duration_seconds', "Time spent running a background task (or batch of them).", ['name'],
+)
+
+_handlers = {}
+
+
+class Handler:
+    def __init__(self, function, batch, max_attempts, on_failure):
+        self.function = function
+        self.batch = batch
+        self.max_attempts = max_attempts
+        self.on_failure = on_failure
+
+
+def task(name, batch=False, max_attempts=None, on_failure=None):
+    """Register the decorated function as the handler for ``name``.
+
+    It is called with the task's payload, or with ``batch=True`` with the
+    list of payloads of every task of that name claimed together.
+    ``on_failure(payload, error)`` runs once retries are exhausted.
+    """
+    def decorator(function):
+        _handlers[name] = Handler(function, batch, max_attempts, on_failure)
+        return function
+    return decorator
+
+
+def enqueue(name, payload=None, key=None, delay=0):
+    """Queue ``name`` to run after the current transaction commits.
+
+    The row is written in the caller's transaction, so the task exists if
+    and only if the write that asked for it does. While a task with the
+    same ``key`` is still queued, this is a no-op.
+    """
+    if name not in _handlers:
+        raise LookupError(f"No task registered as {name!r}.")
+    payload = payload or {}
+    if settings.TASKS_ALWAYS_EAGER:
+        transaction.on_commit(lambda: _run_eagerly(name, payload))
+        return
+    Task.objects.bulk_create(
+        [Task(name=name, payload=payload, key=key, run_after=timezone.now() + timedelta(seconds=delay))],
+        ignore_conflicts=key is not None,
+    )
+    transaction.on_commit(_wake)
+
+
+def _run_eagerly(name, payload):
+    handler = _handlers[name]
+    try:
+        handler.function([payload] if handler.batch else payload)
+    except Exception:
+        logger.exception("Task %s failed", name)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter: about TASK_RETRY_DELAY, then twice
+    that, and so on up to TASK_RETRY_MAX_DELAY."""
+    delay = min(settings.TASK_RETRY_MAX_DELAY, settings.TASK_RETRY_DELAY * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class Worker:
+    """Claims due tasks in batches and runs them on ``threads`` threads.
+    Any number of workers, in any number of processes, can share the
+    queue."""
+
+    def __init__(self, threads=1, batch_size=None, poll_interval=None):
+        self.threads = threads
+        self.batch_size = batch_size or settings.TASK_BATCH_SIZE
+        self.poll_interval = settings.TASK_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()
+        self._threads = []
+
+    def start(self, daemon=True):
+        for index in range(self.threads):
+            thread = threading.Thread(target=self.run, name=f'tasks-{index}', daemon=daemon)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, wait=True):
+        self.stopping.set()
+        self.wakeup.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                processed = self.run_once()
+            except Exception:
+                logger.exception("Task worker iteration failed")
+                processed = 0
+            if not processed:
+                close_old_connections()
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+        close_old_connections()
+
+    def run_once(self):
+        """Claim and run one batch of due tasks; returns how many ran."""
+        # The queue and whatever the handlers read must be current, not a
+        # replica's view of it.
+        with use_primary():
+            tasks = self.claim()
+            for name, group in groupby(sorted(tasks, key=lambda t: (t.name, t.pk)), key=lambda t: t.name):
+                self._run(name, list(group))
+        return len(tasks)
+
+    def claim(self):
+        now = timezone.now()
+        due = Q(status=Task.QUEUED, run_after__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+        token = uuid.uuid4().hex
+        with transaction.atomic():
+            # SKIP LOCKED keeps concurrent workers off each other's rows where
+            # the database supports it; the conditional UPDATE decides either way.
+            ids = list(
+                Task.objects.select_for_update(skip_locked=True).filter(due)
+                .order_by('run_after', 'pk').values_list('pk', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return []
+            Task.objects.filter(due, pk__in=ids).update(
+                status=Task.RUNNING, key=None, attempts=F('attempts') + 1, locked_by=token,
+                locked_until=now + timedelta(seconds=settings.TASK_LEASE_SECONDS),
+            )
+        return list(Task.objects.filter(status=Task.RUNNING, locked_by=token))
+
+    def _run(self, name, tasks):
+        handler = _handlers.get(name)
+        if handler is None:
+            self._failed(tasks, None, f"No task registered as {name!r}.")
+            return
+        if handler.batch:
+            self._call(name, handler, tasks, [task.payload for task in tasks])
+        else:
+            for task in tasks:
+                self._call(name, handler, [task], task.payload)
+
+    def _call(self, name, handler, tasks, argument):
+        started = time.perf_counter()
+        try:
+            handler.function(argument)
+        except Exception as error:
+            logger.warning("Task %s failed (attempt %s)", name, tasks[0].attempts, exc_info=True)
+            message = ''.join(traceback.format_exception(error))
+            max_attempts = handler.max_attempts or settings.TASK_MAX_ATTEMPTS
+            self._retry(name, [task for task in tasks if task.attempts < max_attempts], message)
+            self._failed([task for task in tasks if task.attempts >= max_attempts], handler, message, error)
+        else:
+            Task.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+            TASKS_PROCESSED.inc(name, 'done', amount=len(tasks))
+        finally:
+            TASK_DURATION.observe(time.perf_counter() - started, name)
+
+    def _retry(self, name, tasks, message):
+        for task in tasks:
+            task.status = Task.QUEUED
+            task.run_after = timezone.now() + timedelta(seconds=retry_delay(task.attempts))
+            task.locked_until = None
+            task.last_error = message
+            task.save(update_fields=['status', 'run_after', 'locked_until', 'last_error'])
+        if tasks:
+            TASKS_PROCESSED.inc(name, 'retry', amount=len(tasks))
+
+    def _failed(self, tasks, handler, message, error=None):
+        # Failed rows stay in the table for inspection.
+        for task in tasks:
+            task.status = Task.FAILED
+            task.locked_until = None
+            task.last_error = message
+            task.save(update_fields=['status', 'locked_until', 'last_error'])
+            if handler is not None and handler.on_failure is not None:
+                try:
+                    handler.on_failure(task.payload, error)
+                except Exception:
+                    logger.exception("on_failure for task %s failed", task.name)
+        if tasks:
+            TASKS_PROCESSED.inc(tasks[0].name, 'failed', amount=len(tasks))
+
+
+_worker = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def _wake():
+    """Start this process's worker threads (TASK_WORKER_THREADS) on first
+    use and nudge them, so a committed task runs without waiting for the
+    next poll."""
+    global _worker, _worker_pid
+    if not settings.TASK_WORKER_THREADS:
+        return
+    if _worker is None or _worker_pid != os.getpid():
+        with _worker_lock:
+            if _worker is None or _worker_pid != os.getpid():
+                _worker = Worker(threads=settings.TASK_WORKER_THREADS)
+                _worker_pid = os.getpid()
+                _worker.start()
+    _worker.wakeup.set()
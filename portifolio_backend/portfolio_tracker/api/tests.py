@@ -1,3 +1,1253 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from django.utils import timezone
+from . import async_views, benchmarking, compression, counters, hashing, images, instrumentation, metrics, pooling, portability, prefetch, realtime, search, snapshots, sync, tasks
+from .db_backends.sqlite3_pool.base import DatabaseWrapper as PooledSQLiteWrapper
+from .management.commands.benchmark_endpoints import compare
+from .models import EXCERPT_LENGTH, AdminProfile, BlacklistedToken, BlogComment, BlogPost, CustomUser, ImageAsset, Project, ProjectComment, SearchDocument, Skill, Task, Tombstone
+from .middleware import ReplicaRoutingMiddleware
+from .renderers import FastJSONRenderer
+from .routers import PrimaryReplicaRouter, use_primary
+from .serializers import BlogCommentsSerializer, HomeScreenSerializer
+from .slugs import blog_slugs, project_slugs
+from .tasks import Worker, enqueue, task
+from .token_cache import RevocationSet, revoked_tokens, verified_tokens
+from .urls import urlpatterns
+from .versions import comments_version, get_version
+from .views import generate_token, issue_tokens
 
-# Create your tests here.
+
+def bearer(user):
+    return {'HTTP_AUTHORIZATION': 'Bearer ' + generate_token(user)[0]}
+
+
+def reset_caches():
+    cache.clear()
+    blog_slugs.clear()
+    project_slugs.clear()
+    verified_tokens.clear()
+    revoked_tokens.clear()
+
+
+@override_settings(TASK_WORKER_THREADS=0, TASKS_ALWAYS_EAGER=False)
+class APITestCase(TestCase):
+    """Starts from empty caches with tasks left queued for the test to run;
+    ``self.admin`` owns the portfolio and ``self.auth`` is their bearer header."""
+
+    def setUp(self):
+        reset_caches()
+        self.admin = CustomUser.objects.create_superuser(email='admin@example.com', fullname='Ad Min', password='Passw0rd1')
+        self.auth = bearer(self.admin)
+
+
+class ConditionalGetTests(APITestCase):
+    """Repeat reads with a current ETag or Last-Modified get a 304 without
+    touching the models."""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            AdminProfile.objects.create(user=self.admin, career='Developer')
+            Skill.objects.create(user=self.admin, name='Python')
+            self.project = Project.objects.create(user=self.admin, title='Tracker')
+            self.blog = BlogPost.objects.create(author=self.admin, title='Hello', content='World', category='News')
+            self.reader = CustomUser.objects.create_user(email='reader@example.com', fullname='Re Ader', password='Passw0rd1')
+            BlogComment.objects.create(blog_post=self.blog, user=self.reader, content='Nice')
+            ProjectComment.objects.create(project=self.project, user=self.reader, content='Neat')
+        self.auth = bearer(self.reader)
+
+    def get(self, url, **headers):
+        return self.client.get(url, **self.auth, **headers)
+
+    def assertRevalidates(self, url):
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+        self.assertEqual(not_modified.content, b'')
+        self.assertLessEqual(len(queries), 1, [query['sql'] for query in queries])
+        return response
+
+    def test_home(self):
+        response = self.assertRevalidates('/api/home/')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.create(user=self.admin, name='Django')
+        self.assertEqual(self.get('/api/home/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_blogs(self):
+        response = self.assertRevalidates('/api/blogs/')
+        # Each page and view is its own representation.
+        self.assertNotEqual(self.get('/api/blogs/?view=summary')['ETag'], response['ETag'])
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(author=self.admin, title='Second', content='Post', category='News')
+        self.assertEqual(self.get('/api/blogs/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_blog_comments(self):
+        url = f'/api/blog/comments/{self.blog.slug}/'
+        response = self.assertRevalidates(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogComment.objects.create(blog_post=self.blog, user=self.admin, content='Thanks')
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_project_comments(self):
+        url = f'/api/project/comments/{self.project.slug}/'
+        response = self.assertRevalidates(url)
+        # Commenters are nested in the listing.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reader.profile_url = 'https://example.com/reader'
+            self.reader.save()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_other_listings_unaffected(self):
+        url = f'/api/project/comments/{self.project.slug}/'
+        response = self.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogComment.objects.create(blog_post=self.blog, user=self.admin, content='Thanks')
+            # Not shown in the listing: neither commenter nor author.
+            outsider = CustomUser.objects.create_user(email='outsider@example.com', fullname='Out Sider', password='Passw0rd1')
+            outsider.profile_url = 'https://example.com/outsider'
+            outsider.save()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_parent_image_change(self):
+        url = f'/api/blog/comments/{self.blog.slug}/'
+        image = ImageAsset.objects.create(owner=self.admin, sha256='0' * 64, content_type='image/png', src='/media/a.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blog.image_asset = image
+            self.blog.save()
+        response = self.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            image.status = ImageAsset.READY
+            image.save()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_profile(self):
+        response = self.assertRevalidates('/api/user-profile/')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotEqual(self.client.get('/api/user-profile/', **bearer(self.admin))['ETag'], response['ETag'])
+        # Another user's edit leaves this profile alone.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.profile_url = 'https://example.com/admin'
+            self.admin.save()
+        self.assertEqual(self.get('/api/user-profile/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_last_modified(self):
+        # Not sent while another change could still land in the same second.
+        self.assertNotIn('Last-Modified', self.get('/api/user-profile/'))
+        with mock.patch('api.conditional.time.time', return_value=time.time() + 2):
+            response = self.get('/api/user-profile/')
+            with CaptureQueriesContext(connection) as queries:
+                not_modified = self.get('/api/user-profile/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertLessEqual(len(queries), 1)
+
+    async def test_async_comments(self):
+        view = async_views.BlogCommentsView.as_view()
+        factory = AsyncRequestFactory()
+        url = f'/api/blog/comments/{self.blog.slug}/'
+        headers = {'Authorization': self.auth['HTTP_AUTHORIZATION']}
+        response = await view(factory.get(url, headers=headers), slug=self.blog.slug)
+        self.assertEqual(response.status_code, 200)
+        not_modified = await view(factory.get(url, headers={**headers, 'If-None-Match': response['ETag']}), slug=self.blog.slug)
+        self.assertEqual(not_modified.status_code, 304)
+
+
+@override_settings(TASK_WORKER_THREADS=0)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.user = CustomUser.objects.create_user(email='user@example.com', fullname='Us Er', password='Passw0rd1')
+        self.auth = bearer(self.user)
+
+    def test_logout_keeps_access_tokens_out_of_the_database(self):
+        refresh_token = issue_tokens(self.user)['refresh_token']
+        self.assertEqual(self.client.get('/api/user-profile/', **self.auth).status_code, 200)
+        response = self.client.post('/api/logout/', {'refresh_token': refresh_token}, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/user-profile/', **self.auth).status_code, 401)
+        # Only the refresh token is blacklisted; the access token just expires.
+        self.assertEqual(BlacklistedToken.objects.get().token_id, hashlib.sha256(refresh_token.encode()).hexdigest())
+        replay = self.client.post('/api/token/refresh/', {'refresh_token': refresh_token}, content_type='application/json')
+        self.assertEqual(replay.status_code, 401)
+        reset_caches()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/user-profile/', **bearer(self.user)).status_code, 200)
+        self.assertFalse(any('blacklisted_tokens' in q['sql'] for q in queries.captured_queries))
+
+    def test_logout_all(self):
+        self.assertEqual(self.client.post('/api/logout/all/', **self.auth).status_code, 200)
+        reset_caches()
+        self.assertEqual(self.client.get('/api/user-profile/', **self.auth).status_code, 401)
+
+    def test_revocation_is_stored_by_hash_until_expiry(self):
+        refresh_token = issue_tokens(self.user)['refresh_token']
+        self.client.post('/api/logout/', {'refresh_token': refresh_token}, content_type='application/json', **self.auth)
+        row = BlacklistedToken.objects.get()
+        self.assertEqual(row.token_id, hashlib.sha256(refresh_token.encode()).hexdigest())
+        self.assertAlmostEqual(row.expires_at, timezone.now() + timedelta(seconds=settings.REFRESH_TOKEN_LIFETIME), delta=timedelta(seconds=5))
+
+    def test_refresh_token_is_single_use(self):
+        refresh_token = issue_tokens(self.user)['refresh_token']
+        response = self.client.post('/api/token/refresh/', {'refresh_token': refresh_token}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        replay = self.client.post('/api/token/refresh/', {'refresh_token': refresh_token}, content_type='application/json')
+        self.assertEqual(replay.status_code, 401)
+
+    def test_prune_keeps_unexpired_revocations(self):
+        refresh_token = issue_tokens(self.user)['refresh_token']
+        self.client.post('/api/logout/', {'refresh_token': refresh_token}, content_type='application/json', **self.auth)
+        BlacklistedToken.objects.create(token_id='0' * 64, expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('prune_blacklisted_tokens', stdout=StringIO())
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+@override_settings(AUTH_TOKEN_CACHE_TTL=300)
+class VerifiedTokenCacheTests(APITestCase):
+    def test_cached_principal_needs_no_query(self):
+        self.assertEqual(self.client.get('/api/user-profile/', **self.auth).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/user-profile/', **self.auth).status_code, 200)
+
+    @override_settings(AUTH_TOKEN_CACHE_TTL=0)
+    def test_off_without_a_ttl(self):
+        self.client.get('/api/user-profile/', **self.auth)
+        with self.assertNumQueries(1):
+            self.client.get('/api/user-profile/', **self.auth)
+
+    def test_change_in_another_worker_retires_principal(self):
+        self.assertEqual(self.client.get('/api/export/', **self.auth).status_code, 200)
+        # Only the shared cache tells this worker about the demotion.
+        with mock.patch.object(verified_tokens, 'discard_user'), self.captureOnCommitCallbacks(execute=True):
+            self.admin.is_superuser = False
+            self.admin.save()
+        self.assertEqual(self.client.get('/api/export/', **self.auth).status_code, 403)
+
+    def test_logout_all_in_another_worker(self):
+        self.client.get('/api/user-profile/', **self.auth)
+        with mock.patch.object(verified_tokens, 'discard_user'):
+            self.client.post('/api/logout/all/', **bearer(self.admin))
+        self.assertEqual(self.client.get('/api/user-profile/', **self.auth).status_code, 401)
+
+    def test_local_revocations_are_bounded(self):
+        revocations = RevocationSet(max_size=2)
+        exp = (timezone.now() + timedelta(minutes=5)).timestamp()
+        for key in ('a', 'b', 'c'):
+            revocations.add(key, exp)
+        self.assertEqual(list(revocations._local), ['b', 'c'])
+        # Evicted locally, still known through the cache.
+        self.assertTrue(revocations.check('a', self.admin.pk)[0])
+
+
+@override_settings(AUTH_TOKEN_CACHE_TTL=300)
+class HomeSnapshotTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            AdminProfile.objects.create(user=self.admin, career='Developer')
+            Skill.objects.create(user=self.admin, name='Python')
+
+    def skills(self):
+        return [skill['name'] for skill in self.client.get('/api/home/', **self.auth).json()['data']['skills']]
+
+    def test_served_from_the_snapshot(self):
+        self.assertEqual(self.skills(), ['Python'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.skills(), ['Python'])
+
+    def test_rebuilt_after_a_write(self):
+        self.skills()
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.create(user=self.admin, name='Django')
+        self.assertEqual(sorted(self.skills()), ['Django', 'Python'])
+
+    def test_late_write_of_an_old_snapshot_is_not_served(self):
+        version = get_version('home')
+        stale = snapshots.build_home_snapshot(version)
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.create(user=self.admin, name='Django')
+        # A reader that loaded the rows before the commit stores them late.
+        cache.set(snapshots._key(version), stale)
+        self.assertEqual(sorted(self.skills()), ['Django', 'Python'])
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class DeltaSyncTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.skill = Skill.objects.create(user=self.admin, name='Python')
+
+    def sync(self, since=None):
+        response = self.client.get('/api/sync/', {'since': since} if since else {}, **self.auth)
+        return response.status_code, response.json()['data'] if response.status_code == 200 else response.json()
+
+    def test_first_sync_resets(self):
+        status_code, data = self.sync()
+        self.assertEqual(status_code, 200)
+        self.assertTrue(data['reset'])
+        # Nothing changed since: just the next token.
+        self.assertEqual(set(self.sync(data['token'])[1]), {'token'})
+
+    def test_changes_and_deletes(self):
+        token = sync.encode_token(timezone.now() - timedelta(seconds=1))
+        project = Project.objects.create(user=self.admin, title='Tracker')
+        skill_id = self.skill.pk
+        self.skill.delete()
+        _, data = self.sync(token)
+        self.assertEqual([row['id'] for row in data['changed']['projects']], [project.pk])
+        self.assertEqual(data['deleted'], {'skills': [skill_id]})
+
+    def test_admin_user_changes(self):
+        reader = CustomUser.objects.create_user(email='reader@example.com', fullname='Re Ader', password='Passw0rd1')
+        token = sync.encode_token(timezone.now())
+        self.assertNotIn('changed', self.sync(token)[1])
+        self.admin.profile_url = 'https://example.com/admin'
+        self.admin.save()
+        reader.save()
+        _, data = self.sync(token)
+        self.assertEqual([row['id'] for row in data['changed']['user']], [self.admin.pk])
+        self.assertEqual(data['changed']['user'][0]['profile_url'], 'https://example.com/admin')
+
+    def test_expired_token_resets(self):
+        token = sync.encode_token(timezone.now() - timedelta(days=31))
+        self.assertTrue(self.sync(token)[1]['reset'])
+
+    def test_rejects_bad_tokens(self):
+        overflowing = base64.urlsafe_b64encode(struct.pack('>BQ', sync.TOKEN_VERSION, 2 ** 64 - 1)).decode()
+        future = sync.encode_token(timezone.now() + timedelta(days=1))
+        for token in ('not-a-token', overflowing, future):
+            self.assertEqual(self.sync(token)[0], 400, token)
+
+    def test_prune_tombstones(self):
+        self.skill.delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        call_command('prune_tombstones', stdout=StringIO())
+        self.assertFalse(Tombstone.objects.exists())
+
+
+class PortabilityTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.reader = CustomUser.objects.create_user(email='reader@example.com', fullname='Re Ader', password='Passw0rd1')
+        AdminProfile.objects.create(user=self.admin, career='Developer')
+        Skill.objects.create(user=self.admin, name='Python')
+        self.project = Project.objects.create(user=self.admin, title='Tracker')
+        self.blog = BlogPost.objects.create(author=self.admin, title='Hello', content='World', category='News')
+        for index in range(5):
+            BlogComment.objects.create(blog_post=self.blog, user=self.reader, content=f'Comment {index}')
+        ProjectComment.objects.create(project=self.project, user=self.reader, content='Neat')
+
+    def export(self):
+        # A small chunk size, so the export pages through several batches.
+        return list(portability.iter_export_lines(chunk_size=2))
+
+    def counts(self):
+        return [model.objects.count() for model in portability.EXPORT_MODELS]
+
+    def test_round_trip(self):
+        lines = self.export()
+        before = self.counts()
+        created_at = sorted(BlogComment.objects.values_list('created_at', flat=True))
+        for model in reversed(portability.EXPORT_MODELS):
+            model.objects.all().delete()
+        portability.import_lines(lines, batch_size=3)
+        self.assertEqual(self.counts(), before)
+        self.assertEqual(sorted(BlogComment.objects.values_list('created_at', flat=True)), created_at)
+
+    def test_reimport_skips_existing_rows(self):
+        lines = self.export()
+        before = self.counts()
+        totals = portability.import_lines(lines)
+        self.assertEqual(self.counts(), before)
+        self.assertEqual(totals['api.blogcomment'], (0, 5, 0))
+        self.assertEqual(totals['api.customuser'], (0, 2, 0))
+
+    def test_slug_collision_gets_a_new_slug(self):
+        lines = self.export()
+        # Another post now holds the exported slug.
+        self.blog.title = 'Renamed'
+        self.blog.save()
+        BlogPost.objects.filter(pk=self.blog.pk).update(slug='hello')
+        portability.import_lines(lines)
+        imported = BlogPost.objects.get(title='Hello')
+        self.assertNotEqual(imported.slug, 'hello')
+
+    def test_reports_skipped_rows(self):
+        skipped = []
+        line = '{"model":"api.blogcomment","fields":{"content":"x","created_at":"2026-01-01T00:00:00+00:00","blog_post":"Missing","user":"reader@example.com"}}\n'
+        totals = portability.import_lines([line], report=lambda model, reason, fields: skipped.append(reason))
+        self.assertEqual(totals['api.blogcomment'], (0, 0, 1))
+        self.assertEqual(skipped, ["no blog_post 'Missing'"])
+
+
+class BulkEndpointTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        Project.objects.create(user=self.admin, title='Tracker')
+        Task.objects.all().delete()
+
+    def test_partial_success(self):
+        items = [{'title': 'Alpha'}, {'title': 'Tracker'}, {'description': 'untitled'}, {'title': 'Beta'}]
+        response = self.client.post('/api/project/bulk/', items, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([item['title'] for item in response.json()['data']], ['Alpha', 'Beta'])
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2])
+        self.assertEqual(Project.objects.count(), 3)
+
+    def test_rejects_empty_batch(self):
+        response = self.client.post('/api/project/bulk/', [], content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    def test_indexing_is_queued(self):
+        items = [{'title': 'Alpha'}, {'title': 'Beta'}]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/project/bulk/', items, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(SearchDocument.objects.filter(kind='project').exists())
+        ids = set(Project.objects.filter(title__in=['Alpha', 'Beta']).values_list('pk', flat=True))
+        queued = Task.objects.filter(name='search.sync')
+        self.assertEqual({task.payload['id'] for task in queued}, ids)
+
+    def test_delete_by_ids(self):
+        keep = Project.objects.create(user=self.admin, title='Keep')
+        other = CustomUser.objects.create_superuser(email='other@example.com', fullname='Ot Her', password='Passw0rd1')
+        foreign = Project.objects.create(user=other, title='Foreign')
+        ids = list(Project.objects.exclude(pk__in=[keep.pk, foreign.pk]).values_list('pk', flat=True))
+        response = self.client.delete('/api/project/bulk/', {'ids': ids + [foreign.pk]}, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['deleted'], len(ids))
+        self.assertEqual(Project.objects.filter(pk__in=[keep.pk, foreign.pk]).count(), 2)
+
+
+@override_settings(SERVER_TIMING_HEADER=True)
+class RequestTimingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        AdminProfile.objects.create(user=self.admin, career='Developer')
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/home/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    @override_settings(SLOW_REQUEST_MS=60_000)
+    def test_fast_requests_log_at_debug_only(self):
+        with self.assertLogs('api.requests', level='DEBUG') as logs:
+            self.client.get('/api/home/', **self.auth)
+        self.assertEqual([record.levelname for record in logs.records], ['DEBUG'])
+        with self.assertNoLogs('api.requests', level='INFO'):
+            self.client.get('/api/home/', **self.auth)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_log_their_sql(self):
+        cache.clear()
+        with self.assertLogs('api.requests', level='WARNING') as logs:
+            self.client.get('/api/home/', **self.auth)
+        record = logs.records[0].request_timing
+        self.assertTrue(record['sql'])
+        self.assertEqual(record['sql_count'], len(record['sql']))
+
+    def test_duplicates_fingerprint_the_sql_text(self):
+        with instrumentation.collect() as stats:
+            stats.record('SELECT 1 WHERE id = %s', (1,), 0.001)
+            stats.record('SELECT 1 WHERE id = %s', (2,), 0.001)
+            stats.record('SELECT 2', (), 0.001)
+        self.assertEqual(stats.queries, 3)
+        self.assertEqual(stats.duplicates, 1)
+
+
+@override_settings(TASK_WORKER_THREADS=0, METRICS_TOKEN=None, METRICS_ALLOWED_IPS=['127.0.0.0/8', '10.0.0.0/8'], METRICS_MULTIPROC_DIR=None)
+class MetricsTests(TestCase):
+    def test_internal_clients_only_without_token(self):
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE api_requests_total counter', response.content.decode())
+        self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='10.1.2.3').status_code, 200)
+        self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='::ffff:10.1.2.3').status_code, 200)
+        self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='203.0.113.7').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        response = self.client.get('/api/metrics/', REMOTE_ADDR='203.0.113.7', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_exited_workers_keep_counters_but_not_gauges(self):
+        registry = metrics.Registry()
+        requests = registry.counter('requests_total', "Requests.", [])
+        registry.gauge('busy', "Busy connections.", [], lambda: {(): 1})
+        requests.inc()
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            # No process has pid 2**22 + 1 (above Linux's pid_max).
+            for pid in (os.getppid(), 2 ** 22 + 1):
+                with open(os.path.join(directory, f'metrics-{pid}.json'), 'w', encoding='utf-8') as handle:
+                    json.dump([['requests_total', [], 5], ['busy', [], 3]], handle)
+            totals = registry.collect()
+        self.assertEqual(totals[('requests_total', ())], 11)
+        self.assertEqual(totals[('busy', ())], 4)
+
+
+class RecordingLoop:
+    """Stands in for a subscriber's event loop; runs callbacks at once."""
+
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+
+@override_settings(REALTIME_BACKEND='api.realtime.LocalBackend')
+class CommentStreamTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.reader = CustomUser.objects.create_user(email='reader@example.com', fullname='Re Ader', password='Passw0rd1')
+        self.blog = BlogPost.objects.create(author=self.admin, title='Hello', content='A long post body', category='News')
+        self.subscription = realtime.hub.subscribe(realtime.channel_name('blog', self.blog.pk), RecordingLoop(), mock.Mock())
+        self.addCleanup(realtime.hub.unsubscribe, self.subscription)
+
+    def test_publish_leaves_the_render_to_the_hub(self):
+        with mock.patch.object(realtime.hub, '_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                comment = BlogComment.objects.create(blog_post=self.blog, user=self.reader, content='Nice')
+        executor.submit.assert_called_once_with(realtime.hub._deliver_logged, 'blog', self.blog.pk, comment.pk)
+        self.assertFalse(self.subscription.pending)
+
+    def test_nothing_is_queued_without_subscribers(self):
+        realtime.hub.unsubscribe(self.subscription)
+        with mock.patch.object(realtime.hub, '_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                BlogComment.objects.create(blog_post=self.blog, user=self.reader, content='Nice')
+        executor.submit.assert_not_called()
+
+    def test_event_carries_the_parent_by_id(self):
+        comment = BlogComment.objects.create(blog_post=self.blog, user=self.reader, content='Nice')
+        realtime.hub.deliver('blog', self.blog.pk, comment.pk)
+        event_id, frame = self.subscription.pending.popleft()
+        self.assertEqual(event_id, comment.pk)
+        data = json.loads(frame.split(b'data: ', 1)[1])
+        self.assertEqual(data['blog_post'], self.blog.pk)
+        self.assertEqual(data['content'], 'Nice')
+        self.assertNotIn(b'A long post body', frame)
+
+    def test_redis_listener_reconnects(self):
+        comment = BlogComment.objects.create(blog_post=self.blog, user=self.reader, content='Nice')
+        backend = realtime.RedisBackend.__new__(realtime.RedisBackend)
+        lost, refused, working = mock.Mock(), mock.Mock(), mock.Mock()
+        lost.listen.side_effect = ConnectionError('lost')
+        refused.psubscribe.side_effect = ConnectionError('refused')
+        working.listen.return_value = [{'channel': f'{backend.prefix}blog:{self.blog.pk}'.encode(), 'data': str(comment.pk).encode()}]
+        backend.client = mock.Mock(**{'pubsub.side_effect': [lost, refused, working]})
+        with mock.patch.object(realtime.time, 'sleep', side_effect=[None, None, KeyboardInterrupt]) as sleep, \
+                mock.patch.object(realtime, 'close_old_connections') as close_old_connections, \
+                self.assertLogs('api.realtime', level='ERROR'), self.assertRaises(KeyboardInterrupt):
+            backend._listen()
+        # Backs off while the connection is down, and starts over once it is back.
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1, 2, 1])
+        self.assertEqual(self.subscription.pending.popleft()[0], comment.pk)
+        close_old_connections.assert_called_once_with()
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """The pool as used by Django, through the sqlite3_pool backend."""
+
+    alias = 'pool-test'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'pool.sqlite3')
+        self.addCleanup(self.drop_pool)
+
+    def drop_pool(self):
+        pool = pooling._pools.pop(self.alias, None)
+        if pool is not None:
+            pool.close_all()
+
+    def wrapper(self, **options):
+        settings_dict = {**connection.settings_dict, 'NAME': self.path, 'POOL': {'PING_AFTER': 0, 'TIMEOUT': 0.05, **options}}
+        wrapper = PooledSQLiteWrapper(settings_dict, alias=self.alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def count(self, name, *labels):
+        return metrics.registry.snapshot().get((name, (self.alias, *labels)), 0)
+
+    def test_connections_are_reused(self):
+        opened = self.count('db_pool_connections_opened_total')
+        first = self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        self.assertEqual(pooling._pools[self.alias].stats(), {'in_use': 1, 'idle': 0})
+        first.close()
+        self.assertEqual(pooling._pools[self.alias].stats(), {'in_use': 0, 'idle': 1})
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+        self.assertEqual(self.count('db_pool_connections_opened_total'), opened + 1)
+
+    def test_exhausted_pool_times_out(self):
+        timeouts = self.count('db_pool_checkout_timeouts_total')
+        holder = self.wrapper(MAX_SIZE=1)
+        holder.ensure_connection()
+        waiter = self.wrapper(MAX_SIZE=1)
+        with self.assertRaises(OperationalError):
+            waiter.ensure_connection()
+        self.assertEqual(self.count('db_pool_checkout_timeouts_total'), timeouts + 1)
+        holder.close()
+        waiter.ensure_connection()
+
+    def test_broken_connection_is_replaced(self):
+        unhealthy = self.count('db_pool_connections_closed_total', 'unhealthy')
+        first = self.wrapper(MAX_SIZE=1)
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        raw.close()
+        second = self.wrapper(MAX_SIZE=1)
+        second.ensure_connection()
+        self.assertIsNot(second.connection, raw)
+        with second.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertEqual(self.count('db_pool_connections_closed_total', 'unhealthy'), unhealthy + 1)
+
+    def test_connection_closed_mid_transaction_is_discarded(self):
+        discarded = self.count('db_pool_connections_closed_total', 'discarded')
+        first = self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        first.set_autocommit(False)
+        first.close()
+        self.assertEqual(pooling._pools[self.alias].stats(), {'in_use': 0, 'idle': 0})
+        self.assertEqual(self.count('db_pool_connections_closed_total', 'discarded'), discarded + 1)
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertIsNot(second.connection, raw)
+
+
+class SlugResolverTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.blog = BlogPost.objects.create(author=self.admin, title='Hello World', content='Body', category='News')
+
+    def test_hits_skip_the_database(self):
+        self.assertEqual(blog_slugs.resolve('hello-world'), self.blog.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(blog_slugs.resolve('hello-world'), self.blog.pk)
+        # Old clients send the title.
+        self.assertEqual(blog_slugs.resolve('Hello World'), self.blog.pk)
+        self.assertIsNone(blog_slugs.resolve('missing'))
+
+    def test_ambiguous_titles_do_not_resolve(self):
+        first = Project.objects.create(user=self.admin, title='Tracker')
+        second = Project.objects.create(user=self.admin, title='tracker')
+        self.assertEqual(second.slug, 'tracker-2')
+        self.assertEqual(project_slugs.resolve('tracker-2'), second.pk)
+        self.assertEqual(project_slugs.resolve('Tracker'), first.pk)
+        other = CustomUser.objects.create_user(email='other@example.com', fullname='Ot Her', password='Passw0rd1')
+        Project.objects.create(user=other, title='Tracker')
+        project_slugs.clear()
+        # Two rows are titled 'Tracker' now; the slug 'tracker' still names one.
+        self.assertIsNone(project_slugs.resolve('Tracker'))
+        self.assertEqual(project_slugs.resolve('tracker'), first.pk)
+
+    def test_rename_elsewhere_retires_cached_slug(self):
+        self.assertEqual(blog_slugs.resolve('hello-world'), self.blog.pk)
+        # Another worker renames the post: this process's entries stay put,
+        # only the shared version moves.
+        with mock.patch.object(blog_slugs, 'discard_pk'), self.captureOnCommitCallbacks(execute=True):
+            self.blog.title = 'Goodbye'
+            self.blog.save()
+        self.assertIsNone(blog_slugs.resolve('hello-world'))
+        self.assertEqual(blog_slugs.resolve('goodbye'), self.blog.pk)
+
+    def test_delete_elsewhere_retires_cached_slug(self):
+        project = Project.objects.create(user=self.admin, title='Tracker')
+        self.assertEqual(project_slugs.resolve('tracker'), project.pk)
+        with mock.patch.object(project_slugs, 'discard_pk'), self.captureOnCommitCallbacks(execute=True):
+            project.delete()
+        self.assertIsNone(project_slugs.resolve('tracker'))
+
+    def test_new_rows_leave_cached_slugs_alone(self):
+        blog_slugs.resolve('hello-world')
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(author=self.admin, title='Second', content='Body', category='News')
+        with self.assertNumQueries(0):
+            self.assertEqual(blog_slugs.resolve('hello-world'), self.blog.pk)
+
+
+class QueryPlanTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        AdminProfile.objects.create(user=self.admin, career='Developer')
+        self.blog = BlogPost.objects.create(author=self.admin, title='Hello', content='World', category='News')
+
+    def add_rows(self, count):
+        start = BlogComment.objects.count()
+        for index in range(start, start + count):
+            reader = CustomUser.objects.create_user(email=f'reader{index}@example.com', fullname='Re Ader', password='Passw0rd1')
+            BlogComment.objects.create(blog_post=self.blog, user=reader, content=f'Comment {index}')
+            Skill.objects.create(user=self.admin, name=f'Skill {index}')
+            Project.objects.create(user=self.admin, title=f'Project {index}')
+
+    def count_queries(self, render):
+        with CaptureQueriesContext(connection) as queries:
+            render()
+        return len(queries)
+
+    def render_comments(self):
+        return BlogCommentsSerializer(prefetch.plan_queryset(BlogComment.objects.all(), BlogCommentsSerializer), many=True).data
+
+    def render_home(self):
+        return HomeScreenSerializer(prefetch.plan_queryset(CustomUser.objects.filter(pk=self.admin.pk), HomeScreenSerializer).get()).data
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.add_rows(2)
+        comments, home = self.count_queries(self.render_comments), self.count_queries(self.render_home)
+        self.add_rows(5)
+        self.assertEqual(self.count_queries(self.render_comments), comments)
+        self.assertEqual(self.count_queries(self.render_home), home)
+        self.assertEqual(comments, 1)
+
+    def test_plan_shape(self):
+        plan = prefetch.get_query_plan(BlogComment, BlogCommentsSerializer)
+        self.assertIn('blog_post', plan.select_related)
+        self.assertIn('user', plan.select_related)
+        plan = prefetch.get_query_plan(CustomUser, HomeScreenSerializer)
+        self.assertEqual(sorted(lookup for lookup, _, _ in plan.prefetches), ['project_set', 'skill_set'])
+
+
+class CommentPaginationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.blog = BlogPost.objects.create(author=self.admin, title='Hello', content='World', category='News')
+        for index in range(5):
+            BlogComment.objects.create(blog_post=self.blog, user=self.admin, content=f'Comment {index}')
+        # Equal timestamps: only the id tiebreak keeps pages apart.
+        BlogComment.objects.update(created_at=timezone.now())
+
+    def get(self, url):
+        response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def contents(self, page):
+        return [comment['content'] for comment in page['results']['data']]
+
+    def test_walks_every_comment_once(self):
+        seen, url = [], f'/api/blog/comments/{self.blog.slug}/?page_size=2'
+        while url:
+            page = self.get(url)
+            seen += self.contents(page)
+            url = page['next']
+        self.assertEqual(seen, [f'Comment {index}' for index in reversed(range(5))])
+
+    def test_previous_link_returns_to_earlier_page(self):
+        first = self.get(f'/api/blog/comments/{self.blog.slug}/?page_size=2&ordering=oldest')
+        second = self.get(first['next'])
+        self.assertEqual(self.contents(second), ['Comment 2', 'Comment 3'])
+        self.assertEqual(self.contents(self.get(second['previous'])), self.contents(first))
+
+    def test_total_only_on_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            page = self.get(f'/api/blog/comments/{self.blog.slug}/')
+        self.assertNotIn('count', page)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        # From the denormalized counter, not a COUNT(*).
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get(f'/api/blog/comments/{self.blog.slug}/?include_total=1')['count'], 5)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/blog/comments/{self.blog.slug}/?cursor=bogus', **self.auth)
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentCounterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.blog = BlogPost.objects.create(author=self.admin, title='Hello', content='World', category='News')
+        self.project = Project.objects.create(user=self.admin, title='Tracker')
+
+    def assertCounts(self, parent, count, last_commented_at):
+        parent.refresh_from_db()
+        self.assertEqual(parent.comment_count, count)
+        self.assertEqual(parent.last_commented_at, last_commented_at)
+
+    def test_follow_creates_and_deletes(self):
+        first = BlogComment.objects.create(blog_post=self.blog, user=self.admin, content='First')
+        second = BlogComment.objects.create(blog_post=self.blog, user=self.admin, content='Second')
+        self.assertCounts(self.blog, 2, second.created_at)
+        second.delete()
+        self.assertCounts(self.blog, 1, first.created_at)
+        first.delete()
+        self.assertCounts(self.blog, 0, None)
+
+    def test_project_counts(self):
+        comment = ProjectComment.objects.create(project=self.project, user=self.admin, content='Neat')
+        self.assertCounts(self.project, 1, comment.created_at)
+
+    def test_reconcile_repairs_drift(self):
+        comment = BlogComment.objects.create(blog_post=self.blog, user=self.admin, content='First')
+        BlogPost.objects.update(comment_count=7, last_commented_at=None)
+        Project.objects.update(comment_count=3)
+        version = get_version(comments_version('blog', self.blog.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            counters.reconcile_comment_counts(batch_size=1)
+        self.assertCounts(self.blog, 1, comment.created_at)
+        self.assertCounts(self.project, 0, None)
+        self.assertNotEqual(get_version(comments_version('blog', self.blog.pk)), version)
+
+
+class BlogSummaryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = 'word ' * 200
+        self.blog = BlogPost.objects.create(author=self.admin, title='Hello', content=self.content, category='News')
+
+    def test_summary_leaves_out_content(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/blogs/?view=summary', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        post, = response.json()['results']['data']
+        self.assertNotIn('content', post)
+        self.assertLessEqual(len(post['excerpt']), EXCERPT_LENGTH + 1)
+        self.assertTrue(post['excerpt'].endswith('…'))
+        listing = [query['sql'] for query in queries if 'FROM "api_blogpost"' in query['sql'] and '"api_blogpost"."title"' in query['sql']]
+        self.assertTrue(listing)
+        self.assertFalse([sql for sql in listing if '"api_blogpost"."content"' in sql])
+
+    def test_full_listing_is_cached_apart_from_summary(self):
+        self.client.get('/api/blogs/?view=summary', **self.auth)
+        post, = self.client.get('/api/blogs/', **self.auth).json()['results']['data']
+        self.assertEqual(post['content'], self.content)
+
+    def test_excerpt_follows_content(self):
+        self.blog.content = 'Short now'
+        self.blog.save(update_fields=['content'])
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.excerpt, 'Short now')
+
+    def test_detail(self):
+        response = self.client.get(f'/api/blogs/{self.blog.pk}/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['content'], self.content)
+        self.assertEqual(self.client.get('/api/blogs/999999/', **self.auth).status_code, 404)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.titled = BlogPost.objects.create(author=self.admin, title='Caching strategies', content='How we keep pages fast.', category='Performance')
+        self.mentioned = BlogPost.objects.create(author=self.admin, title='Release notes', content='Minor fixes, and some caching changes.', category='News')
+        self.project = Project.objects.create(user=self.admin, title='Cache warmer', description='Warms caches before traffic.')
+        BlogPost.objects.create(author=self.admin, title='Unrelated', content='Nothing to see.', category='News')
+        Worker(batch_size=100).run_once()
+
+    def test_analyze(self):
+        # Stopwords go; inflections of one word share a term.
+        self.assertEqual(search.analyze('The caching of the cached caches'), ['cach'] * 3)
+        self.assertEqual(search.stem('strategies'), 'strategy')
+
+    def test_title_matches_rank_first(self):
+        hits = search.search('caching', kinds=['blog'])
+        self.assertEqual([object_id for _, object_id, _ in hits], [self.titled.pk, self.mentioned.pk])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/search/', {'q': 'caches'}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['data']
+        self.assertEqual({result['type'] for result in results}, {'blog', 'project'})
+        response = self.client.get('/api/search/', {'q': 'caches', 'type': 'project'}, **self.auth)
+        self.assertEqual([result['item']['title'] for result in response.json()['data']], ['Cache warmer'])
+        self.assertEqual(self.client.get('/api/search/', **self.auth).status_code, 400)
+
+    def test_index_follows_edits_and_deletes(self):
+        self.titled.title = 'Serving strategies'
+        self.titled.content = 'Nothing cached here.'
+        self.titled.save()
+        self.mentioned.delete()
+        Worker(batch_size=100).run_once()
+        self.assertEqual([object_id for _, object_id, _ in search.search('caching', kinds=['blog'])], [self.titled.pk])
+        self.assertFalse(SearchDocument.objects.filter(kind='blog', object_id=self.mentioned.pk).exists())
+
+
+class AsyncReadViewTests(APITestCase):
+    """The async views answer like the DRF views they stand in for."""
+
+    def setUp(self):
+        super().setUp()
+        AdminProfile.objects.create(user=self.admin, career='Developer')
+        Skill.objects.create(user=self.admin, name='Python')
+        self.project = Project.objects.create(user=self.admin, title='Tracker')
+        self.blog = BlogPost.objects.create(author=self.admin, title='Hello', content='World', category='News')
+        BlogComment.objects.create(blog_post=self.blog, user=self.admin, content='Nice')
+        ProjectComment.objects.create(project=self.project, user=self.admin, content='Neat')
+        self.headers = {'Authorization': self.auth['HTTP_AUTHORIZATION']}
+        self.factory = AsyncRequestFactory()
+
+    async def assertSameAsSync(self, view, url, **kwargs):
+        expected = await self.async_client.get(url, headers=self.headers)
+        # Cached bodies are shared by both; make the async view build its own.
+        await cache.aclear()
+        response = await view.as_view()(self.factory.get(url, headers=self.headers), **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+
+    async def test_reads_match_sync_views(self):
+        await self.assertSameAsSync(async_views.HomeScreenView, '/api/home/')
+        await self.assertSameAsSync(async_views.AdminBlogView, '/api/blogs/')
+        await self.assertSameAsSync(async_views.AdminBlogView, '/api/blogs/?view=summary')
+        await self.assertSameAsSync(async_views.BlogCommentsView, f'/api/blog/comments/{self.blog.slug}/', slug=self.blog.slug)
+        await self.assertSameAsSync(async_views.ProjectCommentsView, f'/api/project/comments/{self.project.slug}/', slug=self.project.slug)
+        await self.assertSameAsSync(async_views.ProfileView, '/api/user-profile/')
+
+    async def test_requires_a_token(self):
+        response = await async_views.ProfileView.as_view()(self.factory.get('/api/user-profile/'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+    async def test_unknown_slug(self):
+        response = await async_views.BlogCommentsView.as_view()(self.factory.get('/api/blog/comments/missing/', headers=self.headers), slug='missing')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_writes_go_to_the_drf_view(self):
+        request = self.factory.post(f'/api/blog/comments/{self.blog.slug}/', {'content': 'Async'}, content_type='application/json', headers=self.headers)
+        response = await async_views.BlogCommentsView.as_view()(request, slug=self.blog.slug)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await BlogComment.objects.filter(content='Async').aexists())
+
+
+@override_settings(TASK_WORKER_THREADS=0, TASKS_ALWAYS_EAGER=False)
+class LoginTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.user = CustomUser.objects.create_user(email='user@example.com', fullname='Us Er', password='Passw0rd1')
+
+    def login(self, email='user@example.com', password='Passw0rd1'):
+        return self.client.post('/api/login/', {'email': email, 'password': password}, content_type='application/json')
+
+    def test_one_lookup_per_login(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.json()['data'])
+        self.assertEqual(len([query for query in queries if 'FROM "api_customuser"' in query['sql']]), 1)
+
+    def test_wrong_password_and_unknown_email(self):
+        self.assertEqual(self.login(password='wrong').status_code, 401)
+        with mock.patch('api.backends.make_password', wraps=hashing.make_password) as make_password:
+            self.assertEqual(self.login(email='nobody@example.com').status_code, 401)
+        # Hashed anyway, so the two take as long.
+        make_password.assert_called_once()
+
+    def test_stale_hash_is_upgraded(self):
+        stale = PBKDF2PasswordHasher().encode('Passw0rd1', 'somesalt', iterations=1000)
+        CustomUser.objects.filter(pk=self.user.pk).update(password=stale)
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.password, stale)
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_busy_hash_pool_answers_503(self):
+        pool = hashing.HashingPool(concurrency=1, queue_size=0)
+        # Every slot taken by sign-ins already in progress.
+        pool._slots.acquire()
+        with mock.patch.object(hashing, '_pool', pool):
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+
+
+class BenchmarkGateTests(SimpleTestCase):
+    def result(self, p95_ms=10.0, queries=3, status=(200,)):
+        return {'status': list(status), 'p95_ms': p95_ms, 'queries': queries}
+
+    def gate(self, before, after):
+        return compare({'10': {'home': before}}, {'10': {'home': after}}, latency_threshold=0.25, min_latency_delta_ms=5.0)
+
+    def test_flags_more_queries_and_status_changes(self):
+        self.assertEqual(len(self.gate(self.result(), self.result(queries=4))), 1)
+        self.assertEqual(len(self.gate(self.result(), self.result(status=(500,)))), 1)
+        self.assertEqual(self.gate(self.result(queries=4), self.result(queries=3)), [])
+
+    def test_latency_needs_relative_and_absolute_growth(self):
+        # +40% but only 4ms: noise.
+        self.assertEqual(self.gate(self.result(p95_ms=10.0), self.result(p95_ms=14.0)), [])
+        # +6ms but only 6%.
+        self.assertEqual(self.gate(self.result(p95_ms=100.0), self.result(p95_ms=106.0)), [])
+        self.assertEqual(len(self.gate(self.result(p95_ms=20.0), self.result(p95_ms=30.0))), 1)
+
+    def test_new_routes_have_no_baseline(self):
+        self.assertEqual(compare({}, {'10': {'home': self.result()}}, 0.25, 5.0), [])
+
+    def test_every_route_is_benchmarked(self):
+        self.assertEqual({pattern.name for pattern in urlpatterns} - {route.name for route in benchmarking.ROUTES}, set())
+
+
+def png(width, height, color='red'):
+    buffer = BytesIO()
+    images.Image.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@skipIf(images.Image is None, "Pillow is not installed")
+@override_settings(IMAGE_VARIANT_WIDTHS=[16, 32, 64])
+class ImageUploadTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = self.settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.project = Project.objects.create(user=self.admin, title='Tracker')
+
+    def upload(self, data, **fields):
+        return self.client.post('/api/images/', {'file': SimpleUploadedFile('upload.png', data), **fields}, **self.auth)
+
+    def test_identical_bytes_share_an_asset(self):
+        data = png(40, 20)
+        first = self.upload(data)
+        self.assertEqual(first.status_code, 201)
+        second = self.upload(data)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['data']['id'], first.json()['data']['id'])
+        self.assertEqual(ImageAsset.objects.count(), 1)
+
+    def test_other_owners_get_their_own_asset(self):
+        data = png(40, 20)
+        mine = ImageAsset.objects.get(pk=self.upload(data).json()['data']['id'])
+        reader = CustomUser.objects.create_user(email='reader@example.com', fullname='Re Ader', password='Passw0rd1')
+        response = self.client.post('/api/images/', {'file': SimpleUploadedFile('upload.png', data)}, **bearer(reader))
+        self.assertEqual(response.status_code, 201)
+        theirs = ImageAsset.objects.get(pk=response.json()['data']['id'])
+        self.assertNotEqual(theirs.pk, mine.pk)
+        self.assertEqual(theirs.owner, reader)
+        self.assertEqual(theirs.original.name, mine.original.name)
+
+    def test_failed_variants_are_retried_on_reupload(self):
+        data = png(40, 20)
+        asset_id = self.upload(data).json()['data']['id']
+        ImageAsset.objects.filter(pk=asset_id).update(status=ImageAsset.FAILED)
+        Task.objects.all().delete()
+        self.assertEqual(self.upload(data).json()['data']['id'], asset_id)
+        self.assertEqual(ImageAsset.objects.get(pk=asset_id).status, ImageAsset.PENDING)
+        Worker().run_once()
+        self.assertEqual(ImageAsset.objects.get(pk=asset_id).status, ImageAsset.READY)
+
+    def test_rejects_non_images(self):
+        self.assertEqual(self.upload(b'not an image').status_code, 400)
+        self.assertFalse(ImageAsset.objects.exists())
+
+    def test_attaches_to_target(self):
+        response = self.upload(png(40, 20), target='project', slug=self.project.slug)
+        self.assertEqual(response.status_code, 201)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.image_asset_id, response.json()['data']['id'])
+        self.assertEqual(self.upload(png(40, 20, 'blue'), target='project', slug='missing').status_code, 404)
+        self.assertEqual(ImageAsset.objects.count(), 1)
+
+    def test_variants_are_generated_in_the_background(self):
+        asset_id = self.upload(png(40, 20)).json()['data']['id']
+        self.assertEqual(ImageAsset.objects.get(pk=asset_id).status, ImageAsset.PENDING)
+        Worker().run_once()
+        asset = ImageAsset.objects.get(pk=asset_id)
+        self.assertEqual(asset.status, ImageAsset.READY)
+        # Configured widths below the original, plus the original width.
+        self.assertEqual([entry.rsplit(' ', 1)[1] for entry in asset.srcset['webp'].split(', ')], ['16w', '32w', '40w'])
+        self.assertTrue(asset.src.endswith('/40.jpg'))
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_matches_drf_output(self):
+        data = {
+            'when': datetime(2026, 1, 2, 3, 4, 5, 600000, tzinfo=dt_timezone.utc),
+            'price': Decimal('1.50'),
+            'text': 'line\u2028separator',
+            'nested': [1, None, True, {'k': 'ü'}],
+            'big': 2 ** 70,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+@override_settings(COMPRESS_MIN_BYTES=0)
+class CompressedBodyTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        BlogPost.objects.create(author=self.admin, title='Hello', content='World ' * 100, category='News')
+
+    def test_accepted_encoding(self):
+        request = lambda value: RequestFactory().get('/', headers={'Accept-Encoding': value})
+        self.assertEqual(compression.accepted_encoding(request('gzip, deflate')), 'gzip')
+        self.assertIsNone(compression.accepted_encoding(request('gzip;q=0, identity')))
+        self.assertEqual(compression.accepted_encoding(request('*')), 'br' if compression.brotli else 'gzip')
+
+    def test_gzip_body_is_compressed_once(self):
+        plain = self.client.get('/api/blogs/', **self.auth)
+        self.assertNotIn('Content-Encoding', plain)
+        with mock.patch('api.compression.compress', wraps=compression.compress) as compress:
+            for _ in range(2):
+                response = self.client.get('/api/blogs/', HTTP_ACCEPT_ENCODING='gzip', **self.auth)
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(gzip.decompress(response.content), plain.content)
+        compress.assert_called_once()
+
+    def test_unrecognised_params_share_one_body(self):
+        for index in range(10):
+            BlogPost.objects.create(author=self.admin, title=f'Post {index}', content='Body', category='News')
+        first = self.client.get('/api/blogs/?page=2&view=summary', **self.auth)
+        with mock.patch('api.views.set_body') as set_body:
+            for url in ('/api/blogs/?view=summary&page=02&utm_source=x', '/api/blogs/?page=2&view=summary&_=123'):
+                response = self.client.get(url, **self.auth)
+                self.assertEqual(response['ETag'], first['ETag'])
+                self.assertEqual(response.content, first.content)
+        set_body.assert_not_called()
+        previous = first.json()['previous']
+        self.assertTrue(previous.endswith('/api/blogs/?view=summary'), previous)
+        # Any other value of view renders the full posts, like no view at all.
+        self.assertEqual(self.client.get('/api/blogs/?view=full', **self.auth)['ETag'], self.client.get('/api/blogs/', **self.auth)['ETag'])
+
+    @override_settings(COMPRESS_MIN_BYTES=10 ** 6)
+    def test_small_bodies_go_out_as_is(self):
+        response = self.client.get('/api/blogs/', HTTP_ACCEPT_ENCODING='gzip', **self.auth)
+        self.assertNotIn('Content-Encoding', response)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        self.routed = []
+        self.status = 200
+        self.middleware = ReplicaRoutingMiddleware(self.view)
+        self.auth = {'HTTP_AUTHORIZATION': 'Bearer ' + generate_token(CustomUser(id=7, email='user@example.com'))[0]}
+
+    def view(self, request):
+        self.routed.append(self.router.db_for_read(Project))
+        return HttpResponse(status=self.status)
+
+    def request(self, method, **extra):
+        self.middleware(getattr(RequestFactory(), method)('/api/home/', **extra))
+        return self.routed[-1]
+
+    def test_router(self):
+        self.assertEqual(self.router.db_for_read(Project), 'replica1')
+        self.assertEqual(self.router.db_for_write(Project), 'default')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Project), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'api'))
+
+    def test_reads_follow_own_writes(self):
+        self.assertEqual(self.request('get', **self.auth), 'replica1')
+        self.assertEqual(self.request('post', **self.auth), 'default')
+        self.assertEqual(self.request('get', **self.auth), 'default')
+        # Other users still read from the replica.
+        self.assertEqual(self.request('get'), 'replica1')
+
+    def test_failed_writes_do_not_pin(self):
+        self.status = 400
+        self.request('post', **self.auth)
+        self.assertEqual(self.request('get', **self.auth), 'replica1')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_off_without_replicas(self):
+        self.assertEqual(self.request('get', **self.auth), 'default')
+
+
+@override_settings(TASK_WORKER_THREADS=0, TASKS_ALWAYS_EAGER=False, TASK_MAX_ATTEMPTS=2, TASK_RETRY_DELAY=60)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        handlers = mock.patch.dict(tasks._handlers)
+        handlers.start()
+        self.addCleanup(handlers.stop)
+        self.calls = []
+        self.failures = []
+        task('tests.record')(self.calls.append)
+        task('tests.batch', batch=True)(self.calls.append)
+        task('tests.fail', on_failure=lambda payload, error: self.failures.append(payload))(self.fail_task)
+
+    def fail_task(self, payload):
+        raise RuntimeError('boom')
+
+    def test_runs_only_committed_tasks(self):
+        try:
+            with transaction.atomic():
+                enqueue('tests.record', {'n': 1})
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        enqueue('tests.record', {'n': 2})
+        self.assertEqual(Worker().run_once(), 1)
+        self.assertEqual(self.calls, [{'n': 2}])
+        self.assertFalse(Task.objects.exists())
+
+    def test_same_key_collapses_while_queued(self):
+        for n in range(3):
+            enqueue('tests.batch', {'n': n}, key='tests.batch:1')
+        enqueue('tests.batch', {'n': 9})
+        Worker().run_once()
+        self.assertEqual(self.calls, [[{'n': 0}, {'n': 9}]])
+
+    def test_retries_then_fails(self):
+        enqueue('tests.fail', {'n': 1})
+        with self.assertLogs('api.tasks', level='WARNING'):
+            Worker().run_once()
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (Task.QUEUED, 1))
+        self.assertGreater(queued.run_after, timezone.now())
+        self.assertIn('boom', queued.last_error)
+        # Not due yet.
+        self.assertEqual(Worker().run_once(), 0)
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('api.tasks', level='WARNING'):
+            Worker().run_once()
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        self.assertEqual(self.failures, [{'n': 1}])
+
+    def test_expired_lease_is_claimed_again(self):
+        enqueue('tests.record', {'n': 1})
+        Task.objects.update(status=Task.RUNNING, locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(Worker().run_once(), 1)
+        self.assertEqual(self.calls, [{'n': 1}])
+
+    def test_live_lease_is_left_alone(self):
+        enqueue('tests.record', {'n': 1})
+        Task.objects.update(status=Task.RUNNING, locked_until=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(Worker().run_once(), 0)
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_mode_runs_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('tests.batch', {'n': 1})
+            self.assertEqual(self.calls, [])
+        self.assertEqual(self.calls, [[{'n': 1}]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_unknown_task_name(self):
+        with self.assertRaises(LookupError):
+            enqueue('tests.missing')
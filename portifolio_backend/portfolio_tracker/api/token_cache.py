@@ -0,0 +1,182 @@
+import hashlib
+import jwt
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from .models import BlacklistedToken, CustomUser
+
+
+REVOKED_KEY_PREFIX = 'api:revoked:'
+VERSION_KEY_PREFIX = 'api:token-version:'
+CHANGED_KEY_PREFIX = 'api:user-changed:'
+
+
+def token_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class UserPrincipal:
+    """Field values of an authenticated user, detached from any DB row."""
+
+    __slots__ = ('user_id', 'token_version', 'verified_at', 'db', 'field_names', 'values')
+
+    def __init__(self, user, verified_at):
+        self.user_id = user.pk
+        self.token_version = user.token_version
+        # When the row was read; a user change recorded later retires it.
+        self.verified_at = verified_at
+        self.db = user._state.db
+        self.field_names = [field.attname for field in CustomUser._meta.concrete_fields]
+        self.values = [getattr(user, name) for name in self.field_names]
+
+    def to_user(self):
+        # A fresh instance per request, so views that mutate request.user never
+        # share state through the cache.
+        return CustomUser.from_db(self.db, self.field_names, list(self.values))
+
+
+class VerifiedTokenCache:
+    """Per-process LRU of verified principals, kept AUTH_TOKEN_CACHE_TTL
+    seconds (0 turns it off)."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def set(self, key, principal, token_exp):
+        if settings.AUTH_TOKEN_CACHE_TTL <= 0:
+            return
+        expires_at = min(time.time() + settings.AUTH_TOKEN_CACHE_TTL, token_exp)
+        with self._lock:
+            self._entries[key] = (expires_at, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            stale = [key for key, (_, principal) in self._entries.items() if principal.user_id == user_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RevocationSet:
+    """Logged-out access tokens seen by this process (an LRU of at most
+    ``max_size``), mirrored in the default cache so that a logout in one
+    worker is seen by the others. Best effort: nothing is stored in the
+    database, a lost entry only lets the short-lived token run out."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, token_exp):
+        self._mark(key)
+        timeout = max(int(token_exp - time.time()), 1)
+        cache.set(REVOKED_KEY_PREFIX + key, True, timeout=timeout)
+
+    def check(self, key, user_id):
+        """Return ``(revoked, token version, changed at)`` in one cache round
+        trip. The version and the time of the user's last change are
+        ``None`` unless they happened recently."""
+        if self._seen(key):
+            return True, None, None
+        keys = self._keys(key, user_id)
+        return self._remember(key, keys, cache.get_many(keys))
+
+    async def acheck(self, key, user_id):
+        if self._seen(key):
+            return True, None, None
+        keys = self._keys(key, user_id)
+        return self._remember(key, keys, await cache.aget_many(keys))
+
+    def _keys(self, key, user_id):
+        return [REVOKED_KEY_PREFIX + key, VERSION_KEY_PREFIX + str(user_id), CHANGED_KEY_PREFIX + str(user_id)]
+
+    def _seen(self, key):
+        with self._lock:
+            return key in self._local
+
+    def _mark(self, key):
+        with self._lock:
+            self._local[key] = True
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def _remember(self, key, keys, values):
+        revoked, version, changed = (values.get(name) for name in keys)
+        if revoked:
+            self._mark(key)
+        return bool(revoked), version, changed
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+verified_tokens = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+revoked_tokens = RevocationSet(settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def user_changed(user_id):
+    """Retire ``user_id``'s cached principals: here at once, and in other
+    workers on their next request through the default cache."""
+    verified_tokens.discard_user(user_id)
+    if settings.AUTH_TOKEN_CACHE_TTL > 0:
+        cache.set(CHANGED_KEY_PREFIX + str(user_id), time.time(), timeout=settings.AUTH_TOKEN_CACHE_TTL)
+
+
+def revoke_token(token):
+    """Stop honouring one access token where the cache can tell. It is
+    short-lived, so no blacklist row is written: logging out a device is
+    blacklisting its refresh token; everywhere is ``bump_token_version``."""
+    payload = jwt.decode(token, options={'verify_signature': False})
+    key = token_key(token)
+    revoked_tokens.add(key, payload['exp'])
+    verified_tokens.discard(key)
+
+
+def blacklist_refresh_token(token, token_exp):
+    """Returns ``False`` if the token was already blacklisted."""
+    _, created = BlacklistedToken.objects.get_or_create(
+        token_id=token_key(token),
+        defaults={'expires_at': datetime.fromtimestamp(token_exp, tz=timezone.utc)},
+    )
+    return created
+
+
+def bump_token_version(user):
+    """Invalidate every token issued to ``user`` with a single UPDATE."""
+    CustomUser.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+    # Principals cached by other workers are checked against this until
+    # they would have expired anyway.
+    cache.set(VERSION_KEY_PREFIX + str(user.pk), user.token_version, timeout=settings.AUTH_TOKEN_CACHE_TTL)
+    verified_tokens.discard_user(user.pk)
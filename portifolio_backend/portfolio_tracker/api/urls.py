@@ -1,29 +1,50 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+if settings.ASYNC_READ_VIEWS:
+    # Same routes, with GET served by the async ORM under ASGI.
+    from . import async_views as read_views
+else:
+    read_views = views
 
 
 urlpatterns = [
     path('register/', views.RegisterView.as_view(), name='register'),
     path('login/', views.LoginView.as_view(), name='login'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
+    path('logout/all/', views.LogoutAllView.as_view(), name='logout-all'),
+    path('token/refresh/', views.RefreshTokenView.as_view(), name='token-refresh'),
 
-    path('home/', views.HomeScreenView.as_view(), name='home'),
+    path('home/', read_views.HomeScreenView.as_view(), name='home'),
 
     path('admin-profile/update/', views.CreateAdminProfileView.as_view(), name='admin-profile-update'),
 
     path('skills/add/', views.CreateAdminSkillView.as_view(), name='add-skill'),
     path('skills/delete/<int:pk>/', views.CreateAdminSkillView.as_view(), name='delete-skill'),
+    path('skills/bulk/', views.BulkAdminSkillView.as_view(), name='bulk-skills'),
 
     path('project/add/', views.CreateAdminProjectView.as_view(), name='project-add'),
     path('project/delete/<int:pk>/', views.CreateAdminProjectView.as_view(), name='project-delete'),
+    path('project/bulk/', views.BulkAdminProjectView.as_view(), name='bulk-projects'),
     
     path('blog/add/', views.CreateAdminBlogView.as_view(), name='blog-add'),
-    path('blog/delete/<str:title>/', views.CreateAdminBlogView.as_view(), name='blog-delete'),
-    path('blogs/', views.AdminBlogView.as_view(), name='get-blogs'),
+    path('blog/delete/<str:slug>/', views.CreateAdminBlogView.as_view(), name='blog-delete'),
+    path('blogs/', read_views.AdminBlogView.as_view(), name='get-blogs'),
+    path('blogs/<int:pk>/', views.BlogDetailView.as_view(), name='blog-detail'),
+
+    path('blog/comments/<str:slug>/', read_views.BlogCommentsView.as_view(), name='blog-comments'),
+    path('project/comments/<str:slug>/', read_views.ProjectCommentsView.as_view(), name='project-comments'),
+    # Server-Sent Events; ASGI only.
+    path('blog/comments/<str:slug>/stream/', async_views.BlogCommentStreamView.as_view(), name='blog-comments-stream'),
+    path('project/comments/<str:slug>/stream/', async_views.ProjectCommentStreamView.as_view(), name='project-comments-stream'),
 
-    path('blog/comments/<str:title>/', views.BlogCommentsView.as_view(), name='blog-comments'),
-    path('project/comments/<str:title>/', views.ProjectCommentsView.as_view(), name='project-comments'),
+    path('images/', views.ImageUploadView.as_view(), name='image-upload'),
 
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('export/', views.ExportView.as_view(), name='export'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
 
-    path('user-profile/', views.ProfileView.as_view(), name='profile')
+    path('user-profile/', read_views.ProfileView.as_view(), name='profile')
 ]
\ No newline at end of file
@@ -0,0 +1,100 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+
+VERSION_KEY_PREFIX = 'api:content-version:'
+MODIFIED_KEY_PREFIX = 'api:content-modified:'
+
+
+def _key(name):
+    return VERSION_KEY_PREFIX + name
+
+
+def _modified_key(name):
+    return MODIFIED_KEY_PREFIX + name
+
+
+def comments_version(kind, parent_id):
+    """Version name of the comment listing of one post ('blog') or project."""
+    return f'comments:{kind}:{parent_id}'
+
+
+def slugs_version(kind):
+    """Version name of the slugs of all posts ('blog') or projects; moves
+    when one is renamed or deleted."""
+    return f'slugs:{kind}'
+
+
+def profile_version(user_id):
+    """Version name of what ProfileSerializer shows of one user."""
+    return f'profile:{user_id}'
+
+
+def _initial():
+    # Seeded from the clock rather than 1, so a counter lost to eviction or
+    # a cache restart never hands out a version that was already used.
+    return time.time_ns() // 1000
+
+
+def _seed(name):
+    cache.add(_key(name), _initial(), timeout=None)
+    cache.add(_modified_key(name), time.time(), timeout=None)
+
+
+async def _aseed(name):
+    await cache.aadd(_key(name), _initial(), timeout=None)
+    await cache.aadd(_modified_key(name), time.time(), timeout=None)
+
+
+def get_version(name):
+    """Current version of the content called ``name``; cached bodies are
+    keyed by it, so bumping the version retires them all."""
+    version = cache.get(_key(name))
+    if version is None:
+        _seed(name)
+        version = cache.get(_key(name))
+    return version
+
+
+async def aget_version(name):
+    version = await cache.aget(_key(name))
+    if version is None:
+        await _aseed(name)
+        version = await cache.aget(_key(name))
+    return version
+
+
+def get_versions(*names):
+    """``[(version, modified), ...]`` for ``names`` in one cache round trip.
+    ``modified`` is when the version last moved (epoch seconds), or None
+    if the cache no longer knows."""
+    keys = [_key(name) for name in names]
+    values = cache.get_many(keys + [_modified_key(name) for name in names])
+    return [
+        (values[_key(name)], values.get(_modified_key(name))) if _key(name) in values else (get_version(name), None)
+        for name in names
+    ]
+
+
+async def aget_versions(*names):
+    keys = [_key(name) for name in names]
+    values = await cache.aget_many(keys + [_modified_key(name) for name in names])
+    return [
+        (values[_key(name)], values.get(_modified_key(name))) if _key(name) in values else (await aget_version(name), None)
+        for name in names
+    ]
+
+
+def _increment(name):
+    try:
+        cache.incr(_key(name))
+    except ValueError:
+        cache.add(_key(name), _initial(), timeout=None)
+    cache.set(_modified_key(name), time.time(), timeout=None)
+
+
+def bump_version(*names):
+    # After commit, otherwise a reader could cache pre-commit rows under the
+    # new version.
+    transaction.on_commit(lambda: [_increment(name) for name in names])
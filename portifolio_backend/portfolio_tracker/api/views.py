@@ -1,42 +1,81 @@
+import hmac
 import jwt
+import logging
+import uuid
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from datetime import datetime, timedelta, timezone
 from django.conf import settings
-from .serializers import RegisterationSerializer, LoginSerializer, AdminProfileSerializer, ProfileSerializer, AdminProjectSerializer, AdminSkillSerializer, AdminBlogSerializer, BlogCommentsSerializer, HomeScreenSerializer, ProjectCommentsSerializer
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from .serializers import RegisterationSerializer, LoginSerializer, AdminProfileSerializer, ProfileSerializer, AdminProjectSerializer, AdminSkillSerializer, AdminBlogSerializer, BlogSummarySerializer, BlogCommentsSerializer, ProjectCommentsSerializer, SearchQuerySerializer, BulkSkillItemSerializer, BulkDeleteSerializer, ImageAssetSerializer, ImageUploadSerializer
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.throttling import AnonRateThrottle
-from .authentication import JWTAuthentication
-from .models import BlacklistedToken, CustomUser, Skill, Project, BlogPost, BlogComment, AdminProfile, ProjectComment
+from rest_framework.exceptions import AuthenticationFailed
+from .authentication import JWTAuthentication, decode_token
+from .compression import body_key, body_response, get_body, set_body
+from .conditional import get_validators
+from .images import InvalidImage, store_upload
+from .metrics import is_internal_address, registry
+from .models import assign_slugs, CustomUser, Skill, Project, BlogPost, BlogComment, AdminProfile, ProjectComment
+from .pagination import CanonicalPageNumberPagination, KeysetPagination
 from .permissions import IsAdminUser
-from rest_framework.pagination import PageNumberPagination
+from .portability import iter_export_lines
+from .prefetch import plan_queryset
+from .renderers import FastJSONRenderer
+from .routers import pin_to_primary, use_primary
+from .search import schedule_sync, search
+from .slugs import blog_slugs, project_slugs
+from .snapshots import get_home_snapshot, invalidate_home_snapshot
+from .sync import InvalidSyncToken, changes_since
+from .token_cache import blacklist_refresh_token, bump_token_version, revoke_token
+from .versions import comments_version, profile_version
+from rest_framework.parsers import MultiPartParser
 
-def generate_token(user):
+logger = logging.getLogger(__name__)
+
+BULK_MAX_ITEMS = 500
+
+def generate_token(user, token_type='access'):
     try:
-        expire_time = datetime.now(timezone.utc) + timedelta(days=7)
+        lifetime = settings.ACCESS_TOKEN_LIFETIME if token_type == 'access' else settings.REFRESH_TOKEN_LIFETIME
+        expire_time = datetime.now(timezone.utc) + timedelta(seconds=lifetime)
         payload = {
             'user_id': user.id,
             'username': user.username,
             'is_admin': user.is_superuser,  
             'exp': expire_time,
             'iat': datetime.now(timezone.utc),
+            'jti': uuid.uuid4().hex,
+            'type': token_type,
+            'ver': user.token_version,
         }
         token = jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
         return token, expire_time
     except Exception as e:
         raise Exception(f"Failed to generate token: {str(e)}")
 
+def issue_tokens(user):
+    # The client's next reads may be of rows this request just wrote.
+    pin_to_primary(user.pk)
+    token, expire_time = generate_token(user)
+    refresh_token, refresh_expire_time = generate_token(user, token_type='refresh')
+    return {"token": token, "expires_at": expire_time, "refresh_token": refresh_token, "refresh_expires_at": refresh_expire_time}
+
 class HomeScreenView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [AllowAny] 
     def get(self, request):
-        try:
-            admin = CustomUser.objects.get(is_superuser=True)
-            serializer = HomeScreenSerializer(admin, context={'request': request})
-            return Response({"status": "success", "data": serializer.data}, status=status.HTTP_200_OK)
-        except CustomUser.DoesNotExist:
+        # Read before the snapshot, so the snapshot is never older than its version.
+        validators = get_validators('home', ['home'], private=False, vary=['Accept-Encoding'])
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        snapshot = get_home_snapshot(validators.versions[0])
+        if snapshot is None:
             return Response({"status": "error", "message": "Admin not found"}, status=status.HTTP_404_NOT_FOUND)
+        return validators.apply(body_response(request, body_key('home', validators.versions[0]), snapshot['body']))
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -46,8 +85,7 @@ class RegisterView(APIView):
         serializer = RegisterationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            token, expire_time = generate_token(user)
-            return Response({"status": "success", "data": {"token": token, "expires_at": expire_time}}, status=status.HTTP_201_CREATED)
+            return Response({"status": "success", "data": issue_tokens(user)}, status=status.HTTP_201_CREATED)
         return Response({"status": "error", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
 class LoginView(APIView):
@@ -57,8 +95,7 @@ class LoginView(APIView):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            token, expire_time = generate_token(user)
-            return Response({"status": "success", "data": {"token": token, "expires_at": expire_time}}, status=status.HTTP_200_OK)
+            return Response({"status": "success", "data": issue_tokens(user)}, status=status.HTTP_200_OK)
         return Response({"status": "error", "errors": serializer.errors}, status=status.HTTP_401_UNAUTHORIZED)
 
 class LogoutView(APIView):
@@ -69,7 +106,15 @@ class LogoutView(APIView):
             token = request.auth
             user = request.user
             is_admin = user.is_superuser
-            BlacklistedToken.objects.create(token=token)
+            revoke_token(token)
+            refresh_token = request.data.get('refresh_token')
+            if refresh_token:
+                try:
+                    payload = decode_token(refresh_token, token_type='refresh')
+                except AuthenticationFailed:
+                    payload = None
+                if payload and payload['user_id'] == user.id:
+                    blacklist_refresh_token(refresh_token, payload['exp'])
             return Response({
                 "status": "success",
                 "message": "Successfully logged out",
@@ -78,6 +123,33 @@ class LogoutView(APIView):
         except Exception as e:
             return Response({"status": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class LogoutAllView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+    def post(self, request):
+        bump_token_version(request.user)
+        return Response({"status": "success", "message": "Logged out of all sessions"}, status=status.HTTP_200_OK)
+
+class RefreshTokenView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    def post(self, request):
+        refresh_token = request.data.get('refresh_token')
+        if not refresh_token:
+            return Response({"status": "error", "message": "refresh_token is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            payload = decode_token(refresh_token, token_type='refresh')
+        except AuthenticationFailed as e:
+            return Response({"status": "error", "message": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        user = CustomUser.objects.filter(id=payload['user_id'], is_active=True).first()
+        if user is None or user.token_version != payload['ver']:
+            return Response({"status": "error", "message": "Token has been revoked!"}, status=status.HTTP_401_UNAUTHORIZED)
+        # Refresh tokens are single use: the first caller blacklists it, a
+        # replay (or a concurrent duplicate) finds the row already there.
+        if not blacklist_refresh_token(refresh_token, payload['exp']):
+            return Response({"status": "error", "message": "Token has been blacklisted!"}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response({"status": "success", "data": issue_tokens(user)}, status=status.HTTP_200_OK)
+
 class CreateAdminProfileView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, IsAdminUser]
@@ -92,11 +164,11 @@ class CreateAdminProfileView(APIView):
             )
             if serializer.is_valid():
                 serializer.save()
-                print(f"Saved AdminProfile for {request.user.email}: {serializer.data}")  # Debug
+                logger.debug("Saved AdminProfile for user %s", request.user.pk)
                 return Response({"status": "success", "data": serializer.data}, status=status.HTTP_200_OK)
             return Response({"status": "error", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print(f"Error updating AdminProfile: {str(e)}")  # Debug
+            logger.exception("Error updating AdminProfile for user %s", request.user.pk)
             return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -136,6 +208,97 @@ class CreateAdminProjectView(APIView):
         except Project.DoesNotExist:
             return Response({"status": "error", "message": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
 
+def bulk_create_items(request, item_serializer_class, key_field, scope, prepare=None):
+    items = request.data
+    if not isinstance(items, list) or not items:
+        return None, [], [{"index": None, "errors": {"non_field_errors": ["Expected a non-empty list of items."]}}]
+    if len(items) > BULK_MAX_ITEMS:
+        return None, [], [{"index": None, "errors": {"non_field_errors": [f"At most {BULK_MAX_ITEMS} items per request."]}}]
+
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        serializer = item_serializer_class(data=item, context={'request': request})
+        if serializer.is_valid():
+            valid.append((index, serializer))
+        else:
+            errors.append({"index": index, "errors": serializer.errors})
+
+    keys = [serializer.validated_data[key_field] for _, serializer in valid]
+    taken = set(scope.filter(**{f'{key_field}__in': keys}).values_list(key_field, flat=True))
+    accepted = []
+    for index, serializer in valid:
+        key = serializer.validated_data[key_field]
+        if key in taken:
+            errors.append({"index": index, "errors": {key_field: [f"'{key}' already exists."]}})
+            continue
+        taken.add(key)
+        accepted.append(serializer)
+    errors.sort(key=lambda error: error["index"])
+
+    model = item_serializer_class.Meta.model
+    instances = [model(user=request.user, **serializer.validated_data) for serializer in accepted]
+    # bulk_create skips save(), so fields it would fill in are set here.
+    if prepare is not None and instances:
+        prepare(instances)
+    with transaction.atomic():
+        model.objects.bulk_create(instances)
+    return instances, [serializer.__class__(instance).data for serializer, instance in zip(accepted, instances)], errors
+
+
+def bulk_response(created, errors):
+    if not created:
+        return Response({"status": "error", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+    if errors:
+        return Response({"status": "partial", "data": created, "errors": errors}, status=status.HTTP_207_MULTI_STATUS)
+    return Response({"status": "success", "data": created}, status=status.HTTP_201_CREATED)
+
+
+class BulkAdminSkillView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    def post(self, request):
+        try:
+            # Skill.name is unique across all users, not only per user.
+            instances, created, errors = bulk_create_items(request, BulkSkillItemSerializer, 'name', Skill.objects.all())
+        except IntegrityError:
+            return Response({"status": "error", "message": "A skill in this batch was created concurrently; please retry."}, status=status.HTTP_409_CONFLICT)
+        if instances:
+            invalidate_home_snapshot()
+        return bulk_response(created, errors)
+
+    def delete(self, request):
+        serializer = BulkDeleteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"status": "error", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            deleted, _ = Skill.objects.filter(user=request.user, pk__in=serializer.validated_data['ids']).delete()
+        return Response({"status": "success", "data": {"deleted": deleted}}, status=status.HTTP_200_OK)
+
+class BulkAdminProjectView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    def post(self, request):
+        try:
+            instances, created, errors = bulk_create_items(request, AdminProjectSerializer, 'title', Project.objects.filter(user=request.user), prepare=assign_slugs)
+        except IntegrityError:
+            return Response({"status": "error", "message": "A project in this batch was created concurrently; please retry."}, status=status.HTTP_409_CONFLICT)
+        if instances:
+            invalidate_home_snapshot()
+            # bulk_create skips post_save, and MySQL does not hand back the
+            # new primary keys, so queue the rows' ids as re-read from the DB.
+            titles = [instance.title for instance in instances]
+            for pk in Project.objects.filter(user=request.user, title__in=titles).values_list('pk', flat=True):
+                schedule_sync('project', pk)
+        return bulk_response(created, errors)
+
+    def delete(self, request):
+        serializer = BulkDeleteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"status": "error", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            deleted, by_model = Project.objects.filter(user=request.user, pk__in=serializer.validated_data['ids']).delete()
+        return Response({"status": "success", "data": {"deleted": by_model.get(Project._meta.label, 0)}}, status=status.HTTP_200_OK)
+
 class CreateAdminBlogView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, IsAdminUser]
@@ -146,9 +309,9 @@ class CreateAdminBlogView(APIView):
             return Response({"status": "success", "data": serializer.data}, status=status.HTTP_201_CREATED)
         return Response({"status": "error", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
-    def delete(self, request, title):
+    def delete(self, request, slug):
         try:
-            blog = BlogPost.objects.get(title=title, author=request.user)
+            blog = BlogPost.objects.get(pk=blog_slugs.resolve(slug), author=request.user)
             blog.delete()
             return Response({"status": "success", "message": "Blog deleted"}, status=status.HTTP_204_NO_CONTENT)
         except BlogPost.DoesNotExist:
@@ -157,44 +320,80 @@ class CreateAdminBlogView(APIView):
 class AdminBlogView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = CanonicalPageNumberPagination
     def get(self, request):
+        # Every client sees the same pages, so each is rendered once per
+        # version of the blog content and then served from the cache.
+        # ?view=summary skips the post bodies and author; the planner's
+        # only() leaves `content` out of the SELECT entirely.
+        summary = request.query_params.get('view') == 'summary'
+        paginator = self.pagination_class()
+        url = paginator.canonical_url(request, view='summary' if summary else None)
+        validators = get_validators('blogs', ['blogs'], variant=url, vary=['Accept-Encoding'])
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        key = body_key('blogs', validators.versions[0], url)
+        body = get_body(key)
+        if body is None:
+            # Built on the primary, since the result is cached under the current version.
+            with use_primary():
+                try:
+                    admin = CustomUser.objects.get(is_superuser=True)
+                except CustomUser.DoesNotExist:
+                    return Response({"status": "error", "message": "Admin not found"}, status=status.HTTP_404_NOT_FOUND)
+                serializer_class = BlogSummarySerializer if summary else AdminBlogSerializer
+                blogs = plan_queryset(BlogPost.objects.filter(author=admin), serializer_class)
+                page = paginator.paginate_queryset(blogs, request)
+            serializer = serializer_class(page, many=True)
+            body = FastJSONRenderer().render(paginator.get_paginated_response({"status": "success", "data": serializer.data}).data)
+            set_body(key, body)
+        return validators.apply(body_response(request, key, body))
+
+class BlogDetailView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    def get(self, request, pk):
         try:
-            admin = CustomUser.objects.get(is_superuser=True)
-            blogs = BlogPost.objects.filter(author=admin)
-            paginator = self.pagination_class()
-            page = paginator.paginate_queryset(blogs, request)
-            serializer = AdminBlogSerializer(page, many=True)
-            return paginator.get_paginated_response({"status": "success", "data": serializer.data})
-        except CustomUser.DoesNotExist:
-            return Response({"status": "error", "message": "Admin not found"}, status=status.HTTP_404_NOT_FOUND)
+            blog = plan_queryset(BlogPost.objects.filter(pk=pk), AdminBlogSerializer).get()
+            serializer = AdminBlogSerializer(blog)
+            return Response({"status": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+        except BlogPost.DoesNotExist:
+            return Response({"status": "error", "message": "Blog not found"}, status=status.HTTP_404_NOT_FOUND)
 
 class BlogCommentsView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
 
-    def post(self, request, title):
+    def post(self, request, slug):
         try:
-            blog = BlogPost.objects.get(title=title)
+            # The response nests the parent, so load it; the cached id makes
+            # this a primary-key lookup.
+            blog = BlogPost.objects.get(pk=blog_slugs.resolve(slug))
         except BlogPost.DoesNotExist:
             return Response({"status": "error", "message": "Blog not found"}, status=status.HTTP_404_NOT_FOUND)
         serializer = BlogCommentsSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save(user=request.user, blog_post=blog)
+            with transaction.atomic():
+                serializer.save(user=request.user, blog_post=blog)
             return Response({"status": "success", "data": serializer.data}, status=status.HTTP_201_CREATED)
         return Response({"status": "error", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
-    def get(self, request, title):
-        try:
-            blog = BlogPost.objects.get(title=title)
-            comments = BlogComment.objects.filter(blog_post=blog)
-            paginator = self.pagination_class()
-            page = paginator.paginate_queryset(comments, request)
-            serializer = BlogCommentsSerializer(page, many=True, context={'request': request})
-            return paginator.get_paginated_response({"status": "success", "data": serializer.data})
-        except BlogPost.DoesNotExist:
+    def get(self, request, slug):
+        blog_id = blog_slugs.resolve(slug)
+        if blog_id is None:
             return Response({"status": "error", "message": "Blog not found"}, status=status.HTTP_404_NOT_FOUND)
+        validators = get_validators('blog-comments', [comments_version('blog', blog_id)], variant=request.build_absolute_uri())
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        comments = plan_queryset(BlogComment.objects.filter(blog_post_id=blog_id), BlogCommentsSerializer)
+        paginator = self.pagination_class()
+        total = lambda: BlogPost.objects.filter(pk=blog_id).values_list('comment_count', flat=True).first()
+        page = paginator.paginate_queryset(comments, request, view=self, total=total)
+        serializer = BlogCommentsSerializer(page, many=True, context={'request': request})
+        return validators.apply(paginator.get_paginated_response({"status": "success", "data": serializer.data}))
 
     # def patch(self, request, pk):
     #     try:
@@ -211,29 +410,36 @@ class BlogCommentsView(APIView):
 class ProjectCommentsView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
 
-    def post(self, request, title):
+    def post(self, request, slug):
         try:
-            project = Project.objects.get(title=title)
+            # The response nests the parent, so load it; the cached id makes
+            # this a primary-key lookup.
+            project = Project.objects.get(pk=project_slugs.resolve(slug))
         except Project.DoesNotExist:
             return Response({"status": "error", "message": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
         serializer = ProjectCommentsSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save(user=request.user, project=project)
+            with transaction.atomic():
+                serializer.save(user=request.user, project=project)
             return Response({"status": "success", "data": serializer.data}, status=status.HTTP_201_CREATED)
         return Response({"status": "error", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
-    def get(self, request, title):
-        try:
-            project = Project.objects.get(title=title)
-            comments = ProjectComment.objects.filter(project=project)
-            paginator = self.pagination_class()
-            page = paginator.paginate_queryset(comments, request)
-            serializer = ProjectCommentsSerializer(page, many=True, context={'request': request})
-            return paginator.get_paginated_response({"status": "success", "data": serializer.data})
-        except Project.DoesNotExist:
+    def get(self, request, slug):
+        project_id = project_slugs.resolve(slug)
+        if project_id is None:
             return Response({"status": "error", "message": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
+        validators = get_validators('project-comments', [comments_version('project', project_id)], variant=request.build_absolute_uri())
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        comments = plan_queryset(ProjectComment.objects.filter(project_id=project_id), ProjectCommentsSerializer)
+        paginator = self.pagination_class()
+        total = lambda: Project.objects.filter(pk=project_id).values_list('comment_count', flat=True).first()
+        page = paginator.paginate_queryset(comments, request, view=self, total=total)
+        serializer = ProjectCommentsSerializer(page, many=True, context={'request': request})
+        return validators.apply(paginator.get_paginated_response({"status": "success", "data": serializer.data}))
 
     # def patch(self, request, pk):
     #     try:
@@ -246,12 +452,114 @@ class ProjectCommentsView(APIView):
     #     except ProjectComment.DoesNotExist:
     #         return Response({"status": "error", "message": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
 
+class SyncView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        snapshot = get_home_snapshot()
+        if snapshot is None:
+            return Response({"status": "error", "message": "Admin not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            data = changes_since(request.query_params.get('since'), snapshot['admin_id'])
+        except InvalidSyncToken as exc:
+            return Response({"status": "error", "message": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"status": "success", "data": data}, status=status.HTTP_200_OK)
+
+class SearchView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    result_serializers = {'blog': BlogSummarySerializer, 'project': AdminProjectSerializer}
+
+    def get(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response({"status": "error", "errors": params.errors}, status=status.HTTP_400_BAD_REQUEST)
+        kind = params.validated_data.get('type')
+        hits = search(params.validated_data['q'], kinds=[kind] if kind else None, limit=params.validated_data['limit'])
+
+        ids_by_kind = {}
+        for hit_kind, object_id, _ in hits:
+            ids_by_kind.setdefault(hit_kind, []).append(object_id)
+        objects = {}
+        for hit_kind, ids in ids_by_kind.items():
+            serializer_class = self.result_serializers[hit_kind]
+            queryset = plan_queryset(serializer_class.Meta.model.objects.filter(pk__in=ids), serializer_class)
+            objects[hit_kind] = {obj.pk: serializer_class(obj).data for obj in queryset}
+
+        results = [
+            {"type": hit_kind, "score": round(score, 4), "item": objects[hit_kind][object_id]}
+            for hit_kind, object_id, score in hits
+            if object_id in objects[hit_kind]
+        ]
+        return Response({"status": "success", "data": results}, status=status.HTTP_200_OK)
+
+class ImageUploadView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    def post(self, request):
+        serializer = ImageUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"status": "error", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        target = serializer.validated_data.get('target')
+        slug = serializer.validated_data.get('slug')
+        # Look the target up first so a bad slug doesn't leave a stored file behind.
+        if target == 'project':
+            instance = Project.objects.filter(pk=project_slugs.resolve(slug), user=request.user).first()
+            if instance is None:
+                return Response({"status": "error", "message": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
+        elif target == 'blog':
+            instance = BlogPost.objects.filter(pk=blog_slugs.resolve(slug), author=request.user).first()
+            if instance is None:
+                return Response({"status": "error", "message": "Blog not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            asset, created = store_upload(request.user, serializer.validated_data['file'])
+        except InvalidImage as e:
+            return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if target == 'profile':
+            request.user.profile_image = asset
+            request.user.save(update_fields=['profile_image', 'updated_at'])
+        elif target is not None:
+            instance.image_asset = asset
+            instance.save(update_fields=['image_asset'])
+        return Response(
+            {"status": "success", "data": ImageAssetSerializer(asset).data},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+class ExportView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    def get(self, request):
+        response = StreamingHttpResponse(iter_export_lines(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="portfolio.jsonl"'
+        return response
+
+class MetricsView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    def get(self, request):
+        expected = settings.METRICS_TOKEN
+        if expected:
+            supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+            if not hmac.compare_digest(supplied.encode(), expected.encode()):
+                return Response({"status": "error", "message": "Invalid metrics token"}, status=status.HTTP_401_UNAUTHORIZED)
+        elif not is_internal_address(request.META.get('REMOTE_ADDR')):
+            return Response({"status": "error", "message": "Metrics are only served to internal clients"}, status=status.HTTP_403_FORBIDDEN)
+        return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 class ProfileView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     def get(self, request):
+        validators = get_validators('profile', [profile_version(request.user.pk)], variant=request.user.pk)
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
         serializer = ProfileSerializer(request.user)
-        return Response({"status": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+        return validators.apply(Response({"status": "success", "data": serializer.data}, status=status.HTTP_200_OK))
 
     def patch(self, request):
         serializer = ProfileSerializer(
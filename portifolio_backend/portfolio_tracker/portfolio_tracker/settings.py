@@ -46,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.RequestTimingMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,9 +61,44 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'portfolio_tracker.urls'
 
+# Cache
+# The home snapshot, content versions and token revocations are shared
+# through this backend, so multi-worker deployments should point it at a
+# shared store (e.g. django.core.cache.backends.redis.RedisCache).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("CACHE_LOCATION", 'portfolio-tracker'),
+    }
+}
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
 JWT_SECRET_KEY =  os.getenv("JWT_SECRET_KEY")
 JWT_ALGORITHM = 'HS256'
 
+# Access tokens are short-lived and renewed through /api/token/refresh/;
+# revoking is done per user by bumping CustomUser.token_version.
+ACCESS_TOKEN_LIFETIME = int(os.getenv("ACCESS_TOKEN_LIFETIME", 15 * 60))
+REFRESH_TOKEN_LIFETIME = int(os.getenv("REFRESH_TOKEN_LIFETIME", 7 * 24 * 60 * 60))
+
+# Verified tokens are served from a per-process LRU for up to
+# AUTH_TOKEN_CACHE_TTL seconds. Logouts, token version bumps and user changes
+# reach the other workers through the default cache, so with a per-process
+# cache the LRU is off by default and every request reads the user row
+# (set AUTH_TOKEN_CACHE_TTL anyway when running a single process).
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", 300 if SHARED_CACHE else 0))
+
+# Password hashing runs on a bounded pool: at most PASSWORD_HASH_CONCURRENCY
+# hashes at once and PASSWORD_HASH_QUEUE_SIZE waiting; beyond that login and
+# registration answer 503 instead of tying up more request workers.
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 32))
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -79,6 +117,100 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'portfolio_tracker.wsgi.application'
 
+# Serve the read endpoints (home, blogs, comment listings, profile) from the
+# async views in api/async_views.py. Only worth enabling under ASGI, e.g.
+# `uvicorn portfolio_tracker.asgi:application`.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "false").lower() in ("1", "true", "yes")
+
+# RequestTimingMiddleware: requests slower than this are logged with their SQL
+# (faster ones only with API_LOG_LEVEL=DEBUG), and the per-request timings are sent back in a Server-Timing header unless disabled.
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", 500))
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "true").lower() in ("1", "true", "yes")
+
+# Request metrics are scraped from /api/metrics/. Under several worker
+# processes set METRICS_MULTIPROC_DIR to a directory shared by them (emptied
+# on deploy); each worker writes its totals there every
+# METRICS_FLUSH_INTERVAL seconds. If METRICS_TOKEN is set, scrapes must send
+# it as a Bearer token; otherwise only clients in METRICS_ALLOWED_IPS
+# (comma-separated addresses or networks, loopback by default) may scrape.
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_ALLOWED_IPS = [network.strip() for network in os.getenv("METRICS_ALLOWED_IPS", "127.0.0.0/8,::1").split(",") if network.strip()]
+
+# Image uploads (POST /api/images/) are stored under MEDIA_ROOT. With Pillow
+# installed, a background task writes WebP and JPEG copies at each of
+# IMAGE_VARIANT_WIDTHS. SERVE_MEDIA lets Django serve MEDIA_URL itself; turn
+# it off when a web server or CDN does.
+MEDIA_URL = os.getenv("MEDIA_URL", "/media/")
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", BASE_DIR / "media")
+SERVE_MEDIA = os.getenv("SERVE_MEDIA", "true").lower() in ("1", "true", "yes")
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv("IMAGE_UPLOAD_MAX_BYTES", 10 * 1024 * 1024))
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,960,1280,1920").split(",")]
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", 80))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 82))
+
+# Work that can follow a write (search indexing, image variants) is queued
+# in the api_tasks table (api.tasks) and run by `python manage.py run_tasks`,
+# and by TASK_WORKER_THREADS threads in each web process once it queues
+# something (0 leaves it all to run_tasks). Workers claim up to
+# TASK_BATCH_SIZE due tasks at a time and look for more every
+# TASK_POLL_INTERVAL seconds. A failing task is retried after
+# TASK_RETRY_DELAY seconds, doubling up to TASK_RETRY_MAX_DELAY, until it
+# has run TASK_MAX_ATTEMPTS times; one whose worker died is picked up again
+# after TASK_LEASE_SECONDS. TASKS_ALWAYS_EAGER runs tasks in-process right
+# after the commit instead.
+TASKS_ALWAYS_EAGER = os.getenv("TASKS_ALWAYS_EAGER", "false").lower() in ("1", "true", "yes")
+TASK_WORKER_THREADS = int(os.getenv("TASK_WORKER_THREADS", 1))
+TASK_BATCH_SIZE = int(os.getenv("TASK_BATCH_SIZE", 50))
+TASK_POLL_INTERVAL = float(os.getenv("TASK_POLL_INTERVAL", 5))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", 5))
+TASK_RETRY_DELAY = float(os.getenv("TASK_RETRY_DELAY", 5))
+TASK_RETRY_MAX_DELAY = float(os.getenv("TASK_RETRY_MAX_DELAY", 60 * 60))
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", 5 * 60))
+
+# Comment streams (api/blog|project/comments/<slug>/stream/, ASGI only).
+# REALTIME_BACKEND fans new comments out to this process's subscribers;
+# with several ASGI workers use 'api.realtime.RedisBackend' and
+# REALTIME_REDIS_URL. Idle streams get a comment line every
+# REALTIME_HEARTBEAT seconds; a subscriber more than REALTIME_QUEUE_SIZE
+# events behind is disconnected and resumes from the database, replaying at
+# most REALTIME_REPLAY_LIMIT missed comments.
+REALTIME_BACKEND = os.getenv("REALTIME_BACKEND", 'api.realtime.LocalBackend')
+REALTIME_REDIS_URL = os.getenv("REALTIME_REDIS_URL", 'redis://localhost:6379/0')
+REALTIME_HEARTBEAT = float(os.getenv("REALTIME_HEARTBEAT", 15))
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", 100))
+REALTIME_REPLAY_LIMIT = int(os.getenv("REALTIME_REPLAY_LIMIT", 500))
+REALTIME_RETRY_MS = int(os.getenv("REALTIME_RETRY_MS", 3000))
+
+# api/sync/?since=<token> returns what changed since the token was issued.
+# Deletes are remembered for SYNC_TOMBSTONE_RETENTION_DAYS (prune older ones
+# with `manage.py prune_tombstones`); older tokens, and changes of more than
+# SYNC_MAX_CHANGES rows of one kind, make the client reload instead. Tokens
+# are backdated by SYNC_OVERLAP_SECONDS to cover transactions still in flight.
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+SYNC_MAX_CHANGES = int(os.getenv("SYNC_MAX_CHANGES", 500))
+SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", 5))
+
+# Home and blog list bodies are cached per content version, along with their
+# gzip (and, with the brotli package installed, br) encodings, for
+# CACHED_BODY_TTL seconds. Smaller bodies than COMPRESS_MIN_BYTES go out as-is.
+CACHED_BODY_TTL = int(os.getenv("CACHED_BODY_TTL", 24 * 60 * 60))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 512))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 9))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 9))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api': {'handlers': ['console'], 'level': os.getenv("API_LOG_LEVEL", "INFO")},
+    },
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -94,12 +226,46 @@ DATABASES = {
     }
 }
 
+# DB_POOL=true keeps connections open in a per-process pool (api.pooling)
+# instead of connecting on every request: up to DB_POOL_MAX_SIZE per worker,
+# at least DB_POOL_MIN_SIZE kept open. A query waits DB_POOL_TIMEOUT seconds
+# for a free connection before failing; connections are replaced after
+# DB_POOL_MAX_LIFETIME seconds and pinged before reuse once idle for
+# DB_POOL_PING_AFTER. CONN_MAX_AGE stays 0: closing returns to the pool.
+if os.getenv("DB_POOL", "false").lower() in ("1", "true", "yes"):
+    DATABASES['default']['ENGINE'] = 'api.db_backends.mysql_pool'
+    DATABASES['default']['POOL'] = {
+        'MIN_SIZE': int(os.getenv("DB_POOL_MIN_SIZE", 0)),
+        'MAX_SIZE': int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+        'TIMEOUT': float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        'MAX_LIFETIME': int(os.getenv("DB_POOL_MAX_LIFETIME", 30 * 60)),
+        'MAX_IDLE': int(os.getenv("DB_POOL_MAX_IDLE", 5 * 60)),
+        'PING_AFTER': float(os.getenv("DB_POOL_PING_AFTER", 5)),
+    }
+
+# Read replicas: DATABASE_REPLICAS="host[:port],..." adds one alias per host,
+# otherwise configured like `default` (each gets its own pool). Safe-method queries are spread across
+# them; writes, and the reads of a user for REPLICA_STICKY_SECONDS after they
+# wrote, use `default` (see api.routers and ReplicaRoutingMiddleware).
+REPLICA_DATABASES = []
+for index, address in enumerate(filter(None, os.getenv("DATABASE_REPLICAS", "").split(",")), start=1):
+    host, _, port = address.strip().partition(":")
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], 'HOST': host, 'PORT': port or DATABASES['default']['PORT'], 'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(f'replica{index}')
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [],  # Remove JWTAuthentication from default
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  # Default to authenticated
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        # orjson-backed when installed, DRF's encoder otherwise.
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
@@ -123,9 +289,10 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# EmailBackend extends ModelBackend, so permissions still work; listing
+# ModelBackend as well would repeat the lookup and hash on every failed login.
 AUTHENTICATION_BACKENDS = [
     'api.backends.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',  
 ]
 
 